@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成售前方案语料生成器
+以 presales-proposal 的 create_proposal_template.get_template 为骨架，
+按目标大小填充四大板块：中文段落、表格、列表、引用和各类 ascii:* 图
+
+使用方法：
+    python3 corpus.py 1M proposal.md               # 生成约 1 MB 的方案
+    python3 corpus.py 50M big.md --seed 7          # 相同 seed 生成相同正文
+
+生成的文档结构与真实方案一致（标题层级、元数据、分隔线、目录），
+可直接用于 convert.py / check_ascii_blocks.py / validate_proposal.py。
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# 复用 presales-proposal 的方案模板
+PRESALES_SCRIPTS = Path(__file__).resolve().parents[2] / 'presales-proposal' / 'scripts'
+sys.path.insert(0, str(PRESALES_SCRIPTS))
+from create_proposal_template import get_template  # noqa: E402
+
+
+# 四大板块（与 get_template 一致）
+CHAPTERS = (
+    '一、项目背景与建设目标',
+    '二、功能方案设计',
+    '三、投资预算',
+    '四、实施周期',
+)
+
+# 各板块的小节标题素材
+SECTION_TOPICS = (
+    '现状分析', '业务痛点', '建设目标', '系统定位', '系统架构', '会员端功能', '管理端功能',
+    '数据中台', '接口集成', '安全设计', '性能设计', '费用构成', '付款方式', '实施阶段',
+    '交付物清单', '培训计划', '运维保障', '风险控制',
+)
+
+# 中文正文素材
+PHRASES = (
+    '会员积分体系', '全渠道触达', '数据驱动决策', '提升运营效率', '降低获客成本',
+    '统一身份认证', '实时数据同步', '精细化运营', '业务流程数字化', '多端协同',
+    '营销活动配置', '订单履约', '权限分级管理', '报表自动生成', '消息推送',
+    '系统稳定运行', '高并发访问', '弹性扩容', '灰度发布', '用户体验优化',
+)
+CONNECTORS = ('，', '，同时', '，并且', '，从而', '，通过', '。')
+
+ASCII_TYPES = ('flowchart', 'architecture', 'ui', 'timeline', 'diagram')
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    """解析大小：10K / 1.5M / 2048"""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    """格式化大小：10K / 1M"""
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f'{size // SIZE_UNITS[unit]}{unit}'
+    return str(size)
+
+
+def _box(label, width):
+    """单个框（3 行）"""
+    inner = width - 2 - len(label) * 2  # 中文按 2 列宽计算
+    left = max(inner // 2, 1)
+    right = max(inner - left, 1)
+    return ('┌' + '─' * (width - 2) + '┐',
+            '│' + ' ' * left + label + ' ' * right + '│',
+            '└' + '─' * (width - 2) + '┘')
+
+
+def _boxes_row(labels, width=14, gap=' ──▶ '):
+    """一行框，框之间用箭头连接"""
+    boxes = [_box(label, width) for label in labels]
+    lines = []
+    for row in range(3):
+        sep = gap if row == 1 else ' ' * len(gap)
+        lines.append(sep.join(box[row] for box in boxes))
+    return lines
+
+
+def ascii_block(rng, diagram_type):
+    """生成一个 ascii:类型 代码块"""
+    labels = rng.sample(PHRASES, 4)
+    if diagram_type == 'flowchart':
+        lines = _boxes_row(labels[:3])
+        lines += ['', '        │', '        ▼'] + _boxes_row(labels[3:])
+    elif diagram_type == 'architecture':
+        lines = ['┌' + '─' * 50 + '┐', '│ 接入层：' + labels[0] + ' ' * 24 + '│',
+                 '├' + '─' * 50 + '┤', '│ 服务层：' + labels[1] + ' / ' + labels[2] + '     │',
+                 '├' + '─' * 50 + '┤', '│ 数据层：' + labels[3] + ' ' * 24 + '│',
+                 '└' + '─' * 50 + '┘']
+    elif diagram_type == 'ui':
+        lines = ['╔' + '═' * 40 + '╗', '║ ' + labels[0] + ' ' * 26 + '║',
+                 '╠' + '═' * 40 + '╣', '║ [' + labels[1] + ']  [' + labels[2] + ']    ║',
+                 '║ ' + labels[3] + '：__________          ║', '╚' + '═' * 40 + '╝']
+    elif diagram_type == 'timeline':
+        weeks = sorted(rng.sample(range(1, 20), 4))
+        lines = ['  '.join(f'第{w}周' for w in weeks),
+                 '──●────────●────────●────────●──',
+                 '  '.join(labels)]
+    else:
+        lines = _boxes_row(labels[:2], gap=' ◀──▶ ') + _boxes_row(labels[2:], gap=' ◀──▶ ')
+    return f'```ascii:{diagram_type}\n' + '\n'.join(lines) + '\n```\n'
+
+
+def paragraph(rng, min_phrases=6, max_phrases=14):
+    """生成一段中文正文"""
+    parts = [rng.choice(PHRASES)]
+    for _ in range(rng.randint(min_phrases, max_phrases) - 1):
+        parts.append(rng.choice(CONNECTORS))
+        parts.append(rng.choice(PHRASES))
+    return ''.join(parts) + '。'
+
+
+def table(rng, rows):
+    """生成一个表格"""
+    lines = ['| 功能模块 | 功能说明 | 用户价值 |', '|---------|---------|---------|']
+    for _ in range(rows):
+        lines.append(f'| {rng.choice(PHRASES)} | {paragraph(rng, 2, 3)} | {rng.choice(PHRASES)} |')
+    return '\n'.join(lines) + '\n'
+
+
+class CorpusSpec:
+    """语料规格"""
+
+    def __init__(self, target_bytes, seed=0, subsections=2, table_every=2, table_rows=6,
+                 ascii_every=3, project_name='会员积分商城'):
+        self.target_bytes = target_bytes   # 目标大小（UTF-8 字节）
+        self.seed = seed                   # 随机种子
+        self.subsections = subsections     # 每个 ### 小节下的 #### 数
+        self.table_every = table_every     # 每 N 个小节一个表格
+        self.table_rows = table_rows       # 表格行数
+        self.ascii_every = ascii_every     # 每 N 个小节一个 ASCII 图（类型轮换）
+        self.project_name = project_name
+
+
+def generate_proposal(spec):
+    """按规格生成合成方案
+
+    Returns:
+        tuple: (markdown 文本, 统计信息 dict)
+    """
+    rng = random.Random(spec.seed)
+    stats = {'headings': 0, 'tables': 0, 'ascii_blocks': {t: 0 for t in ASCII_TYPES}}
+
+    # 文档头部（标题、元数据、目录）沿用方案模板
+    template = get_template(spec.project_name, '示例科技有限公司')
+    preamble = template[:template.index(f'## {CHAPTERS[0]}')]
+    stats['headings'] += preamble.count('\n#')
+
+    # 每个板块按目标大小的四分之一填充
+    chapter_budget = max(spec.target_bytes - len(preamble.encode('utf-8')), 0) // len(CHAPTERS)
+
+    parts = [preamble]
+    section_index = 0
+    for chapter_no, chapter in enumerate(CHAPTERS, 1):
+        parts.append(f'## {chapter}\n\n')
+        stats['headings'] += 1
+        written = 0
+        section_no = 0
+
+        # 至少一个小节，之后按预算追加
+        while section_no == 0 or written < chapter_budget:
+            section_no += 1
+            section_index += 1
+            chunk = [f'### {chapter_no}.{section_no} {rng.choice(SECTION_TOPICS)}\n\n',
+                     paragraph(rng) + '\n\n']
+            stats['headings'] += 1
+
+            if section_index % spec.ascii_every == 0:
+                diagram_type = ASCII_TYPES[(section_index // spec.ascii_every) % len(ASCII_TYPES)]
+                chunk.append(ascii_block(rng, diagram_type) + '\n')
+                stats['ascii_blocks'][diagram_type] += 1
+
+            if section_index % spec.table_every == 0:
+                chunk.append(table(rng, spec.table_rows) + '\n')
+                stats['tables'] += 1
+
+            for sub_no in range(1, spec.subsections + 1):
+                chunk.append(f'#### {chapter_no}.{section_no}.{sub_no} {rng.choice(PHRASES)}\n\n')
+                chunk.append(paragraph(rng) + '\n\n')
+                chunk.append(''.join(f'- {rng.choice(PHRASES)}\n' for _ in range(3)) + '\n')
+                stats['headings'] += 1
+
+            if section_no % 5 == 0:
+                chunk.append(f'> "{paragraph(rng, 3, 5)}"\n\n')
+
+            text = ''.join(chunk)
+            parts.append(text)
+            written += len(text.encode('utf-8'))
+
+        parts.append('---\n\n')
+
+    markdown_text = ''.join(parts)
+    stats['bytes'] = len(markdown_text.encode('utf-8'))
+    stats['ascii_total'] = sum(stats['ascii_blocks'].values())
+    return markdown_text, stats
+
+
+# 边界用例：各转换模式（整篇 / 章节缓存 / 流式）的输出须逐字节一致，--minify 须在线性时间内完成
+EDGE_CASES = {
+    # ASCII 图中形如链接定义的行不是链接定义（须在替换为占位符之后再收集）
+    'ascii-link-definition': """# 登录界面
+
+---
+
+## 界面设计
+
+请输入[用户名]和[密码]。
+
+```ascii:ui
+┌──────────────────┐
+│  用户登录        │
+└──────────────────┘
+[用户名]: admin
+[密码]: ******
+```
+
+## 说明
+
+正文中的 [用户名] 与 [文档][] 引用。
+
+[文档]: https://example.com/docs
+""",
+    # 原始 HTML 中未闭合、带孤立引号的标签（--minify 的标签匹配不能回溯爆炸）
+    'unterminated-tag': """# 原始 HTML
+
+---
+
+## 片段
+
+<div>
+<span a=1 b=2 c=3 d=4 e=5 f=6 g=7 h=8 i=9 j=10 k=11 l=12 m=13 n=14 o=15 p=16 "
+</div>
+
+正文
+""",
+    # 前面章节中格式错误的标签吞掉后面章节的 >，后面的原始 HTML 块变为正文（须合并渲染）
+    'cross-section-tag': """# 原始 HTML
+
+---
+
+## 属性
+
+说明 <span a=1 " 之后的内容。
+
+## 示例
+
+<div>
+示例
+</div>
+
+## 结尾
+
+<pre>
+未闭合
+""",
+}
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("用法: python3 corpus.py <大小> <输出文件> [--seed N]")
+        print("\n示例:")
+        print("  python3 corpus.py 1M proposal.md")
+        print("  python3 corpus.py 50M big.md --seed 7")
+        sys.exit(1)
+
+    seed = 0
+    if '--seed' in sys.argv:
+        seed = int(sys.argv[sys.argv.index('--seed') + 1])
+
+    spec = CorpusSpec(parse_size(sys.argv[1]), seed=seed)
+    text, stats = generate_proposal(spec)
+
+    output = Path(sys.argv[2])
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    print(f"✓ 已生成: {output}（{stats['bytes'] / 1024:.1f} KB）")
+    print(f"  标题 {stats['headings']} 个，表格 {stats['tables']} 个，ASCII 图 {stats['ascii_total']} 个")
+
+
+if __name__ == '__main__':
+    main()
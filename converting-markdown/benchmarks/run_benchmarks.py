@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换器基准测试
+按不同规模生成合成方案（corpus.py），逐阶段计时，结果输出为 JSON，
+便于在版本之间对比吞吐量和扩展曲线
+
+使用方法：
+    python3 run_benchmarks.py                               # 默认 10K,100K,1M
+    python3 run_benchmarks.py --sizes 10K,1M,10M,50M --repeat 5 --output results.json
+    python3 run_benchmarks.py --workdir /tmp/bench          # 保留生成的语料和输出
+
+计时项目：
+    - convert_markdown_to_html 各阶段（read/scan/extract/render/toc/diagrams/shell/write）
+    - 增量重建：改动一段文字后借助章节缓存重新转换
+    - AI 模式往返：转换（同时写出 extracted.json）→ replace_svg
+    - check_ascii_blocks、validate_proposal
+    - 边界用例（corpus.EDGE_CASES）：各转换模式的输出是否逐字节一致、--minify 是否超时
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent / 'scripts'
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from corpus import CorpusSpec, EDGE_CASES, generate_proposal, parse_size, format_size  # noqa: E402
+from convert import convert_markdown_to_html  # noqa: E402
+from replace_svg import replace_placeholders  # noqa: E402
+from check_ascii_blocks import check_markdown_file  # noqa: E402
+from manifest import converter_digest  # noqa: E402
+from fileutil import atomic_write_text  # noqa: E402
+# corpus 导入时已将 presales-proposal/scripts 加入 sys.path
+from validate_proposal import ProposalValidator  # noqa: E402
+
+
+BENCHMARK_VERSION = 1
+DEFAULT_SIZES = '10K,100K,1M'
+
+
+def summarize(samples):
+    """多次运行的统计（秒）"""
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    """执行并计时（屏蔽被测函数的输出）"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        value = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return value, elapsed
+
+
+def fake_diagram(placeholder):
+    """模拟 AI 生成的 SVG/HTML（只用于测量替换开销）"""
+    if placeholder['type'] == 'ui':
+        return f'<div style="font-family: sans-serif; padding: 16px;">界面 #{placeholder["id"]}</div>'
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 400 120">'
+            f'<rect x="10" y="10" width="380" height="100" fill="#f0f5ff"/>'
+            f'<text x="200" y="65" text-anchor="middle">图 #{placeholder["id"]}</text></svg>')
+
+
+def bench_convert(md_path, theme, repeats):
+    """默认模式完整转换（不使用章节缓存）：总耗时与各阶段耗时"""
+    html_path = md_path.with_suffix('.html')
+
+    # 首次转换包含主题加载和 Markdown 实例创建，单独记录
+    _, first_run = timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False,
+                         incremental=False)
+
+    totals, stages = [], {}
+    for _ in range(repeats):
+        result, elapsed = timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False,
+                                incremental=False)
+        totals.append(elapsed)
+        for stage, seconds in result.timings.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    total = summarize(totals)
+    return {
+        'first_run': first_run,
+        'total': total,
+        'stages': {stage: summarize(samples) for stage, samples in stages.items()},
+        'output_bytes': html_path.stat().st_size,
+        'mb_per_s': md_path.stat().st_size / 1024 ** 2 / total['median'],
+    }
+
+
+def bench_incremental(md_path, theme, repeats):
+    """增量重建：在文档中间改动一段文字，借助章节缓存重新转换（同一进程，缓存在内存中）"""
+    html_path = md_path.with_suffix('.html')
+    original = md_path.read_text(encoding='utf-8')
+    middle = original.find('\n\n', len(original) // 2)
+
+    result = None
+    samples = []
+    try:
+        timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False)   # 建立缓存
+        for i in range(repeats):
+            md_path.write_text(f'{original[:middle]}\n\n改动 {i}{original[middle:]}', encoding='utf-8')
+            result, elapsed = timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False)
+            samples.append(elapsed)
+    finally:
+        md_path.write_text(original, encoding='utf-8')
+
+    report = summarize(samples)
+    report.update(result.sections or {})
+    return report
+
+
+def bench_ai_round_trip(md_path, theme, repeats):
+    """AI 模式往返：生成占位符（同时写出 extracted.json）→ 替换"""
+    html_path = md_path.with_suffix('.html')
+    samples = {'convert': [], 'replace': []}
+    placeholders = []
+
+    saved = os.environ.get('AI_SVG_CONVERSION')
+    os.environ['AI_SVG_CONVERSION'] = 'true'
+    try:
+        for _ in range(repeats):
+            result, elapsed = timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False,
+                                    incremental=False)
+            samples['convert'].append(elapsed)
+
+            placeholders = result.placeholders()
+            session_id = result.session_id
+            caches_dir = md_path.parent / '.cvt-caches' / md_path.stem / session_id
+            if not placeholders:
+                continue
+
+            for placeholder in placeholders:
+                ext = 'html' if placeholder['type'] == 'ui' else 'svg'
+                (caches_dir / f"{placeholder['id']}.{ext}").write_text(fake_diagram(placeholder),
+                                                                      encoding='utf-8')
+
+            start = time.perf_counter()
+            html_content, _ = timed(replace_placeholders, html_path, placeholders, caches_dir, session_id)
+            atomic_write_text(html_path, html_content)
+            samples['replace'].append(time.perf_counter() - start)
+            shutil.rmtree(caches_dir)
+    finally:
+        if saved is None:
+            os.environ.pop('AI_SVG_CONVERSION', None)
+        else:
+            os.environ['AI_SVG_CONVERSION'] = saved
+
+    report = {name: summarize(values) for name, values in samples.items() if values}
+    report['placeholders'] = len(placeholders)
+    return report
+
+
+def bench_checks(md_path, repeats):
+    """check_ascii_blocks 与 validate_proposal"""
+    check = [timed(check_markdown_file, md_path)[1] for _ in range(repeats)]
+    validate = [timed(ProposalValidator(md_path).validate)[1] for _ in range(repeats)]
+    return summarize(check), summarize(validate)
+
+
+# 边界用例的转换模式（与整篇转换 incremental=False 的输出比较）
+EDGE_CASE_MODES = {
+    'section_cache': {},
+    'section_cache_warm': {},
+    'stream': {'stream': True},
+}
+
+# 边界用例 --minify 转换的耗时上限（秒；用例都只有几百字节，超出说明出现了回溯爆炸）
+EDGE_CASE_MINIFY_LIMIT = 1.0
+
+
+def bench_edge_cases(workdir, theme):
+    """边界用例：各转换模式的输出须与整篇转换逐字节一致，--minify 不能超时
+
+    Returns:
+        dict: {用例名: {'seconds', 'minify_seconds', 'mismatched': [不一致的模式]}}
+    """
+    report = {}
+    for name, text in EDGE_CASES.items():
+        md_path = Path(workdir) / f'edge-{name}.md'
+        html_path = md_path.with_suffix('.html')
+        md_path.write_text(text, encoding='utf-8')
+
+        _, elapsed = timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False,
+                           incremental=False)
+        expected = html_path.read_bytes()
+        mismatched = []
+        for mode, options in EDGE_CASE_MODES.items():
+            timed(convert_markdown_to_html, md_path, html_path, theme, verbose=False, **options)
+            if html_path.read_bytes() != expected:
+                mismatched.append(mode)
+        _, minify_seconds = timed(convert_markdown_to_html, md_path, html_path, theme,
+                                  verbose=False, incremental=False, minify=True)
+        report[name] = {'seconds': elapsed, 'minify_seconds': minify_seconds,
+                        'mismatched': mismatched}
+    return report
+
+
+def run_benchmarks(sizes, workdir, theme='purple', repeats=3, seed=0):
+    """运行全部基准测试
+
+    Returns:
+        dict: 可 JSON 序列化的结果
+    """
+    documents = []
+    for size in sizes:
+        md_path = Path(workdir) / f'bench-{format_size(size)}.md'
+        text, stats = generate_proposal(CorpusSpec(size, seed=seed))
+        md_path.write_text(text, encoding='utf-8')
+        del text
+
+        print(f"📄 {md_path.name}（{stats['bytes'] / 1024:.1f} KB，"
+              f"{stats['headings']} 个标题，{stats['ascii_total']} 个 ASCII 图）", flush=True)
+
+        doc = {'size': format_size(size)}
+        doc.update(stats)
+        doc['convert'] = bench_convert(md_path, theme, repeats)
+        doc['incremental'] = bench_incremental(md_path, theme, repeats)
+        doc['ai_round_trip'] = bench_ai_round_trip(md_path, theme, repeats)
+        doc['check_ascii_blocks'], doc['validate_proposal'] = bench_checks(md_path, repeats)
+        documents.append(doc)
+        print_document(doc)
+
+    edge_cases = bench_edge_cases(workdir, theme)
+    print_edge_cases(edge_cases)
+
+    return {
+        'benchmark_version': BENCHMARK_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'converter_digest': converter_digest(),
+        'theme': theme,
+        'repeats': repeats,
+        'seed': seed,
+        'documents': documents,
+        'edge_cases': edge_cases,
+    }
+
+
+def print_document(doc):
+    """输出单个文档的结果摘要"""
+    convert = doc['convert']
+    stages = '，'.join(f"{name} {value['median'] * 1000:.1f}"
+                      for name, value in convert['stages'].items())
+    print(f"   转换：{convert['total']['median'] * 1000:.1f} ms（{convert['mb_per_s']:.2f} MB/s）")
+    print(f"   阶段（ms）：{stages}")
+    incremental = doc['incremental']
+    print(f"   增量重建：{incremental['median'] * 1000:.1f} ms"
+          f"（复用 {incremental.get('cached', 0)}/{incremental.get('sections', 0)} 节）")
+    ai = doc['ai_round_trip']
+    if 'replace' in ai:
+        print(f"   AI 往返：转换 {ai['convert']['median'] * 1000:.1f} ms，"
+              f"替换 {ai['replace']['median'] * 1000:.1f} ms（{ai['placeholders']} 个占位符）")
+    print(f"   检查：check {doc['check_ascii_blocks']['median'] * 1000:.1f} ms，"
+          f"validate {doc['validate_proposal']['median'] * 1000:.1f} ms\n", flush=True)
+
+
+def print_edge_cases(edge_cases):
+    """输出边界用例的检查结果"""
+    for name, case in edge_cases.items():
+        if case['mismatched']:
+            print(f"❌ 边界用例 {name}：{'、'.join(case['mismatched'])} 的输出与整篇转换不一致")
+        elif case['minify_seconds'] > EDGE_CASE_MINIFY_LIMIT:
+            print(f"❌ 边界用例 {name}：--minify 耗时 {case['minify_seconds']:.1f} s")
+        else:
+            print(f"✅ 边界用例 {name}：{case['seconds'] * 1000:.1f} ms，"
+                  f"--minify {case['minify_seconds'] * 1000:.1f} ms，各模式输出一致")
+    print(flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='转换器基准测试（合成方案语料）')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'文档大小列表，逗号分隔，如 10K,1M,50M (默认: {DEFAULT_SIZES})')
+    parser.add_argument('--repeat', '-r', type=int, default=3, help='每项重复次数，取中位数 (默认: 3)')
+    parser.add_argument('--theme', '-t', default='purple', help='主题名称 (默认: purple)')
+    parser.add_argument('--seed', type=int, default=0, help='语料随机种子 (默认: 0)')
+    parser.add_argument('--output', '-o', default='benchmark-results.json',
+                        help='结果 JSON 文件 (默认: benchmark-results.json)')
+    parser.add_argument('--workdir', default=None, help='语料和输出目录（指定后保留，默认用临时目录）')
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [parse_size(item) for item in args.sizes.split(',') if item.strip()]
+    except ValueError:
+        print(f"❌ 大小格式错误：{args.sizes}（示例：10K,1M,50M）")
+        sys.exit(1)
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        cleanup = False
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix='cvt-bench-'))
+        cleanup = True
+
+    try:
+        results = run_benchmarks(sizes, workdir, args.theme, max(1, args.repeat), args.seed)
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    atomic_write_text(args.output, json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"✅ 结果已保存：{args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,10 @@ import re
 import sys
 from pathlib import Path
 
+from compress import remove_compressed
+from fileutil import atomic_open
+from splice import Splicer
+
 
 def analyze_ascii_structure(ascii_text):
     """
@@ -332,42 +336,48 @@ def generate_timeline_svg(ascii_text, theme_colors):
     return svg
 
 
+# replace_ascii_with_svg.py 生成的 ASCII 图标记：<div class="ascii-diagram"> … <pre><code>ASCII</code></pre> … </div>
+DIAGRAM_START = re.compile(r'<div class="ascii-diagram"[^>]*>')
+DIAGRAM_END = ('</code></pre>', '</div>')
+_DIAGRAM_CODE = re.compile(r'<pre[^>]*><code>(.*?)</code></pre>', re.DOTALL)
+
+
+# 主题颜色
+THEME_COLORS = {
+    'purple': {'primary': '#667eea', 'secondary': '#764ba2'},
+    'blue': {'primary': '#1890ff', 'secondary': '#096dd9'},
+    'green': {'primary': '#52c41a', 'secondary': '#389e0d'},
+    'minimal': {'primary': '#666666', 'secondary': '#999999'},
+}
+
+
+def get_theme_colors(theme_name):
+    """主题颜色（未知主题使用 blue）"""
+    return THEME_COLORS.get(theme_name, THEME_COLORS['blue'])
+
+
 def convert_html_ascii_to_svg(html_file, theme_name='blue'):
-    """转换 HTML 文件中的 ASCII 图为 SVG"""
-    # 读取 HTML 文件
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-
-    # 主题颜色
-    themes = {
-        'purple': {'primary': '#667eea', 'secondary': '#764ba2'},
-        'blue': {'primary': '#1890ff', 'secondary': '#096dd9'},
-        'green': {'primary': '#52c41a', 'secondary': '#389e0d'},
-        'minimal': {'primary': '#666666', 'secondary': '#999999'},
-    }
-    theme_colors = themes.get(theme_name, themes['blue'])
-
-    # 查找所有 ASCII 图标记
-    pattern = r'<div class="ascii-diagram"[^>]*>.*?<pre[^>]*><code>(.*?)</code></pre>.*?</div>'
-
-    def replace_ascii_with_svg(match):
-        placeholder_div = match.group(0)
-        # 提取 ASCII 文本
-        ascii_match = re.search(r'<pre[^>]*><code>(.*?)</code></pre>', placeholder_div, re.DOTALL)
-        if ascii_match:
-            ascii_text = ascii_match.group(1)
-            # 生成 SVG
-            return generate_svg_from_ascii(ascii_text, theme_colors)
-        return placeholder_div
-
-    # 替换所有 ASCII 图
-    modified_content = re.sub(pattern, replace_ascii_with_svg, html_content, flags=re.DOTALL)
-
-    # 保存修改后的 HTML
-    with open(html_file, 'w', encoding='utf-8') as f:
-        f.write(modified_content)
-
-    return modified_content.count('<!-- SVG')  # 返回转换数量
+    """转换 HTML 文件中的 ASCII 图为 SVG（分块读取、一遍扫描替换，写入临时文件后原子替换）"""
+    theme_colors = get_theme_colors(theme_name)
+    converted = 0
+
+    def replace_ascii_with_svg(match, block):
+        nonlocal converted
+        # 提取 ASCII 文本（只在当前块内查找）
+        ascii_match = _DIAGRAM_CODE.search(block, match.end() - match.start())
+        if not ascii_match:
+            return None
+        # 生成 SVG
+        converted += 1
+        return generate_svg_from_ascii(ascii_match.group(1), theme_colors)
+
+    # 保存修改后的 HTML（已过期的预压缩文件一并删除）
+    splicer = Splicer(DIAGRAM_START, DIAGRAM_END, replace_ascii_with_svg)
+    remove_compressed(html_file)
+    with open(html_file, 'r', encoding='utf-8') as src, atomic_open(html_file) as out:
+        splicer.splice_stream(src, out)
+
+    return converted  # 返回转换数量
 
 
 def main():
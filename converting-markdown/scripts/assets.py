@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部资源（--external-assets）
+默认每个页面内联约 20 KB 的主题 CSS 和目录脚本；外部资源模式下它们只写一次，
+文件名带内容哈希（cvt-purple.1a2b3c4d5e.css、cvt.0f9e8d7c6b.js），所有页面引用同一份文件，
+可以配置一年期的强缓存（内容变化时文件名随之变化）。
+
+资源目录（默认为 HTML 所在目录下的 assets/）：
+    assets/
+    ├── asset-manifest.json        # 逻辑名称 → 带哈希的文件名
+    ├── cvt-purple.1a2b3c4d5e.css  # 各主题的样式表
+    └── cvt.0f9e8d7c6b.js          # 侧边栏与滚动高亮脚本（各主题共用）
+
+旧版本的资源文件不会删除（已部署的旧页面仍可能引用）。
+"""
+
+import json
+import os
+from pathlib import Path
+from urllib.parse import quote
+
+from fileutil import atomic_write_text
+from page_shell import asset_files
+
+
+DEFAULT_ASSETS_DIR = 'assets'
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+
+
+def read_asset_manifest(assets_dir):
+    """读取资源清单 {逻辑名称: 文件名}（不存在或损坏时返回空字典）"""
+    try:
+        with open(Path(assets_dir) / ASSET_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def publish_assets(assets_dir, theme, minify=False):
+    """写出主题的资源文件并更新资源清单（已存在的文件不重写）
+
+    Args:
+        assets_dir: 资源目录
+        theme: Theme 对象
+        minify: 写出压缩后的 CSS 和脚本（--minify）
+
+    Returns:
+        dict: {逻辑名称: 带哈希的文件名}
+    """
+    assets_dir = Path(assets_dir)
+    files = asset_files(theme, minify)
+    assets_dir.mkdir(parents=True, exist_ok=True)
+
+    for filename, content in files.values():
+        path = assets_dir / filename
+        # 文件名由内容决定，存在即内容相同
+        if not path.exists():
+            atomic_write_text(path, content)
+
+    mapping = {name: filename for name, (filename, _) in files.items()}
+    manifest = read_asset_manifest(assets_dir)
+    if any(manifest.get(name) != filename for name, filename in mapping.items()):
+        # 多个主题共用一个资源目录：保留其他主题的条目
+        manifest.update(mapping)
+        atomic_write_text(assets_dir / ASSET_MANIFEST_NAME,
+                          json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+    return mapping
+
+
+def asset_base(assets_dir, html_path):
+    """页面引用资源时的 URL 前缀（资源目录相对于 HTML 所在目录，如 "assets/"、"../assets/"）"""
+    relative = os.path.relpath(Path(assets_dir).resolve(), Path(html_path).resolve().parent)
+    return quote(Path(relative).as_posix()) + '/'
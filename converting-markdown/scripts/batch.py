@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量转换 Markdown 文档（多进程）
+
+一次进程启动转换整个目录，避免逐文件启动解释器、
+重复导入 markdown / PyYAML 的开销。
+
+使用方法：
+    python3 convert.py batch docs/ --jobs 8
+    python3 convert.py batch "specs/**/*.md" --theme blue
+    python3 convert.py batch specs/ --jobs 4 --max-memory 400M   # 每个进程的内存预算
+    python3 convert.py batch specs/ --stream                     # 按章节流式转换
+    python3 convert.py batch portal/ --assets-dir portal/assets  # 所有页面共用一份 CSS/JS
+    python3 convert.py batch portal/ --precompress               # 同时写出 .gz/.br
+"""
+
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from convert import (convert_markdown_to_html, conversion_options, parse_toc_depth,
+                     resolve_assets_dir, DEFAULT_TOC_DEPTH, DEFAULT_ASSETS_DIR)
+from converter import reproducible_enabled
+from compress import (Precompressor, print_compression, parse_level, available_formats,
+                      reproducible_mtime, DEFAULT_LEVEL)
+from manifest import BuildManifest
+from memory_budget import parse_memory_size
+from themes import get_theme
+
+
+MARKDOWN_SUFFIXES = ('.md', '.markdown')
+
+
+def collect_markdown_files(inputs):
+    """展开目录和通配符，返回 Markdown 文件列表
+
+    Args:
+        inputs: 目录、通配符或文件路径列表
+
+    Returns:
+        tuple: (files, missing)
+            - files: 去重后的文件列表，按文件大小降序（大文件优先调度）
+            - missing: 不存在的输入项
+    """
+    sizes = {}
+    missing = []
+
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = [p for p in path.rglob('*') if p.suffix.lower() in MARKDOWN_SUFFIXES]
+        elif glob.has_magic(item):
+            candidates = [Path(p) for p in glob.glob(item, recursive=True)]
+        elif path.is_file():
+            candidates = [path]
+        else:
+            missing.append(item)
+            continue
+
+        for candidate in candidates:
+            # 跳过缓存目录中的文件
+            if '.cvt-caches' in candidate.parts or not candidate.is_file():
+                continue
+            sizes[candidate.resolve()] = candidate.stat().st_size
+
+    files = sorted(sizes, key=lambda p: sizes[p], reverse=True)
+    return files, missing
+
+
+def plan_builds(files, theme, force=False, toc_depth=DEFAULT_TOC_DEPTH, assets_dir=None,
+                minify=False, reproducible=False):
+    """根据增量构建清单筛选需要转换的文档
+
+    Args:
+        files: Markdown 文件列表
+        theme: Theme 对象
+        force: 是否忽略清单，全部重新转换
+        toc_depth: 目录层级
+        assets_dir: 外部资源目录（None 表示内联 CSS 和脚本）
+        minify: 是否压缩输出
+        reproducible: 是否可复现构建
+
+    Returns:
+        tuple: (pending, skipped, manifests)
+            - pending: [(md_path, digests)] 需要转换的文档
+            - skipped: 跳过的文档数
+            - manifests: {目录: BuildManifest}
+    """
+    options = conversion_options(toc_depth, assets_dir, minify, reproducible)
+    manifests = {}
+    pending = []
+    skipped = 0
+
+    for md_path in files:
+        manifest = manifests.get(md_path.parent)
+        if manifest is None:
+            manifest = manifests[md_path.parent] = BuildManifest.for_document(md_path)
+
+        digests = manifest.input_digests(md_path, theme, options)
+        if not force and manifest.is_fresh(md_path, md_path.with_suffix('.html'), digests):
+            skipped += 1
+            continue
+        pending.append((md_path, digests))
+
+    return pending, skipped, manifests
+
+
+def _init_worker(theme_name):
+    """工作进程初始化：每个进程只加载一次主题（已加载时直接返回）"""
+    get_theme(theme_name)
+
+
+def _convert_one(md_path, theme_name, toc_depth=DEFAULT_TOC_DEPTH, max_memory=None, stream=False,
+                 assets_dir=None, minify=False, reproducible=False):
+    """转换单个文档（在工作进程中执行）
+
+    Returns:
+        tuple: (md_path, 耗时秒数, 错误信息或 None)
+    """
+    # 进程池的 initializer 需要 Python 3.7，改为在任务中初始化（主题加载不计入耗时）
+    _init_worker(theme_name)
+    start = time.perf_counter()
+    try:
+        convert_markdown_to_html(md_path, md_path.with_suffix('.html'), theme_name, verbose=False,
+                                 toc_depth=toc_depth, max_memory=max_memory, stream=stream,
+                                 assets_dir=assets_dir, minify=minify, reproducible=reproducible)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return md_path, time.perf_counter() - start, error
+
+
+def _percentile(sorted_values, pct):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_batch(files, theme_name='purple', jobs=None, toc_depth=DEFAULT_TOC_DEPTH, max_memory=None,
+              stream=False, assets_dir=None, on_done=None, minify=False, reproducible=False):
+    """并行转换文档
+
+    Args:
+        files: Markdown 文件列表（建议按大小降序）
+        theme_name: 主题名称
+        jobs: 并行进程数（默认 CPU 核数）
+        toc_depth: 目录层级
+        max_memory: 每个进程的内存预算（字节，可选；超出的文档记为失败）
+        stream: 是否按章节流式转换
+        assets_dir: 外部资源目录（None 表示内联 CSS 和脚本）
+        on_done: 每个文档完成时在主进程中调用 on_done(md_path, 耗时, 错误)（可选）
+        minify: 是否压缩输出
+        reproducible: 是否可复现构建（会话ID由内容哈希得到，输出未变化时不改写）
+
+    Returns:
+        tuple: (results, 总耗时秒数)，results 为 [(md_path, 耗时, 错误)]
+    """
+    jobs = jobs or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+
+    if jobs == 1 or len(files) <= 1:
+        # 单进程：直接在当前进程执行，省去进程池开销
+        for md_path in files:
+            results.append(_convert_one(md_path, theme_name, toc_depth, max_memory, stream,
+                                        assets_dir, minify, reproducible))
+            if on_done:
+                on_done(*results[-1])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            # 按提交顺序调度：大文件先开始，避免长尾
+            futures = [executor.submit(_convert_one, md_path, theme_name, toc_depth, max_memory, stream,
+                                       assets_dir, minify, reproducible)
+                       for md_path in files]
+            for future in as_completed(futures):
+                results.append(future.result())
+                if on_done:
+                    on_done(*results[-1])
+
+    return results, time.perf_counter() - start
+
+
+def print_report(results, elapsed, jobs, skipped=0):
+    """输出汇总报告"""
+    failures = [(path, error) for path, _, error in results if error]
+    latencies = sorted(duration for _, duration, error in results if not error)
+    succeeded = len(latencies)
+
+    print("=" * 60)
+    print("📦 批量转换报告")
+    print("=" * 60)
+    print(f"📄 文档总数：{len(results)}（成功 {succeeded}，失败 {len(failures)}）")
+    if skipped:
+        print(f"⏭️  未变化跳过：{skipped}")
+    print(f"⚙️  并行进程：{jobs}")
+    print(f"⏱️  总耗时：{elapsed:.2f} s")
+    if elapsed > 0:
+        print(f"🚀 吞吐量：{len(results) / elapsed:.1f} docs/s")
+    if latencies:
+        print(f"📊 单文档耗时：p50 {_percentile(latencies, 50) * 1000:.1f} ms，"
+              f"p95 {_percentile(latencies, 95) * 1000:.1f} ms，"
+              f"max {latencies[-1] * 1000:.1f} ms")
+
+    if failures:
+        print(f"\n❌ 失败 {len(failures)} 个：")
+        for path, error in failures:
+            print(f"   - {path}: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='convert.py batch',
+        description='批量转换目录或通配符匹配的 Markdown 文档',
+    )
+    parser.add_argument('inputs', nargs='+', help='目录、通配符或 Markdown 文件')
+    parser.add_argument('--theme', '-t', default='purple', help='主题名称 (默认: purple)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='并行进程数 (默认: CPU 核数)')
+    parser.add_argument('--force', '-f', action='store_true',
+                        help='忽略增量构建清单，强制重新转换')
+    parser.add_argument('--toc-depth', default=DEFAULT_TOC_DEPTH,
+                        help=f'目录层级，如 3 或 2-4 (默认: {DEFAULT_TOC_DEPTH})')
+    parser.add_argument('--max-memory', default=None,
+                        help='每个进程的内存预算，如 400M：使用低内存模式，超出的文档记为失败')
+    parser.add_argument('--stream', action='store_true',
+                        help='按 H1/H2 章节流式转换（适合超大文档）')
+    parser.add_argument('--external-assets', action='store_true',
+                        help=f'CSS 和脚本写为带内容哈希的资源文件并引用 (默认目录: 各文档旁的 {DEFAULT_ASSETS_DIR}/)')
+    parser.add_argument('--assets-dir', default=None,
+                        help='所有文档共用的外部资源目录（隐含 --external-assets）')
+    parser.add_argument('--minify', action='store_true',
+                        help='压缩输出（HTML 空白、重复的 CSS 规则和内联样式、SVG 空白）')
+    parser.add_argument('--reproducible', action='store_true',
+                        help='可复现构建：相同输入得到逐字节相同的输出 (设置 SOURCE_DATE_EPOCH 时默认启用)')
+    parser.add_argument('--precompress', action='store_true',
+                        help='在 HTML 旁写出 .gz（安装了 brotli 时另有 .br），主进程后台压缩')
+    parser.add_argument('--compress-level', default=DEFAULT_LEVEL,
+                        help=f'预压缩级别 1~9 (默认: {DEFAULT_LEVEL})')
+    args = parser.parse_args(argv)
+
+    # 先在主进程校验主题，避免每个工作进程重复报错
+    try:
+        theme = get_theme(args.theme)
+        parse_toc_depth(args.toc_depth)
+        max_memory = parse_memory_size(args.max_memory) if args.max_memory else None
+        compress_level = parse_level(args.compress_level)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.minify and (args.stream or max_memory):
+        print("❌ --minify 不能与 --stream / --max-memory 同时使用（压缩需要完整页面）")
+        sys.exit(1)
+
+    files, missing = collect_markdown_files(args.inputs)
+    for item in missing:
+        print(f"⚠️  输入不存在：{item}")
+
+    if not files:
+        print("⚠️  未找到任何 Markdown 文件")
+        sys.exit(1 if missing else 0)
+
+    assets_dir = resolve_assets_dir(args.external_assets, args.assets_dir)
+    reproducible = args.reproducible or reproducible_enabled()
+    pending, skipped, manifests = plan_builds(files, theme, args.force, args.toc_depth, assets_dir,
+                                              args.minify, reproducible)
+
+    # 预压缩：转换完成的文档在主进程的线程池中压缩（与其余文档的转换重叠），
+    # 未变化的文档只补上缺失或过期的压缩文件
+    compressor = None
+    if args.precompress:
+        compressor = Precompressor(available_formats(), compress_level,
+                                   mtime=reproducible_mtime() if reproducible else None)
+        converting = {md_path for md_path, _ in pending}
+        for md_path in files:
+            if md_path not in converting:
+                compressor.submit(md_path.with_suffix('.html'), only_stale=True)
+
+    if not pending:
+        print(f"⏭️  {skipped} 个文档均未变化，无需转换（使用 --force 强制重新转换）")
+        if compressor:
+            print_compression(compressor.close(), verbose=False)
+        sys.exit(1 if missing else 0)
+
+    jobs = max(1, min(args.jobs or os.cpu_count() or 1, len(pending)))
+    print(f"🔍 找到 {len(files)} 个文档，{len(pending)} 个需要转换，使用 {jobs} 个进程...\n")
+
+    def on_done(md_path, elapsed, error):
+        if compressor and not error:
+            # 可复现构建时输出未变化的文档不改写 HTML，已有的压缩文件仍然有效
+            compressor.submit(md_path.with_suffix('.html'), only_stale=reproducible)
+
+    results, elapsed = run_batch([md_path for md_path, _ in pending], args.theme, jobs,
+                                 args.toc_depth, max_memory, args.stream, assets_dir, on_done,
+                                 args.minify, reproducible)
+
+    # 只记录成功的构建，失败的文档下次仍会重试
+    digests_by_path = dict(pending)
+    for md_path, _, error in results:
+        if not error:
+            manifests[md_path.parent].record(md_path, md_path.with_suffix('.html'),
+                                             digests_by_path[md_path])
+    for manifest in manifests.values():
+        manifest.save()
+
+    print_report(results, elapsed, jobs, skipped)
+    if compressor:
+        print_compression(compressor.close(), verbose=False)
+
+    sys.exit(1 if any(error for _, _, error in results) or missing else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存索引
+记录 .cvt-caches 中各缓存条目的大小和最近使用时间，缓存管理（convert.py cache）
+据此统计和清理，不必遍历整个缓存目录（图形缓存常有上千个小文件）
+
+    - 条目：会话目录 {文档名}/{会话ID}、章节缓存 {文档名}/sections.jsonl、
+      图形缓存 .diagrams/{哈希前2位}/{哈希}.svg|html（路径相对于 .cvt-caches）
+    - 只追加：每次写入一行 {"t": 时间, "add": {路径: 大小}, "use": [路径], "del": [路径]}，
+      多个进程同时追加也不会互相覆盖；写了一半的行读取时跳过
+    - 过期的行超过一半时由缓存管理整体重写为快照：重写时持有排他锁，并先合并读取之后
+      其他进程追加的行；追加时持有共享锁，文件已被替换时重新打开（没有 fcntl 的平台不加锁）
+    - 索引只是加速：写入失败不影响转换；索引缺失或不完整时 convert.py cache --rescan 重建
+
+索引位置：.cvt-caches/.index.jsonl
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+from fileutil import atomic_write_bytes
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+INDEX_NAME = '.index.jsonl'
+
+# 条目类型
+SESSION = 'session'
+SECTIONS = 'sections'
+DIAGRAM = 'diagram'
+
+
+def entry_kind(path):
+    """由相对路径判断条目类型（无法识别时返回 None）"""
+    parts = path.split('/')
+    if parts[0] == '.diagrams':
+        return DIAGRAM if len(parts) == 3 else None
+    if len(parts) == 2:
+        return SECTIONS if parts[1] == 'sections.jsonl' else SESSION
+    return None
+
+
+class CacheIndex:
+    """缓存索引（一个 .cvt-caches 目录一份）"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root / INDEX_NAME
+        # load() / mark() 读到的位置：重写时合并此后其他进程追加的行
+        self.offset = 0
+        self.inode = None
+
+    @classmethod
+    def for_document(cls, doc_path):
+        """获取文档（Markdown 或 HTML）所在目录的缓存索引"""
+        return cls(Path(doc_path).parent / '.cvt-caches')
+
+    def relative(self, path):
+        """缓存文件或目录相对于 .cvt-caches 的路径（不在其中时返回 None）"""
+        path = Path(path)
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            pass
+        try:
+            return path.resolve().relative_to(self.root.resolve()).as_posix()
+        except (OSError, ValueError):
+            return None
+
+    def append(self, add=None, use=None, remove=None):
+        """追加一行记录（写入失败时忽略）
+
+        Args:
+            add: 新增或改写的条目 {路径: 大小}
+            use: 使用过的条目 [路径]
+            remove: 删除的条目 [路径]
+        """
+        record = {'t': round(time.time(), 3)}
+        if add:
+            record['add'] = add
+        if use:
+            record['use'] = sorted(use)
+        if remove:
+            record['del'] = sorted(remove)
+        if len(record) == 1:
+            return
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd = self._open_locked(os.O_WRONLY | os.O_APPEND, _LOCK_SH)
+            try:
+                # O_APPEND：一次 write 写入整行，并发追加的行不会交错
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError:
+            pass
+
+    def _open_locked(self, flags, lock):
+        """打开索引文件并加锁；加锁期间文件被重写（替换）时重新打开新文件"""
+        while True:
+            fd = os.open(self.path, flags | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            try:
+                fcntl.flock(fd, lock)
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            except BaseException:
+                os.close(fd)
+                raise
+            os.close(fd)
+
+    def add(self, paths):
+        """记录新增或改写的缓存文件/目录（绝对或相对路径均可，大小取当前文件大小）"""
+        entries = {}
+        for path in paths:
+            relative = self.relative(path)
+            if relative is not None:
+                entries[relative] = entry_size(Path(path))
+        self.append(add=entries)
+
+    def use(self, paths):
+        """记录使用过的缓存文件"""
+        self.append(use=[r for r in map(self.relative, paths) if r is not None])
+
+    def remove(self, paths):
+        """记录删除的缓存文件/目录"""
+        self.append(remove=[r for r in map(self.relative, paths) if r is not None])
+
+    def load(self):
+        """重放索引（记录读到的位置，见 rewrite）
+
+        Returns:
+            tuple: ({路径: {'size', 'used'}}, 行数)；索引不存在时返回 (None, 0)
+        """
+        entries = {}
+        try:
+            with open(self.path, 'rb') as f:
+                self.inode = os.fstat(f.fileno()).st_ino
+                lines = _replay(entries, f)
+                self.offset = f.tell()
+        except OSError:
+            return None, 0
+        return entries, lines
+
+    def mark(self):
+        """记录索引当前的末尾（重建索引前调用：重写时只合并此后追加的行）"""
+        try:
+            st = self.path.stat()
+            self.offset, self.inode = st.st_size, st.st_ino
+        except OSError:
+            self.offset, self.inode = 0, None
+
+    def rewrite(self, entries):
+        """把索引重写为快照（每个条目一行）
+
+        先合并 load() / mark() 之后其他进程追加的行（entries 随之更新），
+        持有排他锁直到新文件替换完成，期间的追加等待后写入新文件。
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd = self._open_locked(os.O_RDONLY, _LOCK_EX)
+        try:
+            with os.fdopen(os.dup(fd), 'rb') as f:
+                # 文件已被其他进程重写：合并整个新文件
+                if os.fstat(f.fileno()).st_ino == self.inode:
+                    f.seek(self.offset)
+                _replay(entries, f)
+
+            lines = []
+            for path, entry in sorted(entries.items(), key=lambda item: item[1]['used']):
+                record = {'t': round(entry['used'], 3), 'add': {path: entry['size']}}
+                lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            data = ''.join(lines).encode('utf-8')
+            atomic_write_bytes(self.path, data)
+            # 替换后新追加的行不在 entries 中：下次重写从快照末尾开始合并
+            self.offset = len(data)
+            self.inode = os.stat(self.path).st_ino
+        finally:
+            os.close(fd)
+
+
+_LOCK_SH = fcntl.LOCK_SH if fcntl else None
+_LOCK_EX = fcntl.LOCK_EX if fcntl else None
+
+
+def _replay(entries, f):
+    """把索引行依次应用到 entries（f 以二进制打开），返回读到的行数
+
+    停在第一个不完整的行之前（正在追加），f.tell() 即下次继续读取的位置。
+    """
+    lines = 0
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            f.seek(pos)
+            return lines
+        lines += 1
+        try:
+            record = json.loads(line)
+            t = float(record['t'])
+        except (ValueError, KeyError, TypeError):
+            # 损坏的行（进程中断）：跳过，下次重写时清除
+            continue
+        for path, size in (record.get('add') or {}).items():
+            entries[path] = {'size': size, 'used': t}
+        for path in record.get('use') or ():
+            if path in entries:
+                entries[path]['used'] = t
+        for path in record.get('del') or ():
+            entries.pop(path, None)
+
+
+def entry_size(path):
+    """文件大小，或目录下所有文件的总大小（不存在时为 0）"""
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+        total = 0
+        for child in path.iterdir():
+            try:
+                total += child.stat().st_size
+            except OSError:
+                pass
+        return total
+    except OSError:
+        return 0
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存管理（convert.py cache）
+统计和清理文档目录下的 .cvt-caches：
+
+    .cvt-caches/
+    ├── .index.jsonl              # 缓存索引（cache_index.py，统计和清理据此进行）
+    ├── manifest.json             # 增量构建清单（很小，不清理）
+    ├── .diagrams/                # 持久化图形缓存
+    └── {文档名}/
+        ├── sections.jsonl        # 章节渲染缓存
+        └── {会话ID}/             # AI 会话目录（extracted.json 与生成的 SVG/HTML）
+
+    - 孤立会话：HTML 已不存在或已不含该会话的占位符（重新转换后放弃了 AI 步骤、替换后未清理等）
+    - 文档旁的预压缩文件（.gz / .br）：源 HTML 已删除的视为孤立
+    - 外部资源目录（含 asset-manifest.json）只统计：旧版本的资源文件可能仍被已部署的页面引用
+    - 删除的缓存都可以重建：下次转换重新渲染章节、为未缓存的图重新生成占位符
+
+使用方法：
+    python3 convert.py cache stats docs/                     # 占用统计与孤立会话
+    python3 convert.py cache prune docs/ --orphans           # 删除孤立会话和孤立的预压缩文件
+    python3 convert.py cache prune docs/ --older-than 30d    # 删除 30 天未使用的缓存
+    python3 convert.py cache prune docs/ --max-size 500M     # 按最近使用时间（LRU）淘汰到 500 MB 以内
+    python3 convert.py cache prune docs/ --orphans --max-size 1G --dry-run   # 只列出，不删除
+    python3 convert.py cache stats docs/ --rescan            # 遍历缓存目录重建索引
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from assets import ASSET_MANIFEST_NAME, read_asset_manifest
+from cache_index import CacheIndex, INDEX_NAME, entry_kind, entry_size, SESSION, SECTIONS, DIAGRAM
+from compress import COMPRESSED_SUFFIXES
+from diagram_cache import DIAGRAMS_DIR
+from manifest import MANIFEST_NAME
+from memory_budget import parse_memory_size
+from section_cache import SECTION_CACHE_NAME
+
+
+CACHE_DIR_NAME = '.cvt-caches'
+
+# 新建不久的会话不判为孤立（转换可能正在进行，HTML 尚未写出）
+ORPHAN_GRACE = 60
+
+# 索引行数超过条目数的 2 倍（且超过该数量）时重写为快照
+COMPACT_MIN_LINES = 64
+
+KIND_LABELS = {DIAGRAM: '图形缓存', SECTIONS: '章节缓存', SESSION: '会话目录'}
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+# HTML 中 AI 占位符起始标记里的会话ID（按字节分块查找）
+_SESSION_MARKER = re.compile(rb'<!-- AI-SVG-[A-Z]+-START:id=\d+,session=([a-f0-9]+) -->')
+_READ_CHUNK = 1 << 20
+_MARKER_OVERLAP = 256
+
+
+def parse_duration(text):
+    """解析时长：30d / 12h / 90m / 2w（不带单位时为天），返回秒数"""
+    value = str(text).strip().lower()
+    try:
+        if value and value[-1] in DURATION_UNITS:
+            seconds = float(value[:-1]) * DURATION_UNITS[value[-1]]
+        else:
+            seconds = float(value) * DURATION_UNITS['d']
+    except ValueError:
+        raise ValueError(f"时长格式错误：{text}（示例：30d、12h、2w）") from None
+    if seconds <= 0:
+        raise ValueError(f"时长必须大于 0：{text}")
+    return seconds
+
+
+def format_size(size):
+    """格式化文件大小"""
+    for unit, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if size >= factor:
+            return f'{size / factor:.1f} {unit}'
+    return f'{size} B'
+
+
+def format_age(seconds):
+    """格式化时长（用于"多久未使用"）"""
+    if seconds >= 86400:
+        return f'{seconds / 86400:.0f} 天'
+    if seconds >= 3600:
+        return f'{seconds / 3600:.0f} 小时'
+    return f'{max(seconds, 0) / 60:.0f} 分钟'
+
+
+def find_cache_roots(inputs):
+    """在文档目录中查找 .cvt-caches 和外部资源目录（不进入缓存目录和隐藏目录）
+
+    Returns:
+        tuple: ([.cvt-caches 目录], [外部资源目录])
+    """
+    roots, assets_dirs, seen = [], [], set()
+    for item in inputs:
+        path = Path(item)
+        if not path.is_dir():
+            raise ValueError(f"目录不存在：{item}")
+        if path.name == CACHE_DIR_NAME:
+            walk = [(str(path.parent), [CACHE_DIR_NAME], [])]
+        else:
+            walk = os.walk(path)
+        for dirpath, dirnames, filenames in walk:
+            if CACHE_DIR_NAME in dirnames:
+                root = Path(dirpath) / CACHE_DIR_NAME
+                if root.resolve() not in seen:
+                    seen.add(root.resolve())
+                    roots.append(root)
+            if ASSET_MANIFEST_NAME in filenames and Path(dirpath).resolve() not in seen:
+                seen.add(Path(dirpath).resolve())
+                assets_dirs.append(Path(dirpath))
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != 'node_modules']
+    return roots, assets_dirs
+
+
+def _last_used(path, st=None):
+    """最近使用时间：访问时间与修改时间中较晚的（挂载了 noatime 时访问时间不更新）"""
+    st = st or path.stat()
+    return max(st.st_atime, st.st_mtime)
+
+
+def scan_entries(root):
+    """遍历缓存目录，返回 {路径: {'size', 'used'}}（重建索引用）"""
+    entries = {}
+    for child in root.iterdir():
+        if not child.is_dir():
+            continue
+        if child.name == DIAGRAMS_DIR:
+            for bucket in child.iterdir():
+                if not bucket.is_dir():
+                    continue
+                for path in bucket.iterdir():
+                    st = path.stat()
+                    entries[f'{DIAGRAMS_DIR}/{bucket.name}/{path.name}'] = {
+                        'size': st.st_size, 'used': _last_used(path, st)}
+            continue
+        for path in child.iterdir():
+            relative = f'{child.name}/{path.name}'
+            if path.is_dir():
+                files = [p for p in path.iterdir() if p.is_file()]
+                # 目录的访问时间在列出内容时就会更新（包括本次遍历），只看修改时间
+                used = max([path.stat().st_mtime] + [_last_used(p) for p in files])
+                entries[relative] = {'size': sum(p.stat().st_size for p in files), 'used': used}
+            elif path.name == SECTION_CACHE_NAME:
+                entries[relative] = {'size': path.stat().st_size, 'used': _last_used(path)}
+    return entries
+
+
+def load_entries(index, rescan=False):
+    """读取缓存条目（索引缺失或指定 rescan 时遍历缓存目录并重建索引）
+
+    会话目录在生成 SVG/HTML 后会变大，大小按当前内容重新统计；已不存在的会话从索引中删除。
+
+    Args:
+        index: CacheIndex（记录读到的位置，之后的重写据此合并其他进程追加的行）
+
+    Returns:
+        tuple: ({路径: {'size', 'used'}}, 是否重建了索引)
+    """
+    root = index.root
+    entries, lines = (None, 0) if rescan else index.load()
+    if entries is None:
+        # 遍历期间其他进程追加的行在重写时合并
+        index.mark()
+        entries = scan_entries(root)
+        index.rewrite(entries)
+        return entries, True
+
+    stale = False
+    for path in list(entries):
+        kind = entry_kind(path)
+        if kind is None:
+            del entries[path]
+            stale = True
+        elif kind == SESSION:
+            session_dir = root / path
+            if not session_dir.is_dir():
+                del entries[path]
+                stale = True
+            else:
+                entries[path]['size'] = entry_size(session_dir)
+    if stale or (lines > 2 * len(entries) and lines > COMPACT_MIN_LINES):
+        index.rewrite(entries)
+    return entries, False
+
+
+def html_sessions(html_path):
+    """HTML 中 AI 占位符的会话ID集合（分块读取，内存与页面大小无关）"""
+    sessions = set()
+    tail = b''
+    with open(html_path, 'rb') as f:
+        while True:
+            chunk = f.read(_READ_CHUNK)
+            if not chunk:
+                break
+            data = tail + chunk
+            sessions.update(m.group(1) for m in _SESSION_MARKER.finditer(data))
+            tail = data[-_MARKER_OVERLAP:]
+    return {session.decode('ascii') for session in sessions}
+
+
+def _session_html(root, path):
+    """会话对应的 HTML：文档旁的 {文档名}.html，或 extracted.json 记录的 html_file"""
+    doc_name = path.split('/')[0]
+    html_path = root.parent / f'{doc_name}.html'
+    if html_path.exists():
+        return html_path
+    try:
+        with open(root / path / 'extracted.json', 'r', encoding='utf-8') as f:
+            recorded = Path(json.load(f).get('html_file') or '')
+    except (OSError, ValueError, AttributeError):
+        return None
+    for candidate in (recorded, root.parent / recorded.name):
+        if candidate.name and candidate.is_file():
+            return candidate
+    return None
+
+
+def find_orphans(root, entries, now=None):
+    """孤立会话：HTML 已不存在或已不含该会话的占位符
+
+    Returns:
+        dict: {路径: 原因}
+    """
+    now = time.time() if now is None else now
+    orphans = {}
+    live = {}  # {HTML 路径: 会话ID集合}（每个 HTML 只读一遍）
+    for path, entry in entries.items():
+        if entry_kind(path) != SESSION or now - entry['used'] < ORPHAN_GRACE:
+            continue
+        html_path = _session_html(root, path)
+        if html_path is None:
+            orphans[path] = 'HTML 不存在'
+            continue
+        if html_path not in live:
+            try:
+                live[html_path] = html_sessions(html_path)
+            except OSError:
+                live[html_path] = set()
+        if path.split('/')[1] not in live[html_path]:
+            orphans[path] = f'{html_path.name} 已不含该会话的占位符'
+    return orphans
+
+
+def compressed_siblings(root):
+    """文档目录中 HTML 的预压缩文件
+
+    Returns:
+        list: [(路径, 大小, 源 HTML 是否已删除)]
+    """
+    doc_dir = root.parent
+    siblings = []
+    for suffix in COMPRESSED_SUFFIXES.values():
+        for path in doc_dir.glob(f'*.html{suffix}'):
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            siblings.append((path, size, not path.with_name(path.name[:-len(suffix)]).exists()))
+    return siblings
+
+
+def assets_summary(assets_dir):
+    """外部资源目录统计：资源清单引用的为当前版本，其余为旧版本（含各自的预压缩文件）"""
+    current = set(read_asset_manifest(assets_dir).values())
+    summary = {'files': 0, 'size': 0, 'old': 0, 'old_size': 0}
+    for path in assets_dir.iterdir():
+        if not path.is_file() or path.name == ASSET_MANIFEST_NAME:
+            continue
+        size = path.stat().st_size
+        name = path.name
+        for suffix in COMPRESSED_SUFFIXES.values():
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        summary['files'] += 1
+        summary['size'] += size
+        if name not in current:
+            summary['old'] += 1
+            summary['old_size'] += size
+    return summary
+
+
+def inspect_root(root, rescan=False, now=None):
+    """统计一个缓存目录
+
+    Returns:
+        dict: {'root', 'index', 'entries', 'orphans', 'compressed', 'manifest_size', 'rescanned'}
+    """
+    index = CacheIndex(root)
+    entries, rescanned = load_entries(index, rescan)
+    try:
+        manifest_size = (root / MANIFEST_NAME).stat().st_size
+    except OSError:
+        manifest_size = 0
+    return {
+        'root': root,
+        'index': index,
+        'entries': entries,
+        'orphans': find_orphans(root, entries, now),
+        'compressed': compressed_siblings(root),
+        'manifest_size': manifest_size,
+        'rescanned': rescanned,
+    }
+
+
+def print_stats(reports, assets_dirs, now=None):
+    """输出统计"""
+    now = time.time() if now is None else now
+    total = 0
+    orphan_count = orphan_size = 0
+
+    for report in reports:
+        entries = report['entries']
+        note = '，已重建索引' if report['rescanned'] else ''
+        print(f"📁 {report['root']}（{len(entries)} 个条目{note}）")
+        for kind, label in KIND_LABELS.items():
+            sizes = [e['size'] for p, e in entries.items() if entry_kind(p) == kind]
+            detail = ''
+            if kind == SESSION and report['orphans']:
+                detail = f"（孤立 {len(report['orphans'])} 个）"
+            print(f"   {label}：{len(sizes)} 个，{format_size(sum(sizes))}{detail}")
+            total += sum(sizes)
+        if report['manifest_size']:
+            print(f"   构建清单：{format_size(report['manifest_size'])}")
+
+        compressed = report['compressed']
+        if compressed:
+            stale = [size for _, size, orphan in compressed if orphan]
+            detail = f"（源 HTML 已删除 {len(stale)} 个）" if stale else ''
+            print(f"   预压缩文件：{len(compressed)} 个，{format_size(sum(s for _, s, _ in compressed))}{detail}")
+            orphan_count += len(stale)
+            orphan_size += sum(stale)
+
+        if entries:
+            oldest = min(e['used'] for e in entries.values())
+            print(f"   最久未使用：{datetime.fromtimestamp(oldest):%Y-%m-%d %H:%M}（{format_age(now - oldest)}前）")
+
+        orphans = sorted(report['orphans'].items())
+        for path, reason in orphans[:10]:
+            print(f"   👻 {path}：{reason}")
+        if len(orphans) > 10:
+            print(f"   👻 …… 另有 {len(orphans) - 10} 个孤立会话")
+        orphan_count += len(orphans)
+        orphan_size += sum(entries[path]['size'] for path, _ in orphans)
+
+    for assets_dir in assets_dirs:
+        summary = assets_summary(assets_dir)
+        print(f"📦 外部资源 {assets_dir}：{summary['files']} 个文件，{format_size(summary['size'])}"
+              f"（旧版本 {summary['old']} 个，{format_size(summary['old_size'])}，可能仍被已部署的页面引用，不自动清理）")
+
+    print(f"\n📊 合计：{len(reports)} 个缓存目录，{format_size(total)}")
+    if orphan_count:
+        print(f"👻 孤立项：{orphan_count} 个，{format_size(orphan_size)}"
+              f"（convert.py cache prune --orphans 清理）")
+
+
+def plan_prune(reports, older_than=None, max_size=None, orphans=False, now=None):
+    """选出要删除的缓存
+
+    Args:
+        reports: inspect_root() 的结果列表
+        older_than: 删除超过该秒数未使用的条目
+        max_size: 所有缓存目录合计的大小上限（字节），按最近使用时间从旧到新淘汰
+        （两者都不删除未孤立的会话目录：HTML 仍含其占位符，replace_svg.py 还要读取 extracted.json）
+        orphans: 删除孤立会话和源 HTML 已删除的预压缩文件
+
+    Returns:
+        tuple: ([(report, 路径 或 Path, 大小, 原因)], 淘汰后的合计大小)
+    """
+    now = time.time() if now is None else now
+    victims = []
+    remaining = 0
+    candidates = []
+
+    for report in reports:
+        for path, entry in report['entries'].items():
+            evictable = entry_kind(path) != SESSION or path in report['orphans']
+            if orphans and path in report['orphans']:
+                reason = '孤立'
+            elif evictable and older_than is not None and now - entry['used'] > older_than:
+                reason = f"{format_age(now - entry['used'])}未使用"
+            else:
+                remaining += entry['size']
+                if evictable:
+                    candidates.append((entry['used'], report, path, entry['size']))
+                continue
+            victims.append((report, path, entry['size'], reason))
+        if orphans:
+            for path, size, orphan in report['compressed']:
+                if orphan:
+                    victims.append((report, path, size, '源 HTML 已删除'))
+
+    if max_size is not None:
+        candidates.sort(key=lambda item: item[0])
+        for used, report, path, size in candidates:
+            if remaining <= max_size:
+                break
+            victims.append((report, path, size, f"LRU（{format_age(now - used)}未使用）"))
+            remaining -= size
+    return victims, remaining
+
+
+def _label(path):
+    """删除项的类型名称（缓存条目为相对路径，预压缩文件为 Path）"""
+    return KIND_LABELS[entry_kind(path)] if isinstance(path, str) else '预压缩文件'
+
+
+def apply_prune(victims):
+    """删除选出的缓存，并更新各缓存目录的索引（重写为快照）
+
+    Returns:
+        int: 实际释放的字节数
+    """
+    freed = 0
+    touched = {}
+    for report, path, size, _ in victims:
+        target = path if isinstance(path, Path) else report['root'] / path
+        try:
+            if target.is_dir():
+                shutil.rmtree(target)
+            else:
+                target.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️  无法删除 {target}：{e}")
+            continue
+        freed += size
+        if isinstance(path, str):
+            report['entries'].pop(path, None)
+            touched[id(report)] = report
+            # 删除后变空的 {文档名}/ 和 .diagrams/{哈希前2位}/
+            try:
+                target.parent.rmdir()
+            except OSError:
+                pass
+
+    for report in touched.values():
+        report['index'].rewrite(report['entries'])
+    return freed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='convert.py cache',
+        description='统计和清理文档目录下的 .cvt-caches 缓存')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True  # add_subparsers(required=) 需要 Python 3.7
+    stats_parser = commands.add_parser('stats', help='占用统计与孤立会话')
+    prune_parser = commands.add_parser('prune', help='删除孤立、过期或超出大小上限的缓存')
+    for sub in (stats_parser, prune_parser):
+        sub.add_argument('dirs', nargs='*', default=['.'],
+                         help='文档目录（递归查找 .cvt-caches，默认当前目录）')
+        sub.add_argument('--rescan', action='store_true',
+                         help=f'遍历缓存目录重建索引（{INDEX_NAME} 缺失时自动重建）')
+    prune_parser.add_argument('--orphans', action='store_true',
+                              help='删除孤立会话（HTML 已不含其占位符）和源 HTML 已删除的预压缩文件')
+    prune_parser.add_argument('--older-than', default=None,
+                              help='删除超过该时长未使用的缓存（仍在使用的会话目录除外），如 30d、12h')
+    prune_parser.add_argument('--max-size', default=None,
+                              help='所有缓存目录合计的大小上限，如 500M：按最近使用时间从旧到新淘汰')
+    prune_parser.add_argument('--dry-run', '-n', action='store_true', help='只列出要删除的缓存，不删除')
+    args = parser.parse_args(argv)
+
+    older_than = max_size = None
+    try:
+        if args.command == 'prune':
+            if not (args.orphans or args.older_than or args.max_size):
+                raise ValueError("请指定 --orphans、--older-than 或 --max-size")
+            if args.older_than:
+                older_than = parse_duration(args.older_than)
+            if args.max_size:
+                max_size = parse_memory_size(args.max_size)
+        roots, assets_dirs = find_cache_roots(args.dirs)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not roots and not assets_dirs:
+        print(f"⚠️  未找到缓存目录（{CACHE_DIR_NAME}）")
+        return
+
+    now = time.time()
+    reports = [inspect_root(root, args.rescan, now) for root in roots]
+    if args.command == 'stats':
+        print_stats(reports, assets_dirs, now)
+        return
+
+    victims, remaining = plan_prune(reports, older_than, max_size, args.orphans, now)
+    if not victims:
+        print(f"✅ 没有需要清理的缓存（合计 {format_size(remaining)}）")
+        return
+
+    by_kind = {}
+    for _, path, size, _ in victims:
+        count, total = by_kind.get(_label(path), (0, 0))
+        by_kind[_label(path)] = (count + 1, total + size)
+
+    if args.dry_run:
+        for report, path, size, reason in victims[:20]:
+            target = path if isinstance(path, Path) else report['root'] / path
+            print(f"   🗑️  {target}（{format_size(size)}，{reason}）")
+        if len(victims) > 20:
+            print(f"   🗑️  …… 另有 {len(victims) - 20} 项")
+        freed = sum(size for _, _, size, _ in victims)
+        print(f"\n🔍 试运行：将删除 {len(victims)} 项，释放 {format_size(freed)}")
+    else:
+        freed = apply_prune(victims)
+        print(f"🧹 已删除 {len(victims)} 项，释放 {format_size(freed)}")
+    for label, (count, total) in by_kind.items():
+        print(f"   - {label}：{count} 个，{format_size(total)}")
+    print(f"📊 剩余缓存：{format_size(remaining)}")
+    if max_size is not None and remaining > max_size:
+        print(f"⚠️  仍超出上限 {format_size(max_size)}：进行中的会话目录（HTML 仍含其占位符）不淘汰")
+
+
+if __name__ == '__main__':
+    main()
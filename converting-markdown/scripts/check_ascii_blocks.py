@@ -10,15 +10,10 @@
     输出未标注的代码块位置
 """
 
-import re
 import sys
 from pathlib import Path
 
-
-def has_box_chars(text):
-    """检查文本是否包含 ASCII 框线字符"""
-    box_chars = set('┌─│└┘┐┬┼┴├┤┤┘┌┐└─│╭╮╰╯═║╗╚╝╔═')
-    return any(char in box_chars for char in text)
+from md_scanner import has_box_chars, scan_markdown
 
 
 def check_markdown_file(file_path):
@@ -26,28 +21,22 @@ def check_markdown_file(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    # 匹配所有代码块
-    # 格式：```language\ncode\n```
-    # 使用贪婪匹配避免提前终止，假设代码块内容中不包含反引号
-    # [^`\n]* 匹配语言标识符（可以包含冒号等非单词字符）
-    code_block_pattern = re.compile(r'```([^`\n]*)\n([^`]+)```', re.DOTALL)
-    blocks = code_block_pattern.finditer(content)
+    # 单遍扫描所有围栏代码块（行号在扫描时已计算）
+    blocks = scan_markdown(content).fences
 
     issues = []
     checked_count = 0
     ascii_count = 0
 
     for block in blocks:
-        lang = block.group(1)
-        code = block.group(2)
+        lang = block.info
 
         # 只检查包含框线字符的代码块
-        if has_box_chars(code):
+        if has_box_chars(block.code):
             checked_count += 1
 
-            # 获取代码块位置（行号）
-            start_pos = block.start()
-            line_num = content[:start_pos].count('\n') + 1
+            # 代码块位置（行号）
+            line_num = block.line
 
             # 检查是否标注了 ascii: 类型
             if lang.startswith('ascii:'):
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻转换进程客户端
+把 convert / check / validate 请求转发给 `convert.py serve` 启动的常驻进程，
+省去每次调用的解释器启动和模块导入时间
+
+使用方法：
+    python3 client.py convert document.md --theme blue   # 同 convert.py 参数
+    python3 client.py check document.md                  # 同 check_ascii_blocks.py
+    python3 client.py validate proposal.md               # 同 validate_proposal.py
+    python3 client.py stats                              # 队列深度与延迟统计
+    python3 client.py stop                               # 停止常驻进程
+
+常驻进程未启动时，convert / check / validate 自动在本地执行。
+
+本模块只依赖标准库中的轻量模块，保证客户端自身启动足够快。
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# 可转发的操作：{操作: 脚本路径}
+SCRIPTS = {
+    'convert': SCRIPTS_DIR / 'convert.py',
+    'check': SCRIPTS_DIR / 'check_ascii_blocks.py',
+    'validate': SCRIPTS_DIR.parents[1] / 'presales-proposal' / 'scripts' / 'validate_proposal.py',
+}
+
+# 需要转发给常驻进程的环境变量（影响转换结果；SOURCE_DATE_EPOCH 默认启用可复现构建）
+FORWARD_ENV = ('AI_SVG_CONVERSION', 'CVT_CACHE_DIR', 'SOURCE_DATE_EPOCH')
+
+# 只能在本地执行的 convert.py 子命令
+LOCAL_ONLY = {'serve', 'batch', 'watch'}
+
+
+def default_socket_path():
+    """常驻进程套接字路径（CVT_SOCKET 环境变量优先）"""
+    if os.environ.get('CVT_SOCKET'):
+        return Path(os.environ['CVT_SOCKET'])
+    root = os.environ.get('CVT_CACHE_DIR') or Path.home() / '.cache' / 'converting-markdown'
+    return Path(root) / 'convert.sock'
+
+
+class Client:
+    """常驻进程客户端（一个连接可发送多个请求）"""
+
+    def __init__(self, socket_path=None, timeout=None):
+        self.socket_path = Path(socket_path or default_socket_path())
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        # 未启动时抛出 FileNotFoundError / ConnectionRefusedError
+        self.sock.connect(str(self.socket_path))
+        self.reader = self.sock.makefile('r', encoding='utf-8')
+
+    def request(self, op, **fields):
+        """发送一个请求并等待响应
+
+        协议：每行一个 JSON 对象（请求和响应都以换行结束）
+        """
+        fields['op'] = op
+        self.sock.sendall(json.dumps(fields, ensure_ascii=False).encode('utf-8') + b'\n')
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('常驻进程已断开连接')
+        return json.loads(line)
+
+    def run(self, op, args, cwd=None):
+        """转发脚本调用，返回 {'exit_code', 'stdout', 'stderr'}"""
+        env = {name: os.environ[name] for name in FORWARD_ENV if name in os.environ}
+        return self.request(op, args=list(args), cwd=str(cwd or Path.cwd()), env=env)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def connect(socket_path=None):
+    """连接常驻进程，未启动时返回 None"""
+    try:
+        return Client(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def run_locally(op, args):
+    """常驻进程不可用时，直接执行对应脚本（替换当前进程）"""
+    script = str(SCRIPTS[op])
+    sys.stdout.flush()
+    os.execv(sys.executable, [sys.executable, script] + list(args))
+
+
+def print_stats(stats):
+    """输出常驻进程统计"""
+    print("=" * 60)
+    print("📡 常驻转换进程状态")
+    print("=" * 60)
+    print(f"🆔 PID：{stats['pid']}，运行 {stats['uptime']:.0f} s")
+    print(f"⚙️  工作进程：{stats['workers']}")
+    print(f"📥 排队：{stats['queue_depth']}，执行中：{stats['running']}")
+    print(f"📊 已完成：{stats['completed']}（失败 {stats['failed']}）")
+    for op, item in sorted(stats['ops'].items()):
+        print(f"\n   {op}：{item['count']} 次")
+        print(f"      延迟 p50 {item['p50_ms']:.1f} ms，p95 {item['p95_ms']:.1f} ms，"
+              f"max {item['max_ms']:.1f} ms")
+        print(f"      排队 p50 {item['wait_p50_ms']:.1f} ms，p95 {item['wait_p95_ms']:.1f} ms")
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in list(SCRIPTS) + ['stats', 'stop']:
+        print("用法: python3 client.py {convert|check|validate|stats|stop} [参数...]")
+        print("\n示例:")
+        print("  python3 client.py convert document.md --theme blue")
+        print("  python3 client.py check document.md")
+        print("  python3 client.py stats")
+        sys.exit(1)
+
+    op, args = argv[0], argv[1:]
+
+    if op == 'convert' and args and args[0] in LOCAL_ONLY:
+        run_locally(op, args)
+
+    client = connect()
+    if client is None:
+        if op in SCRIPTS:
+            print("💡 未检测到常驻进程，本地执行（启动：python3 scripts/convert.py serve）",
+                  file=sys.stderr)
+            run_locally(op, args)
+        print(f"❌ 常驻进程未运行：{default_socket_path()}")
+        sys.exit(1)
+
+    with client:
+        if op == 'stats':
+            print_stats(client.request('stats'))
+            return
+        if op == 'stop':
+            client.request('shutdown')
+            print("✅ 常驻进程已停止")
+            return
+
+        response = client.run(op, args)
+
+    if 'error' in response:
+        print(f"❌ {response['error']}", file=sys.stderr)
+        sys.exit(1)
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    sys.exit(response['exit_code'])
+
+
+if __name__ == '__main__':
+    main()
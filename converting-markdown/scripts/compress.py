@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预压缩输出（--precompress）
+在 HTML 旁写出 .gz（以及安装了 brotli 模块时的 .br），静态服务器可以直接发送压缩文件，
+不必在请求时压缩（nginx gzip_static / brotli_static、Caddy precompressed 等）。
+
+    - 压缩在后台线程池中进行（zlib / brotli 压缩时释放 GIL），不增加转换耗时
+    - HTML 每次改写前删除旧的压缩文件，服务器不会发送过期内容
+    - 压缩期间 HTML 又被改写时丢弃本次结果
+    - 可复现构建时 gzip 头部的时间固定（SOURCE_DATE_EPOCH 或 0），相同 HTML 得到相同的 .gz
+"""
+
+import gzip
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fileutil import atomic_write_bytes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 压缩格式：{格式: 文件后缀}
+COMPRESSED_SUFFIXES = {'gzip': '.gz', 'brotli': '.br'}
+
+# 压缩级别（1 ~ 9；gzip 为 compresslevel，brotli 为 quality）
+DEFAULT_LEVEL = 9
+
+# 后台压缩线程数上限
+MAX_WORKERS = 4
+
+
+def reproducible_mtime():
+    """可复现构建时 gzip 头部记录的时间：SOURCE_DATE_EPOCH（已设置时），否则为 0"""
+    try:
+        return int(os.environ.get('SOURCE_DATE_EPOCH') or 0)
+    except ValueError:
+        return 0
+
+
+def available_formats():
+    """当前环境可用的压缩格式"""
+    return ['gzip', 'brotli'] if brotli is not None else ['gzip']
+
+
+def parse_level(value):
+    """解析压缩级别（1 ~ 9）"""
+    try:
+        level = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"压缩级别必须是 1 ~ 9 的整数：{value}")
+    if not 1 <= level <= 9:
+        raise ValueError(f"压缩级别必须是 1 ~ 9 的整数：{value}")
+    return level
+
+
+def compressed_path(path, fmt):
+    """压缩文件路径（doc.html → doc.html.gz）"""
+    path = Path(path)
+    return path.with_name(path.name + COMPRESSED_SUFFIXES[fmt])
+
+
+def remove_compressed(path):
+    """删除 HTML 旁的压缩文件（HTML 改写前调用，避免服务器发送过期内容）"""
+    for fmt in COMPRESSED_SUFFIXES:
+        try:
+            os.unlink(compressed_path(path, fmt))
+        except FileNotFoundError:
+            pass
+
+
+def compress_bytes(data, fmt, level=DEFAULT_LEVEL, mtime=None):
+    """按格式压缩数据"""
+    if fmt == 'gzip':
+        # gzip.compress 的 mtime 参数需要 Python 3.8
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=level, mtime=mtime) as f:
+            f.write(data)
+        return buffer.getvalue()
+    return brotli.compress(data, quality=level)
+
+
+def is_compressed_fresh(path, formats):
+    """压缩文件是否都存在且不早于 HTML"""
+    try:
+        html_mtime = os.stat(path).st_mtime_ns
+        return all(os.stat(compressed_path(path, fmt)).st_mtime_ns >= html_mtime for fmt in formats)
+    except OSError:
+        return False
+
+
+def compress_file(path, formats, level=DEFAULT_LEVEL, mtime=None):
+    """写出 HTML 的各格式压缩文件
+
+    Args:
+        path: HTML 文件路径
+        formats: 压缩格式列表
+        level: 压缩级别
+        mtime: gzip 头部记录的时间（默认为 HTML 的修改时间；可复现构建时传入固定值）
+
+    Returns:
+        dict: {格式: 压缩后字节数}；压缩期间 HTML 被改写时返回空字典（结果已丢弃）
+    """
+    path = Path(path)
+    st = path.stat()
+    data = path.read_bytes()
+
+    sizes = {}
+    for fmt in formats:
+        # gzip 头部默认记录原文件的修改时间（与 gzip 命令一致）
+        compressed = compress_bytes(data, fmt, level, mtime=st.st_mtime if mtime is None else mtime)
+        target = compressed_path(path, fmt)
+        atomic_write_bytes(target, compressed)
+        sizes[fmt] = len(compressed)
+
+    # 压缩期间 HTML 又被改写：刚写出的压缩文件已过期，删除（由新一轮压缩重新生成）
+    current = path.stat()
+    if (current.st_size, current.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        remove_compressed(path)
+        return {}
+    return sizes
+
+
+class Precompressor:
+    """后台预压缩（线程池）
+
+        with Precompressor() as compressor:
+            compressor.submit(html_path)   # 立即返回，压缩在后台进行
+        # 退出 with 时等待全部完成
+    """
+
+    def __init__(self, formats=None, level=DEFAULT_LEVEL, workers=None, mtime=None):
+        self.formats = list(formats or available_formats())
+        self.level = level
+        self.mtime = mtime  # gzip 头部时间（None 表示 HTML 的修改时间）
+        self.executor = ThreadPoolExecutor(max_workers=workers or min(MAX_WORKERS, os.cpu_count() or 1),
+                                           thread_name_prefix='cvt-compress')
+        self.pending = {}   # {路径: Future}
+        self.results = []   # [(路径, {格式: 字节数} 或 None, 错误信息或 None)]
+
+    def submit(self, path, only_stale=False):
+        """提交压缩任务（同一文件尚未开始的旧任务会被取消）
+
+        Args:
+            path: HTML 文件路径
+            only_stale: 压缩文件都存在且不早于 HTML 时跳过（未重新转换的文档）
+        """
+        path = Path(path)
+        if only_stale and is_compressed_fresh(path, self.formats):
+            return
+        previous = self.pending.pop(path, None)
+        if previous is not None:
+            previous.cancel()
+        self.pending[path] = self.executor.submit(self._run, path)
+
+    def _run(self, path):
+        try:
+            sizes = compress_file(path, self.formats, self.level, self.mtime)
+            error = None
+        except Exception as e:
+            # 后台线程中的异常不会自动输出，记录后由 print_compression 报告
+            sizes, error = None, f"{type(e).__name__}: {e}"
+        self.results.append((path, sizes, error))
+
+    def close(self):
+        """等待全部压缩完成
+
+        Returns:
+            list: [(路径, {格式: 字节数} 或 None, 错误信息或 None)]
+        """
+        self.executor.shutdown(wait=True)
+        self.pending.clear()
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def print_compression(results, verbose=True):
+    """输出预压缩结果（verbose=False 时只输出汇总和错误）"""
+    files = [(path, sizes) for path, sizes, error in results if sizes]
+    if verbose:
+        for path, sizes in files:
+            detail = '，'.join(f"{compressed_path(path, fmt).name} {size / 1024:.1f} KB"
+                              for fmt, size in sizes.items())
+            print(f"🗜️  预压缩：{detail}")
+    elif files:
+        suffixes = ' '.join(COMPRESSED_SUFFIXES[fmt] for fmt in files[0][1])
+        print(f"🗜️  预压缩：{len(files)} 个文件（{suffixes}）")
+    for path, _, error in results:
+        if error:
+            print(f"⚠️  预压缩失败：{path}: {error}")
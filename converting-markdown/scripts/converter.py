@@ -0,0 +1,900 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown 转换库
+供 convert.py（命令行）、batch.py（批量）和常驻进程内嵌调用
+
+    from converter import Converter
+
+    converter = Converter('blue')
+    result = converter.convert(markdown_text)   # str 或 bytes
+    result.html        # 完整 HTML 页面
+    result.toc         # 目录树
+    result.diagrams    # ASCII 图列表
+    result.timings     # 各阶段耗时（秒）
+
+    # 低内存模式：转换器自己读取输入，页面边生成边写出，不保留完整 HTML
+    with open('doc.md', encoding='utf-8') as src, open('doc.html', 'w', encoding='utf-8') as out:
+        converter.convert(src, out=out)
+
+    # 流式模式：按 H1/H2 逐节读取和渲染，内存峰值取决于最大的章节
+    with open('doc.md', encoding='utf-8') as src, open('doc.html', 'w', encoding='utf-8') as out:
+        converter.convert_stream(src, out)
+
+转换过程不输出任何信息、不自行打开文件；主题和页面外壳在构造时加载，
+Markdown 实例在每次转换前重置后复用，适合长驻进程连续转换大量文档。
+"""
+
+import hashlib
+import html
+import os
+import random
+import re
+import shutil
+import tempfile
+from functools import partial
+
+from themes import get_theme
+from diagram_cache import diagram_key
+from md_scanner import (scan_markdown, iter_tokens, iter_sections, iter_text_lines, split_sections,
+                        Heading, MetaLine, Rule)
+from page_shell import get_page_shell
+from minify import minify_html
+from heading_ids import HeadingIdExtension, HeadingIdRegistry
+from profiling import Profiler
+from sections import (create_markdown, render_section, collect_references, join_sections,
+                      render_deferred, resolve_heading_ids, new_marker_token,
+                      ParallelRenderer, scan_references, REFERENCE_CANDIDATE)
+from section_cache import section_key, references_digest, SECTION_LEVEL
+
+
+def ai_svg_enabled():
+    """是否启用 AI 图形生成模式（AI_SVG_CONVERSION=true）"""
+    return os.environ.get('AI_SVG_CONVERSION', 'false').lower() == 'true'
+
+
+def reproducible_enabled():
+    """是否默认启用可复现构建（设置了 SOURCE_DATE_EPOCH 环境变量，reproducible-builds.org 约定）"""
+    return bool(os.environ.get('SOURCE_DATE_EPOCH'))
+
+
+def convert_architecture_svg(content, placeholder_id, session_id, cache_key='', ai_enabled=None):
+    """转换架构图为SVG
+
+    模式1（保留原样）：直接输出ASCII代码块
+    模式2（智能转换）：输出特殊标记，等待AI Agent生成SVG
+
+    Args:
+        content: ASCII图内容
+        placeholder_id: 占位符ID (1, 2, 3...)
+        session_id: 会话唯一标识 (6位随机号)
+        cache_key: 图形缓存键（AI 生成结果按此键持久化）
+        ai_enabled: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+    """
+    if ai_enabled is None:
+        ai_enabled = ai_svg_enabled()
+
+    if ai_enabled:
+        # 智能转换模式：输出AI可识别的标记
+        return f'''<!-- AI-SVG-ARCHITECTURE-START:id={placeholder_id},session={session_id} -->
+<div class="ai-svg-placeholder" data-id="{placeholder_id}" data-session="{session_id}" data-type="architecture" data-key="{cache_key}">
+  <div style="background: #fff7e6; border: 2px dashed #fa8c16; border-radius: 8px; padding: 20px; margin: 25px 0; text-align: center;">
+    <p style="color: #fa8c16; font-size: 14px; margin: 0;">🤖 AI Agent正在生成架构图SVG...</p>
+    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">原始内容已导出到缓存目录，等待智能处理</p>
+  </div>
+</div>
+<!-- AI-SVG-ARCHITECTURE-END:id={placeholder_id},session={session_id} -->'''
+    else:
+        # 保留原样模式：输出ASCII代码块
+        return f'''<div style="background: #f8f9fa; border: 2px solid #e8e8e8; border-radius: 8px; padding: 20px; margin: 25px 0;">
+<pre><code style="font-family: 'Courier New', monospace; white-space: pre; line-height: 1.5;">{content}</code></pre>
+</div>'''
+
+
+def convert_flowchart_svg(content, placeholder_id, session_id, cache_key='', ai_enabled=None):
+    """转换流程图为SVG
+
+    Args:
+        content: ASCII图内容
+        placeholder_id: 占位符ID (1, 2, 3...)
+        session_id: 会话唯一标识 (6位随机号)
+        cache_key: 图形缓存键（AI 生成结果按此键持久化）
+        ai_enabled: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+    """
+    if ai_enabled is None:
+        ai_enabled = ai_svg_enabled()
+
+    if ai_enabled:
+        return f'''<!-- AI-SVG-FLOWCHART-START:id={placeholder_id},session={session_id} -->
+<div class="ai-svg-placeholder" data-id="{placeholder_id}" data-session="{session_id}" data-type="flowchart" data-key="{cache_key}">
+  <div style="background: #fff7e6; border: 2px dashed #fa8c16; border-radius: 8px; padding: 20px; margin: 25px 0; text-align: center;">
+    <p style="color: #fa8c16; font-size: 14px; margin: 0;">🤖 AI Agent正在生成流程图SVG...</p>
+    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">原始内容已导出到缓存目录，等待智能处理</p>
+  </div>
+</div>
+<!-- AI-SVG-FLOWCHART-END:id={placeholder_id},session={session_id} -->'''
+    else:
+        return f'''<div style="background: #f8f9fa; border: 2px solid #e8e8e8; border-radius: 8px; padding: 20px; margin: 25px 0;">
+<pre><code style="font-family: 'Courier New', monospace; white-space: pre; line-height: 1.5;">{content}</code></pre>
+</div>'''
+
+
+def convert_ui_svg(content, placeholder_id, session_id, cache_key='', ai_enabled=None):
+    """转换UI图为HTML
+
+    Args:
+        content: ASCII图内容
+        placeholder_id: 占位符ID (1, 2, 3...)
+        session_id: 会话唯一标识 (6位随机号)
+        cache_key: 图形缓存键（AI 生成结果按此键持久化）
+        ai_enabled: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+    """
+    if ai_enabled is None:
+        ai_enabled = ai_svg_enabled()
+
+    if ai_enabled:
+        return f'''<!-- AI-SVG-UI-START:id={placeholder_id},session={session_id} -->
+<div class="ai-svg-placeholder" data-id="{placeholder_id}" data-session="{session_id}" data-type="ui" data-key="{cache_key}">
+  <div style="background: #fff7e6; border: 2px dashed #fa8c16; border-radius: 8px; padding: 20px; margin: 25px 0; text-align: center;">
+    <p style="color: #fa8c16; font-size: 14px; margin: 0;">🤖 AI Agent正在生成UI图HTML...</p>
+    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">原始内容已导出到缓存目录，等待智能处理</p>
+  </div>
+</div>
+<!-- AI-SVG-UI-END:id={placeholder_id},session={session_id} -->'''
+    else:
+        return f'''<div style="background: #f8f9fa; border: 2px solid #e8e8e8; border-radius: 8px; padding: 20px; margin: 25px 0;">
+<pre><code style="font-family: 'Courier New', monospace; white-space: pre; line-height: 1.5;">{content}</code></pre>
+</div>'''
+
+
+def convert_timeline_svg(content, placeholder_id, session_id, cache_key='', ai_enabled=None):
+    """转换时间线图为SVG
+
+    Args:
+        content: ASCII图内容
+        placeholder_id: 占位符ID (1, 2, 3...)
+        session_id: 会话唯一标识 (6位随机号)
+        cache_key: 图形缓存键（AI 生成结果按此键持久化）
+        ai_enabled: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+    """
+    if ai_enabled is None:
+        ai_enabled = ai_svg_enabled()
+
+    if ai_enabled:
+        return f'''<!-- AI-SVG-TIMELINE-START:id={placeholder_id},session={session_id} -->
+<div class="ai-svg-placeholder" data-id="{placeholder_id}" data-session="{session_id}" data-type="timeline" data-key="{cache_key}">
+  <div style="background: #fff7e6; border: 2px dashed #fa8c16; border-radius: 8px; padding: 20px; margin: 25px 0; text-align: center;">
+    <p style="color: #fa8c16; font-size: 14px; margin: 0;">🤖 AI Agent正在生成时间线图SVG...</p>
+    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">原始内容已导出到缓存目录，等待智能处理</p>
+  </div>
+</div>
+<!-- AI-SVG-TIMELINE-END:id={placeholder_id},session={session_id} -->'''
+    else:
+        return f'''<div style="background: #f8f9fa; border: 2px solid #e8e8e8; border-radius: 8px; padding: 20px; margin: 25px 0;">
+<pre><code style="font-family: 'Courier New', monospace; white-space: pre; line-height: 1.5;">{content}</code></pre>
+</div>'''
+
+
+def convert_diagram_svg(content, placeholder_id, session_id, cache_key='', ai_enabled=None):
+    """转换通用图为SVG
+
+    Args:
+        content: ASCII图内容
+        placeholder_id: 占位符ID (1, 2, 3...)
+        session_id: 会话唯一标识 (6位随机号)
+        cache_key: 图形缓存键（AI 生成结果按此键持久化）
+        ai_enabled: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+    """
+    if ai_enabled is None:
+        ai_enabled = ai_svg_enabled()
+
+    if ai_enabled:
+        return f'''<!-- AI-SVG-DIAGRAM-START:id={placeholder_id},session={session_id} -->
+<div class="ai-svg-placeholder" data-id="{placeholder_id}" data-session="{session_id}" data-type="diagram" data-key="{cache_key}">
+  <div style="background: #fff7e6; border: 2px dashed #fa8c16; border-radius: 8px; padding: 20px; margin: 25px 0; text-align: center;">
+    <p style="color: #fa8c16; font-size: 14px; margin: 0;">🤖 AI Agent正在生成通用图SVG...</p>
+    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">原始内容已导出到缓存目录，等待智能处理</p>
+  </div>
+</div>
+<!-- AI-SVG-DIAGRAM-END:id={placeholder_id},session={session_id} -->'''
+    else:
+        return f'''<div style="background: #f8f9fa; border: 2px solid #e8e8e8; border-radius: 8px; padding: 20px; margin: 25px 0;">
+<pre><code style="font-family: 'Courier New', monospace; white-space: pre; line-height: 1.5;">{content}</code></pre>
+</div>'''
+
+# 阶段1 生成的占位符
+PLACEHOLDER_PATTERN = re.compile(r'<!-- SVG-PLACEHOLDER-\d+ -->')
+
+# 默认目录层级：h2 ~ h3（h1 通常是文档标题）
+DEFAULT_TOC_DEPTH = '2-3'
+
+
+def parse_toc_depth(value):
+    """解析目录层级
+
+    Args:
+        value: "3"（h1~h3）或 "2-4"（h2~h4），与 Python-Markdown toc_depth 写法一致
+
+    Returns:
+        tuple: (最高层级, 最低层级)
+    """
+    text = str(value).strip()
+    try:
+        if '-' in text:
+            top, bottom = (int(part) for part in text.split('-', 1))
+        else:
+            top, bottom = 1, int(text)
+    except ValueError:
+        raise ValueError(f"目录层级格式错误：{value}（示例：3 或 2-4）")
+    if not 1 <= top <= bottom <= 6:
+        raise ValueError(f"目录层级超出范围：{value}（取值 1~6）")
+    return top, bottom
+
+
+def build_toc(entries, toc_depth=DEFAULT_TOC_DEPTH):
+    """由标题条目构建嵌套目录（单遍，线性时间）
+
+    Args:
+        entries: 标题条目列表 [{'level', 'id', 'text'}]（渲染时由 HeadingIdExtension 收集）
+        toc_depth: 目录层级，见 parse_toc_depth
+
+    Returns:
+        list: [{'text', 'id', 'level', 'children'}]
+    """
+    top, bottom = parse_toc_depth(toc_depth)
+    toc = []
+    stack = []  # 当前祖先链
+
+    for entry in entries:
+        level = entry['level']
+        if not top <= level <= bottom:
+            continue
+
+        item = {
+            'text': entry['text'],
+            'id': entry['id'],
+            'level': level,
+            'children': []
+        }
+
+        # 挂到最近的更高层级标题下，没有则作为根节点
+        while stack and stack[-1]['level'] >= level:
+            stack.pop()
+        (stack[-1]['children'] if stack else toc).append(item)
+        stack.append(item)
+
+    return toc
+
+
+def _append_toc_items(parts, items):
+    """递归输出目录项"""
+    for item in items:
+        link = f'<a href="#{item["id"]}" class="toc-link">{html.escape(item["text"], quote=False)}</a>'
+        if item['children']:
+            # 有子项：添加展开/折叠图标
+            parts.append(
+                f'<li class="toc-item toc-level-{item["level"]}">'
+                f'<div class="toc-h2-wrapper">{link}'
+                f'<span class="toc-toggle-icon" onclick="toggleH2Children(this)">▶</span></div>'
+                f'<ul class="toc-sublist collapsed">'
+            )
+            _append_toc_items(parts, item['children'])
+            parts.append('</ul></li>')
+        else:
+            parts.append(f'<li class="toc-item toc-level-{item["level"]}">{link}</li>')
+
+
+def generate_toc_html(toc):
+    """生成目录HTML"""
+    if not toc:
+        return ''
+
+    parts = ['<ul class="toc-list">']
+    _append_toc_items(parts, toc)
+    parts.append('</ul>')
+    return '\n'.join(parts)
+
+
+# 图类型到转换函数的映射（未知类型按通用图处理）
+DIAGRAM_RENDERERS = {
+    'architecture': convert_architecture_svg,
+    'flowchart': convert_flowchart_svg,
+    'ui': convert_ui_svg,
+    'timeline': convert_timeline_svg,
+}
+
+
+def new_session_id():
+    """生成 6 位随机会话号"""
+    return ''.join(random.choices('abcdef0123456789', k=6))
+
+
+def content_session_id(digest):
+    """由文档内容哈希得到 6 位会话号（可复现构建：相同输入得到相同的占位符和输出）"""
+    return hashlib.sha256(f'session:{digest}'.encode('ascii')).hexdigest()[:6]
+
+
+class ConversionResult:
+    """一次转换的结果"""
+
+    def __init__(self, html, title, metadata, toc, toc_html, diagrams, session_id, timings,
+                 sections=None):
+        self.html = html              # 完整 HTML 页面（写入 out 时为 None）
+        self.title = title            # 文档标题
+        self.metadata = metadata      # 元数据 {'编制单位', '编制日期', '版本号'}
+        self.toc = toc                # 目录树 [{'text', 'id', 'level', 'children'}]
+        self.toc_html = toc_html      # 目录 HTML
+        self.diagrams = diagrams      # ASCII 图 [{'id', 'placeholder', 'type', 'content', 'cache_key', 'cached'}]
+        self.session_id = session_id  # 会话ID（AI 占位符使用）
+        self.timings = timings        # 各阶段墙钟耗时（秒）
+        self.sections = sections      # 章节缓存统计 {'sections': 总节数, 'cached': 复用节数}
+        self.unchanged = False        # 输出与已有文件逐字节相同、未改写（可复现构建）
+
+    @property
+    def pending_diagrams(self):
+        """待 AI 生成的图（未命中图形缓存）"""
+        return [d for d in self.diagrams if d['cache_key'] and not d['cached']]
+
+    def placeholders(self):
+        """待 AI 生成的占位符（extracted.json 的 placeholders 格式）
+
+        Returns:
+            list: [{'id', 'type', 'raw_content', 'cache_key'}]，id 为字符串
+        """
+        return [{
+            'id': str(d['id']),
+            # 与占位符标记一致：未注册的类型按通用图（diagram）处理
+            'type': d['type'] if d['type'] in DIAGRAM_RENDERERS else 'diagram',
+            'raw_content': d['content'],
+            'cache_key': d['cache_key'],
+        } for d in self.pending_diagrams]
+
+
+class Converter:
+    """可复用的 Markdown 转换器
+
+    构造时加载主题、编译页面外壳、创建 Markdown 实例；
+    每次 convert() 只重置 Markdown 实例，不重复初始化。
+    同一实例不是线程安全的，多线程请每个线程各建一个。
+    """
+
+    def __init__(self, theme_name='purple', toc_depth=DEFAULT_TOC_DEPTH, ai_svg=None,
+                 external_assets=False, minify=False):
+        """
+        Args:
+            theme_name: 主题名称（不存在时抛出 ValueError）
+            toc_depth: 目录层级（格式错误时抛出 ValueError）
+            ai_svg: 是否生成 AI 占位符（默认读取 AI_SVG_CONVERSION 环境变量）
+            external_assets: 页面引用外部资源文件，不内联 CSS 和脚本（资源由 assets.py 写出）
+            minify: 压缩输出页面（minify.py；需要完整页面，不能与 out / convert_stream 同时使用）
+        """
+        self.theme = get_theme(theme_name)
+        self.external_assets = external_assets
+        self.minify = minify
+        self.shell = get_page_shell(self.theme, external_assets, minify)
+        parse_toc_depth(toc_depth)
+        self.toc_depth = toc_depth
+        self.ai_svg = ai_svg_enabled() if ai_svg is None else ai_svg
+        # 标题 ID 在渲染过程中分配，同时收集目录条目
+        self.heading_ids = HeadingIdExtension()
+        self.md = create_markdown(self.heading_ids)
+        self._parallel = None  # 分节并行渲染的进程池（jobs > 1 时创建）
+
+    def convert(self, source, session_id=None, diagram_cache=None, profiler=None, out=None, jobs=1,
+                section_cache=None, asset_base=''):
+        """转换 Markdown 文本
+
+        Args:
+            source: Markdown 文本（str，或 UTF-8 编码的 bytes），也可以是已打开的文件对象
+                    （由转换器读取，提取完成后即释放原文）
+            session_id: 会话ID（默认随机生成）
+            diagram_cache: 图形缓存（DiagramCache，可选；AI 模式下命中的图直接内联）
+            profiler: 剖析器（Profiler，可选；各阶段记录到其中）
+            out: 输出文本流（可选）。指定时页面分段写入 out，不在内存中拼出完整页面，
+                 result.html 为 None（低内存模式）
+            jobs: 渲染进程数。大于 1 时正文按章节切分后在进程池中并行渲染，
+                  输出与单进程渲染逐字节一致
+            section_cache: 章节缓存（SectionCache，可选）。指定时只渲染内容改变的章节，
+                           其余复用缓存的片段；新渲染的章节登记到缓存中，由调用方 save()
+            asset_base: 外部资源目录相对于页面的 URL 前缀（external_assets 模式下使用）
+
+        Returns:
+            ConversionResult
+        """
+        if out is not None and self.minify:
+            raise ValueError("压缩输出需要完整页面，不能与低内存模式同时使用")
+        profiler = profiler or Profiler(measure_bytes=False)
+        first_span = len(profiler.spans)
+
+        if hasattr(source, 'read'):
+            with profiler.stage('read') as span:
+                source = source.read()
+                span.output(source)
+        if isinstance(source, (bytes, bytearray)):
+            source = bytes(source).decode('utf-8')
+
+        session_id = session_id or new_session_id()
+        section_stats = None
+
+        if section_cache is not None:
+            # 章节缓存：切分章节，只渲染内容改变的章节，拼接时统一分配标题 ID 和图形编号
+            with profiler.stage('render', source=source) as span:
+                section_stats = {}
+                html_body, toc_entries, diagrams, title, metadata = self._render_cached(
+                    source, section_cache, jobs, section_stats)
+                span.args.update(section_stats)
+                span.output(html_body)
+            del source
+        else:
+            # 单遍扫描：围栏代码块、标题、元数据行、分隔线
+            with profiler.stage('scan', source=source):
+                scan = scan_markdown(source)
+
+            # ========== 阶段1：提取ASCII图并替换为占位符 ==========
+            with profiler.stage('extract', source=source) as span:
+                markdown_content, diagrams, title, metadata = self._extract(source, scan)
+                span.output(markdown_content)
+            del scan, source
+
+            # ========== 阶段2：用markdown库转换为HTML ==========
+            with profiler.stage('render', source=markdown_content) as span:
+                # 并行渲染；正文无法切分为多块时 render() 返回 None，改为整篇渲染
+                rendered = self._parallel_renderer(jobs).render(markdown_content) if jobs > 1 else None
+                if rendered is not None:
+                    html_body, toc_entries = rendered
+                    span.args['jobs'] = jobs
+                else:
+                    self.md.reset()
+                    html_body = self.md.convert(markdown_content)
+                    # Markdown 实例会保留最后一次的分行列表，转换后立即释放
+                    self.md.lines = []
+                    toc_entries = self.md.toc_entries
+                span.output(html_body)
+            del markdown_content, rendered
+
+        with profiler.stage('toc') as span:
+            toc = build_toc(toc_entries, self.toc_depth)
+            toc_html = generate_toc_html(toc)
+            span.output(toc_html)
+
+        if out is not None:
+            # 低内存模式：图形在写出时逐段替换，页面外壳和正文直接写入 out
+            with profiler.stage('diagrams') as span:
+                replacements = self._diagram_replacements(diagrams, session_id, diagram_cache)
+            with profiler.stage('write', source=html_body):
+                self.shell.write(out, title, toc_html, metadata,
+                                 lambda f: _write_spliced(f, html_body, replacements), asset_base)
+            return ConversionResult(None, title, metadata, toc, toc_html, diagrams, session_id,
+                                    profiler.timings(first_span), section_stats)
+
+        # ========== 阶段3：替换占位符为SVG（内存中完成） ==========
+        with profiler.stage('diagrams', source=html_body) as span:
+            if diagrams:
+                html_body = self._splice_diagrams(html_body, diagrams, session_id, diagram_cache)
+            span.output(html_body)
+
+        # 套用主题页面外壳（每个主题只编译一次，这里只做拼接）
+        with profiler.stage('shell', source=html_body) as span:
+            page = self.shell.render(title, toc_html, metadata, html_body, asset_base)
+            span.output(page)
+
+        if self.minify:
+            with profiler.stage('minify', source=page) as span:
+                page = minify_html(page)
+                span.output(page)
+
+        return ConversionResult(page, title, metadata, toc, toc_html, diagrams, session_id,
+                                profiler.timings(first_span), section_stats)
+
+    def _extract(self, source, scan):
+        """提取 ASCII 图（替换为占位符）、标题和元数据
+
+        Returns:
+            tuple: (markdown_content, diagrams, title, metadata)
+        """
+        # 正文从第一个分隔线（---）之后开始；没有分隔线时从文档开头开始
+        body_start = scan.rules[0].end if scan.rules else 0
+        header_end = scan.rules[0].start if scan.rules else len(source)
+
+        diagrams = []
+        markdown_content = _replace_ascii_blocks(
+            source, body_start, [b for b in scan.ascii_blocks() if b.start >= body_start], diagrams)
+
+        # 提取标题和元数据（只看第一个分隔线之前的部分，同字段取最后一次出现的值）
+        title = "方案文档"
+        metadata = {'编制单位': '', '编制日期': '', '版本号': ''}
+
+        for heading in scan.headings:
+            if heading.start >= header_end:
+                break
+            if heading.level == 1:
+                title = heading.text
+        for meta in scan.metadata:
+            if meta.start >= header_end:
+                break
+            metadata[meta.key] = meta.value
+
+        return markdown_content, diagrams, title, metadata
+
+    def convert_stream(self, src, out, session_id=None, diagram_cache=None, profiler=None,
+                       asset_base=''):
+        """分节流式转换（内存峰值取决于最大的章节，而不是整个文档）
+
+        逐行读取 Markdown，在代码块外的 H1/H2 处切分章节，每节独立渲染后立即写入临时文件；
+        标题 ID 跨节唯一，目录随渲染累积，最后套上页面外壳写入 out。输出与整篇转换一致。
+
+        Args:
+            src: 可 seek 的文本文件对象（先读文档头部和链接定义，再回到开头逐节读取）
+            out: 输出文本流
+            session_id: 会话ID（默认随机生成）
+            diagram_cache: 图形缓存（DiagramCache，可选）
+            profiler: 剖析器（Profiler，可选）
+            asset_base: 外部资源目录相对于页面的 URL 前缀
+
+        Returns:
+            ConversionResult（html 为 None）
+        """
+        if self.minify:
+            raise ValueError("压缩输出需要完整页面，不能与流式转换同时使用")
+        session_id = session_id or new_session_id()
+        profiler = profiler or Profiler(measure_bytes=False)
+        first_span = len(profiler.spans)
+        origin = src.tell()
+
+        # 第一遍：只读到第一个分隔线，取标题、元数据和正文起始行
+        with profiler.stage('header'):
+            title, metadata, body_line = _scan_header(src)
+
+        # 第二遍：收集全文的引用式链接定义（支持前向引用）
+        with profiler.stage('references'):
+            references = _stream_references(self.md, src, origin, body_line)
+        src.seek(origin)
+
+        diagrams = []
+        # 各节 HTML 先写入临时文件：目录在页面外壳中位于正文之前，要等所有章节渲染完才能生成
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            with profiler.stage('render') as span, self.heading_ids.shared_document():
+                rendered = self._render_sections(_skip_lines(src, body_line), references, diagrams,
+                                                 session_id, diagram_cache)
+                span.args['sections'] = join_sections(rendered, spool.write)
+                toc_entries = self.md.toc_entries
+
+            with profiler.stage('toc') as span:
+                toc = build_toc(toc_entries, self.toc_depth)
+                toc_html = generate_toc_html(toc)
+                span.output(toc_html)
+
+            with profiler.stage('write'):
+                spool.seek(0)
+                self.shell.write(out, title, toc_html, metadata,
+                                 lambda f: shutil.copyfileobj(spool, f), asset_base)
+
+        return ConversionResult(None, title, metadata, toc, toc_html, diagrams, session_id,
+                                profiler.timings(first_span))
+
+    def _render_sections(self, lines, references, diagrams, session_id, diagram_cache):
+        """逐节提取 ASCII 图、渲染并替换图形，产出 (HTML, 分隔)
+
+        原始 HTML 延续到某节末尾之后时，该节和其后的全部章节合并为一块渲染（与整篇渲染一致）。
+        """
+        pending = None  # 合并渲染的章节：(Markdown 片段, 第一个图的下标)
+        for section in iter_sections(lines):
+            blocks = [b for b in section.fences if b.closed and b.ascii_type]
+            first_diagram = len(diagrams)
+            text = _replace_ascii_blocks(section.text, 0, blocks, diagrams, section.start)
+            section.text = None
+            if pending is not None:
+                pending[0].append(text)
+                continue
+
+            toc_mark = len(self.md.toc_entries)
+            body, tail = render_section(self.md, text, references)
+            if tail is None:
+                # 撤销本节登记的标题 ID 和目录条目，合并后重新渲染
+                self.heading_ids.registry.release(e['id'] for e in self.md.toc_entries[toc_mark:])
+                del self.md.toc_entries[toc_mark:]
+                pending = ([text], first_diagram)
+                continue
+            del text
+            if len(diagrams) > first_diagram:
+                body = self._splice_diagrams(body, diagrams[first_diagram:], session_id, diagram_cache)
+            yield body, tail
+
+        if pending is not None:
+            texts, first_diagram = pending
+            body, tail = render_section(self.md, ''.join(texts), references)
+            if len(diagrams) > first_diagram:
+                body = self._splice_diagrams(body, diagrams[first_diagram:], session_id, diagram_cache)
+            yield body, tail
+
+    def _render_cached(self, source, section_cache, jobs, stats):
+        """按章节渲染，内容未变的章节直接复用缓存（输出与整篇渲染一致）
+
+        Returns:
+            tuple: (html_body, toc_entries, diagrams, title, metadata)
+        """
+        title, metadata, body_line = _scan_header(iter_text_lines(source))
+        starts = split_sections(source, _line_offset(source, body_line), SECTION_LEVEL)
+        texts = [source[a:b] for a, b in zip(starts, starts[1:] + [len(source)])]
+
+        # 全文链接定义（计入缓存键：定义变化时引用它的章节需要重新渲染）；
+        # 与整篇渲染一致，从替换 ASCII 图之后的文本中收集（图中的 [标签]: 值 不是链接定义）
+        references = None
+        extracted_by_index = {}
+        if starts and REFERENCE_CANDIDATE.search(source, starts[0]):
+            def extract(i):
+                extracted_by_index[i] = _extract_section(texts[i])
+                return extracted_by_index[i][0]
+
+            references = _collect_references(
+                self.md, ((text, partial(extract, i)) for i, text in enumerate(texts)))
+        refs_digest = references_digest(references)
+
+        keys = [section_key(text, refs_digest) for text in texts]
+        entries = [section_cache.get(key) for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        stats.update(sections=len(texts), cached=len(texts) - len(missing))
+
+        if missing:
+            token = new_marker_token()
+            extracted = [extracted_by_index.get(i) or _extract_section(texts[i]) for i in missing]
+            if jobs > 1 and len(missing) > 1:
+                rendered = self._parallel_renderer(jobs).render_sections(
+                    [text for text, _ in extracted], references, token)
+            else:
+                rendered = [render_deferred(self.md, self.heading_ids, text, references, token)
+                            for text, _ in extracted]
+            for i, (_, local), result in zip(missing, extracted, rendered):
+                entries[i] = _section_entry(result, token, local)
+                section_cache.put(keys[i], entries[i])
+
+        # 原始 HTML 延续到节末之后的章节（分隔为 None）：与其后的全部章节合并为一节渲染
+        open_index = next((i for i, entry in enumerate(entries[:-1]) if entry['tail'] is None), None)
+        if open_index is not None:
+            text = ''.join(texts[open_index:])
+            key = section_key(text, refs_digest)
+            entry = section_cache.get(key)
+            if entry is None:
+                token = new_marker_token()
+                text, local = _extract_section(text)
+                entry = _section_entry(
+                    render_deferred(self.md, self.heading_ids, text, references, token), token, local)
+                section_cache.put(key, entry)
+            entries[open_index:] = [entry]
+
+        # 按文档顺序分配标题 ID 和图形编号
+        registry = HeadingIdRegistry()
+        diagrams, toc_entries, parts = [], [], []
+
+        def sections():
+            for entry in entries:
+                body, toc = resolve_heading_ids(registry, entry['token'], entry['body'],
+                                                entry['toc'], entry['slugs'])
+                toc_entries.extend(toc)
+                if entry['diagrams']:
+                    first = len(diagrams)
+                    for diagram_type, content in entry['diagrams']:
+                        _add_diagram(diagrams, diagram_type, content)
+                    body = _LOCAL_PLACEHOLDER.sub(
+                        lambda m: _renumber_placeholder(m, diagrams, first), body)
+                yield body, entry['tail']
+
+        join_sections(sections(), parts.append)
+        return ''.join(parts), toc_entries, diagrams, title, metadata
+
+    def _parallel_renderer(self, jobs):
+        """分节并行渲染器（进程池跨多次转换复用，进程数变化时重建）"""
+        if self._parallel is None or self._parallel.jobs != jobs:
+            self.close()
+            self._parallel = ParallelRenderer(jobs)
+        return self._parallel
+
+    def close(self):
+        """关闭并行渲染的进程池"""
+        if self._parallel is not None:
+            self._parallel.close()
+            self._parallel = None
+
+    def _splice_diagrams(self, html_body, diagrams, session_id, diagram_cache):
+        """将占位符替换为 ASCII 代码块、缓存的图形或 AI 占位符"""
+        replacements = self._diagram_replacements(diagrams, session_id, diagram_cache)
+
+        # 在内存中一次线性拼接替换所有占位符
+        return PLACEHOLDER_PATTERN.sub(
+            lambda m: replacements.get(m.group(0), m.group(0)), html_body)
+
+    def _diagram_replacements(self, diagrams, session_id, diagram_cache):
+        """各占位符的替换内容 {占位符: HTML}"""
+        replacements = {}
+        for diagram in diagrams:
+            svg_content = None
+            if self.ai_svg:
+                diagram['cache_key'] = diagram_key(diagram['type'], diagram['content'], self.theme.name)
+                if diagram_cache is not None:
+                    svg_content = diagram_cache.get(diagram['cache_key'], diagram['type'])
+                    diagram['cached'] = svg_content is not None
+
+            # 根据类型选择转换策略
+            if svg_content is None:
+                renderer = DIAGRAM_RENDERERS.get(diagram['type'], convert_diagram_svg)
+                svg_content = renderer(diagram['content'], diagram['id'], session_id,
+                                       diagram['cache_key'], self.ai_svg)
+            replacements[diagram['placeholder']] = svg_content
+        return replacements
+
+
+def _replace_ascii_blocks(text, start, blocks, diagrams, offset=0):
+    """把 ASCII 图代码块替换为占位符（一次拼接，线性时间）
+
+    Args:
+        text: 原文
+        start: 从 text 的哪个位置开始输出
+        blocks: 要替换的 FencedBlock（按顺序）
+        diagrams: 图列表，新提取的图追加到末尾（ID 接续编号）
+        offset: 代码块偏移相对 text 开头的差值（分节时为章节起始偏移）
+    """
+    pieces = []
+    pos = start
+    for block in blocks:
+        pieces.append(text[pos:block.start - offset])
+        pieces.append(_add_diagram(diagrams, block.ascii_type, block.code))
+        pos = block.end - offset
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+
+
+def _section_entry(rendered, token, diagrams):
+    """章节缓存条目（render_deferred 的结果和节内的图）"""
+    body, tail, toc, slugs = rendered
+    return {
+        'body': body, 'tail': tail, 'toc': toc, 'slugs': slugs, 'token': token,
+        'diagrams': [[d['type'], d['content']] for d in diagrams],
+    }
+
+
+def _add_diagram(diagrams, diagram_type, content):
+    """登记一个 ASCII 图（ID 接续编号），返回其占位符"""
+    placeholder = f'<!-- SVG-PLACEHOLDER-{len(diagrams) + 1} -->'
+    diagrams.append({
+        'id': len(diagrams) + 1,
+        'placeholder': placeholder,
+        'type': diagram_type,
+        'content': content,
+        'cache_key': '',
+        'cached': False,
+    })
+    return placeholder
+
+
+# 章节缓存片段中的节内占位符（拼接时换成全文编号）
+_LOCAL_PLACEHOLDER = re.compile(r'<!-- SVG-PLACEHOLDER-(\d+) -->')
+
+
+def _renumber_placeholder(match, diagrams, first):
+    index = first + int(match.group(1)) - 1
+    if first <= index < len(diagrams):
+        return diagrams[index]['placeholder']
+    return match.group(0)
+
+
+def _extract_section(text):
+    """提取一节中的 ASCII 图（节内编号），返回 (Markdown, 图列表)"""
+    diagrams = []
+    blocks = scan_markdown(text).ascii_blocks()
+    return _replace_ascii_blocks(text, 0, blocks, diagrams), diagrams
+
+
+def _line_offset(text, line):
+    """第 line 行（从 1 开始）的起始偏移；超出末尾时返回文本长度"""
+    pos = 0
+    for _ in range(line - 1):
+        newline = text.find('\n', pos)
+        if newline == -1:
+            return len(text)
+        pos = newline + 1
+    return pos
+
+
+def _scan_header(lines):
+    """流式读取文档头部（第一个分隔线之前）
+
+    Returns:
+        tuple: (标题, 元数据, 正文起始行号)；没有分隔线时正文从第 1 行开始，
+               标题和元数据取自整个文档（与整篇转换一致）
+    """
+    title = "方案文档"
+    metadata = {'编制单位': '', '编制日期': '', '版本号': ''}
+
+    for token in iter_tokens(lines):
+        if isinstance(token, Rule):
+            return title, metadata, token.line + 1
+        if isinstance(token, Heading) and token.level == 1:
+            title = token.text
+        elif isinstance(token, MetaLine):
+            metadata[token.key] = token.value
+    return title, metadata, 1
+
+
+def _stream_references(md, src, origin, body_line):
+    """流式收集正文中的引用式链接定义（没有候选行时返回 None，不做块级解析）"""
+    src.seek(origin)
+    if not any(REFERENCE_CANDIDATE.match(raw) for raw in _skip_lines(src, body_line)):
+        return None
+
+    src.seek(origin)
+    return _collect_references(
+        md, ((section.text, partial(_extract_stream_section, section))
+             for section in iter_sections(_skip_lines(src, body_line))))
+
+
+def _extract_stream_section(section):
+    """流式章节中的 ASCII 图换成占位符（只用于收集链接定义，不登记图）"""
+    blocks = [b for b in section.fences if b.closed and b.ascii_type]
+    return _replace_ascii_blocks(section.text, 0, blocks, [], section.start)
+
+
+def _collect_references(md, sections):
+    """收集各节的链接定义（与整篇渲染一致）
+
+    - 从 ASCII 图换成占位符之后的文本中收集（图中的 [标签]: 值 不是链接定义）
+    - 原始 HTML 延续到某节末尾之后时，该节与其后的全部章节合并收集
+      （整篇渲染中被并入原始 HTML 的定义不算）
+
+    Args:
+        sections: (章节原文, extract) 的可迭代对象；extract() 返回替换 ASCII 图之后的文本，
+                  只对需要解析的章节调用
+    """
+    references = {}
+    pending = None
+    for text, extract in sections:
+        if pending is not None:
+            pending.append(extract())
+        elif REFERENCE_CANDIDATE.search(text) or '<' in text:
+            text = extract()
+            section_references, continued = scan_references(md, text)
+            if continued:
+                pending = [text]
+            else:
+                references.update(section_references)
+    if pending is not None:
+        references.update(collect_references(md, ''.join(pending)))
+    return references
+
+
+def _skip_lines(lines, first_line):
+    """从第 first_line 行开始产出"""
+    for lineno, raw in enumerate(lines, 1):
+        if lineno >= first_line:
+            yield raw
+
+
+def _write_spliced(out, html_body, replacements):
+    """边替换占位符边写出（不生成替换后的完整正文）"""
+    pos = 0
+    for match in PLACEHOLDER_PATTERN.finditer(html_body):
+        out.write(html_body[pos:match.start()])
+        out.write(replacements.get(match.group(0), match.group(0)))
+        pos = match.end()
+    out.write(html_body[pos:] if pos else html_body)
+
+
+# 进程内转换器缓存：{(主题, 目录层级, AI 模式, 外部资源, 压缩): Converter}
+_converter_cache = {}
+
+
+def get_converter(theme_name='purple', toc_depth=DEFAULT_TOC_DEPTH, ai_svg=None,
+                  external_assets=False, minify=False):
+    """获取转换器（同一进程内按参数复用，避免重复初始化）"""
+    if ai_svg is None:
+        ai_svg = ai_svg_enabled()
+    key = (theme_name, toc_depth, ai_svg, external_assets, minify)
+    converter = _converter_cache.get(key)
+    if converter is None:
+        converter = _converter_cache[key] = Converter(theme_name, toc_depth, ai_svg,
+                                                      external_assets, minify)
+    return converter
+
+
+def clear_converter_cache():
+    """清空转换器缓存（主题文件变化后重新加载）"""
+    _converter_cache.clear()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化图形缓存（按内容寻址）
+AI 生成的 SVG/HTML 按（图类型, 规范化 ASCII 内容, 主题）的哈希保存，
+重新转换文档时直接复用，不再随会话目录一起被清理
+
+缓存位置：.cvt-caches/.diagrams/{哈希前2位}/{哈希}.svg|html
+"""
+
+import hashlib
+from pathlib import Path
+
+from fileutil import atomic_write_text
+
+
+DIAGRAMS_DIR = '.diagrams'
+
+
+def normalize_ascii(content):
+    """规范化 ASCII 图内容：统一换行、去除行尾空白和首尾空行"""
+    lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def diagram_key(diagram_type, content, theme_name):
+    """计算图形缓存键"""
+    h = hashlib.sha256()
+    for part in (diagram_type.lower(), theme_name, normalize_ascii(content)):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def diagram_ext(diagram_type):
+    """生成文件扩展名：UI 图为 HTML，其余为 SVG"""
+    return 'html' if diagram_type.lower() == 'ui' else 'svg'
+
+
+class DiagramCache:
+    """图形缓存（一个目录一份，多个文档共享）"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    @classmethod
+    def for_document(cls, doc_path):
+        """获取文档（Markdown 或 HTML）所在目录的图形缓存"""
+        return cls(Path(doc_path).parent / '.cvt-caches' / DIAGRAMS_DIR)
+
+    def path_for(self, key, diagram_type):
+        """缓存文件路径"""
+        return self.root / key[:2] / f"{key}.{diagram_ext(diagram_type)}"
+
+    def get(self, key, diagram_type):
+        """读取缓存的 SVG/HTML，未命中返回 None"""
+        try:
+            with open(self.path_for(key, diagram_type), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, key, diagram_type, code):
+        """保存生成的 SVG/HTML"""
+        path = self.path_for(key, diagram_type)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(path, code)
+        return path
@@ -3,8 +3,12 @@
 """
 提取HTML中的AI占位符，导出为JSON文件
 
+convert.py（AI 模式）转换时已直接写出 extracted.json，无需再运行本脚本；
+本脚本用于旧版 HTML（占位符带 data-raw 属性，如更早版本生成的页面）。
+
 使用方法：
     python3 extract_placeholders.py html_file.json
+    python3 extract_placeholders.py html_file.json --profile   # 各阶段耗时追加到 {文档名}.trace.json
 """
 
 import json
@@ -13,51 +17,55 @@ import html
 import sys
 from pathlib import Path
 
+from cache_index import CacheIndex
+from fileutil import atomic_write_text
+from profiling import Profiler, trace_path_for, write_trace, print_profile
+from splice import Splicer, AI_START_PATTERN, ai_end_marker
+
 
-def extract_placeholders(html_file):
+def extract_placeholders(html_file, profiler=None):
     """提取HTML中的所有AI占位符
 
+    Args:
+        html_file: HTML文件路径
+        profiler: 剖析器（Profiler，可选）
+
     Returns:
         tuple: (placeholders_dict, session_id, document_name)
-            - placeholders_dict: {id: {type, raw_content}}
+            - placeholders_dict: {id: {type, raw_content, cache_key}}
+              （已命中图形缓存的图形不再有占位符，不会出现在列表中）
             - session_id: 6位随机号
             - document_name: 文档名称
     """
     html_path = Path(html_file)
     document_name = html_path.stem  # 文档名称（不含扩展名）
+    profiler = profiler or Profiler(measure_bytes=False)
 
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    with profiler.stage('read', source=html_path.stat().st_size) as span:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        span.output(html_content)
 
-    # 分两步提取：先找到START和END标记之间的内容
-    placeholders = []
-    session_id = None
+    with profiler.stage('match', source=html_content):
+        placeholders, session_id = _match_placeholders(html_content)
 
-    # 找到所有START标记（带id和session）
-    start_pattern = r'<!-- AI-SVG-(ARCHITECTURE|FLOWCHART|UI|TIMELINE|DIAGRAM)-START:id=(\d+),session=([a-f0-9]+) -->'
-    start_matches = list(re.finditer(start_pattern, html_content))
-
-    for match in start_matches:
-        diagram_type = match.group(1)
-        placeholder_id = match.group(2)
-        current_session = match.group(3)
-
-        # 使用第一个session_id（所有占位符应该相同）
-        if session_id is None:
-            session_id = current_session
+    return placeholders, session_id, document_name
 
-        start_pos = match.start()
 
-        # 找到对应的END标记（带id和session）
-        end_pattern = f'<!-- AI-SVG-{diagram_type}-END:id={placeholder_id},session={current_session} -->'
-        end_match = re.search(end_pattern, html_content[start_pos:])
+def _match_placeholders(html_content):
+    """匹配占位符标记，返回 (placeholders, session_id)"""
+    # 一遍扫描找出全部 START…END 块（END 标记带相同的类型、id 和 session）
+    placeholders = []
+    session_id = None
+    splicer = Splicer(AI_START_PATTERN, ai_end_marker)
 
-        if not end_match:
-            print(f"⚠️  警告：占位符 #{placeholder_id} 缺少END标记")
+    for block_content, match in splicer.segments(html_content):
+        if match is None:
             continue
 
-        end_pos = start_pos + end_match.end()
-        block_content = html_content[start_pos:end_pos]
+        # 使用第一个session_id（所有占位符应该相同）
+        if session_id is None:
+            session_id = match.group('session')
 
         # 提取data-raw属性（使用非贪婪模式匹配到引号）
         raw_match = re.search(r'data-raw="([^"]*(?:\\"[^"]*)*)"', block_content, re.DOTALL)
@@ -67,13 +75,23 @@ def extract_placeholders(html_file):
             raw_content = html.unescape(raw_escaped)
 
             placeholder = {
-                'id': placeholder_id,  # 字符串类型
-                'type': diagram_type.lower(),
+                'id': match.group('id'),  # 字符串类型
+                'type': match.group('type').lower(),
                 'raw_content': raw_content
             }
+
+            # 图形缓存键（替换后按此键持久化生成结果）
+            key_match = re.search(r'data-key="([0-9a-f]*)"', block_content)
+            if key_match and key_match.group(1):
+                placeholder['cache_key'] = key_match.group(1)
             placeholders.append(placeholder)
 
-    return placeholders, session_id, document_name
+    for match in splicer.unterminated:
+        print(f"⚠️  警告：占位符 #{match.group('id')} 缺少END标记")
+        if session_id is None:
+            session_id = match.group('session')
+
+    return placeholders, session_id
 
 
 def save_placeholders_json(placeholders, session_id, document_name, json_file, html_file):
@@ -90,28 +108,38 @@ def save_placeholders_json(placeholders, session_id, document_name, json_file, h
     json_file = Path(json_file)
     json_file.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'session_id': session_id,
-            'document': document_name,
-            'html_file': str(html_file),  # 保存原始 HTML 文件路径
-            'total': len(placeholders),
-            'placeholders': placeholders
-        }, f, ensure_ascii=False, indent=2)
+    atomic_write_text(json_file, json.dumps({
+        'session_id': session_id,
+        'document': document_name,
+        'html_file': str(html_file),  # 保存原始 HTML 文件路径
+        'total': len(placeholders),
+        'placeholders': placeholders
+    }, ensure_ascii=False, indent=2))
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python3 extract_placeholders.py <html_file>")
+    args = [arg for arg in sys.argv[1:] if arg != '--profile']
+    profile = len(args) != len(sys.argv) - 1
+
+    if not args:
+        print("用法: python3 extract_placeholders.py <html_file> [--profile]")
         sys.exit(1)
 
-    html_file = sys.argv[1]
+    html_file = args[0]
     html_path = Path(html_file)
+    profiler = Profiler(measure_bytes=profile)
 
     # 提取占位符
-    placeholders, session_id, document_name = extract_placeholders(html_file)
+    placeholders, session_id, document_name = extract_placeholders(html_file, profiler)
 
     if not placeholders:
+        # 新版 HTML 不带 data-raw：JSON 已由 convert.py 写出
+        if session_id:
+            json_file = html_path.parent / '.cvt-caches' / document_name / session_id / 'extracted.json'
+            if json_file.exists():
+                print(f"✅ convert.py 已生成JSON，无需提取")
+                print(f"📄 JSON文件: {json_file}")
+                sys.exit(0)
         print("⚠️  未找到任何AI占位符")
         sys.exit(0)
 
@@ -119,7 +147,9 @@ def main():
     json_file = html_path.parent / '.cvt-caches' / document_name / session_id / 'extracted.json'
 
     # 保存到JSON
-    save_placeholders_json(placeholders, session_id, document_name, json_file, html_file)
+    with profiler.stage('write_json'):
+        save_placeholders_json(placeholders, session_id, document_name, json_file, html_file)
+        CacheIndex(json_file.parents[2]).add([json_file.parent])
 
     # 输出统计信息
     from collections import Counter
@@ -138,6 +168,12 @@ def main():
     print(f"📁 缓存目录: {caches_dir}")
     print(f"💡 提示：AI Agent应将生成的SVG/HTML保存到此目录，文件名格式：{{id}}.svg 或 {{id}}.html")
 
+    if profile:
+        # 追加到 convert.py --profile 生成的同一 trace（trace_id 为会话ID）
+        trace_file = write_trace(trace_path_for(html_path), profiler, 'extract_placeholders.py',
+                                 session_id, document_name)
+        print_profile(profiler, trace_file)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件读写工具
+原子写入：先写临时文件再重命名，读者不会看到写了一半的文件
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# 进程的 umask（导入时读取一次；os.umask 只能通过设置来读取）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_text(path, text, encoding='utf-8'):
+    """原子写入文本文件
+
+    Args:
+        path: 目标文件路径
+        text: 文件内容
+        encoding: 编码（默认 UTF-8）
+    """
+    atomic_write_bytes(path, text.encode(encoding))
+
+
+def same_content(path, data):
+    """文件内容是否与 data（bytes）相同（文件不存在时为 False；大小不同时不读取文件）"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def atomic_write_bytes(path, data):
+    """原子写入二进制文件（同目录临时文件 + os.replace）"""
+    with atomic_open(path, 'wb') as f:
+        f.write(data)
+
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8'):
+    """分段原子写入：with 块内写临时文件，正常结束后才替换目标文件
+
+        with atomic_open('doc.html') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        # mkstemp 创建的文件权限为 0600：沿用原文件的权限，新文件与 open() 一致（0666 & ~umask）
+        try:
+            file_mode = path.stat().st_mode & 0o7777
+        except OSError:
+            file_mode = 0o666 & ~_UMASK
+        os.chmod(tmp_name, file_mode)
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发生成 AI 占位符的图形
+
+读取 extracted.json，把待生成的占位符并发分派给生成后端，结果写入缓存目录的
+{id}.svg / {id}.html（ui 类型），之后运行 replace_svg.py 替换
+（或同时运行 replace_svg.py --follow，生成一个替换一个）。
+
+生成后端（--backend）：
+    local      本地规则渲染（ascii_to_svg_converter，离线、不需要 AI）
+    command    子进程（--command）：占位符 JSON 写入标准输入，标准输出为生成的 SVG/HTML
+    http       HTTP 接口（--url）：POST 占位符 JSON，响应体为生成的 SVG/HTML
+
+占位符 JSON：{'id', 'type', 'raw_content', 'cache_key', 'session_id', 'document', 'format'}，
+format 为 svg 或 html。子进程另有环境变量 CVT_PLACEHOLDER_ID、CVT_PLACEHOLDER_TYPE。
+
+使用方法：
+    python3 generate_diagrams.py .cvt-caches/doc/a1b2c3/extracted.json                 # 本地渲染
+    python3 generate_diagrams.py extracted.json --backend command --command "python3 gen.py" --jobs 8
+    python3 generate_diagrams.py extracted.json --backend http --url http://localhost:8000/generate \\
+        --timeout 120 --retries 2
+
+已存在的 {id}.svg / {id}.html（如 AI Agent 已生成的）跳过，--force 时重新生成。
+"""
+
+import argparse
+import asyncio
+import html
+import json
+import os
+import shlex
+import sys
+import time
+import urllib.request
+
+from ascii_to_svg_converter import generate_svg_from_ascii, get_theme_colors
+from fileutil import atomic_write_text
+from replace_svg import load_placeholders_json
+
+
+DEFAULT_JOBS = 4
+DEFAULT_TIMEOUT = 120.0  # 单个占位符的超时（秒，含后端启动）
+DEFAULT_RETRIES = 1      # 失败或超时后的重试次数
+RETRY_DELAY = 0.5        # 首次重试前的等待（秒），之后每次加倍
+
+
+class GenerationError(Exception):
+    """生成后端返回了错误或无效的结果"""
+
+
+def output_format(placeholder):
+    """占位符生成结果的格式：ui 类型为 html，其余为 svg"""
+    return 'html' if placeholder['type'] == 'ui' else 'svg'
+
+
+def _in_thread(func, *args):
+    """在默认线程池中执行阻塞调用（asyncio.to_thread 需要 Python 3.9）"""
+    return asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+
+class LocalBackend:
+    """本地规则渲染（ascii_to_svg_converter）：按 ASCII 结构生成方框图、流程图或时间线"""
+
+    def __init__(self, theme_name='blue'):
+        self.theme_colors = get_theme_colors(theme_name)
+
+    def render(self, placeholder):
+        # 渲染器的输入是 HTML 代码块中的文本（已转义）
+        return generate_svg_from_ascii(html.escape(placeholder['raw_content'], quote=False),
+                                       self.theme_colors)
+
+    async def generate(self, placeholder):
+        return await _in_thread(self.render, placeholder)
+
+
+class CommandBackend:
+    """子进程后端：每个占位符启动一次命令，占位符 JSON 写入标准输入，标准输出为结果"""
+
+    def __init__(self, command):
+        self.argv = shlex.split(command)
+        if not self.argv:
+            raise ValueError("command 后端需要 --command")
+
+    async def generate(self, placeholder):
+        env = dict(os.environ, CVT_PLACEHOLDER_ID=placeholder['id'],
+                   CVT_PLACEHOLDER_TYPE=placeholder['type'])
+        proc = await asyncio.create_subprocess_exec(
+            *self.argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, env=env)
+        try:
+            stdout, stderr = await proc.communicate(json.dumps(placeholder, ensure_ascii=False).encode('utf-8'))
+        except asyncio.CancelledError:
+            # 超时：结束子进程，不留下孤儿进程
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise GenerationError(f"命令退出码 {proc.returncode}" + (f"：{message[-1]}" if message else ''))
+        return stdout.decode('utf-8')
+
+
+class HttpBackend:
+    """HTTP 后端：POST 占位符 JSON，响应体为结果（标准库 urllib，在线程中执行）"""
+
+    def __init__(self, url, timeout=DEFAULT_TIMEOUT):
+        if not url:
+            raise ValueError("http 后端需要 --url")
+        self.url = url
+        self.timeout = timeout
+
+    def request(self, placeholder):
+        body = json.dumps(placeholder, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json; charset=utf-8'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            return response.read().decode(charset)
+
+    async def generate(self, placeholder):
+        return await _in_thread(self.request, placeholder)
+
+
+BACKENDS = ('local', 'command', 'http')
+
+
+def create_backend(name, theme_name='blue', command=None, url=None, timeout=DEFAULT_TIMEOUT):
+    """按名称创建生成后端（参数缺失时抛出 ValueError）
+
+    自定义后端只需提供 async generate(placeholder) → SVG/HTML 文本，直接传给 generate_diagrams()。
+    """
+    if name == 'local':
+        return LocalBackend(theme_name)
+    if name == 'command':
+        return CommandBackend(command or '')
+    if name == 'http':
+        return HttpBackend(url, timeout)
+    raise ValueError(f"未知的生成后端：{name}（可选：{', '.join(BACKENDS)}）")
+
+
+def check_output(content):
+    """检查生成结果，无效时抛出 GenerationError"""
+    if not content or not content.strip():
+        raise GenerationError("生成结果为空")
+    if not content.lstrip().startswith('<'):
+        raise GenerationError("生成结果不是 SVG/HTML 标记")
+
+
+async def _generate_one(backend, placeholder, target, semaphore, timeout, retries):
+    """生成一个占位符（并发数由 semaphore 限制），失败或超时按指数退避重试
+
+    Returns:
+        tuple: (尝试次数, 后端耗时（秒，不含排队和重试等待）, 错误信息或 None)
+    """
+    error = None
+    seconds = 0.0
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                content = await asyncio.wait_for(backend.generate(placeholder), timeout)
+                check_output(content)
+            except asyncio.TimeoutError:
+                error = f"超时（{timeout:g} s）"
+                continue
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                continue
+            finally:
+                seconds += time.perf_counter() - start
+        # 原子写入：读者不会读到写了一半的文件
+        atomic_write_text(target, content)
+        return attempt + 1, seconds, None
+    return retries + 1, seconds, error
+
+
+async def generate_diagrams(placeholders, caches_dir, backend, session_id='', document_name='',
+                            jobs=DEFAULT_JOBS, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                            force=False, progress=None):
+    """并发生成占位符的图形，写入缓存目录
+
+    Args:
+        placeholders: 占位符列表（extracted.json 的 placeholders）
+        caches_dir: 缓存目录（生成结果写为 {id}.svg / {id}.html）
+        backend: 生成后端（提供 async generate(placeholder)）
+        session_id: 会话ID（传给后端）
+        document_name: 文档名称（传给后端）
+        jobs: 最多同时生成的占位符数
+        timeout: 单个占位符单次尝试的超时（秒）
+        retries: 失败或超时后的重试次数
+        force: 重新生成已存在的文件
+        progress: 每完成一个占位符调用 progress(done, total, placeholder, 后端耗时, error)（可选）
+
+    Returns:
+        dict: {'generated', 'skipped', 'retried', 'failed': [(id, 错误信息)], 'seconds'}
+    """
+    start = time.perf_counter()
+    stats = {'generated': 0, 'skipped': 0, 'retried': 0, 'failed': [], 'seconds': 0.0}
+
+    pending = []
+    for placeholder in placeholders:
+        fmt = output_format(placeholder)
+        target = caches_dir / f"{placeholder['id']}.{fmt}"
+        if target.exists() and not force:
+            stats['skipped'] += 1
+            continue
+        request = dict(placeholder, session_id=session_id, document=document_name, format=fmt)
+        pending.append((request, target))
+
+    semaphore = asyncio.Semaphore(max(1, jobs))
+    done = 0
+
+    async def run(request, target):
+        nonlocal done
+        attempts, seconds, error = await _generate_one(backend, request, target, semaphore, timeout, retries)
+        done += 1
+        if attempts > 1:
+            stats['retried'] += 1
+        if error is None:
+            stats['generated'] += 1
+        else:
+            stats['failed'].append((request['id'], error))
+        if progress is not None:
+            progress(done, len(pending), request, seconds, error)
+
+    await asyncio.gather(*(run(request, target) for request, target in pending))
+    stats['failed'].sort(key=lambda item: int(item[0]) if item[0].isdigit() else item[0])
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def print_progress(done, total, placeholder, seconds, error):
+    """逐个输出完成情况"""
+    if error is None:
+        print(f"   ✅ [{done}/{total}] #{placeholder['id']} {placeholder['type']}（{seconds:.2f} s）", flush=True)
+    else:
+        print(f"   ❌ [{done}/{total}] #{placeholder['id']} {placeholder['type']}：{error}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并发生成 AI 占位符的图形（写入缓存目录）')
+    parser.add_argument('json_file', help='extracted.json 路径')
+    parser.add_argument('--backend', '-b', default='local', choices=BACKENDS,
+                        help='生成后端 (默认: local，本地规则渲染)')
+    parser.add_argument('--command', default=None,
+                        help='command 后端的命令：占位符 JSON 写入标准输入，标准输出为 SVG/HTML')
+    parser.add_argument('--url', default=None,
+                        help='http 后端的地址：POST 占位符 JSON，响应体为 SVG/HTML')
+    parser.add_argument('--theme', '-t', default='blue', help='local 后端的主题颜色 (默认: blue)')
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_JOBS,
+                        help=f'最多同时生成的占位符数 (默认: {DEFAULT_JOBS})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'单个占位符的超时秒数 (默认: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'失败或超时后的重试次数 (默认: {DEFAULT_RETRIES})')
+    parser.add_argument('--force', '-f', action='store_true', help='重新生成已存在的文件')
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1 or args.retries < 0 or args.timeout <= 0:
+        print("❌ --jobs 须大于 0，--retries 不能为负数，--timeout 须大于 0")
+        sys.exit(1)
+
+    try:
+        placeholders, session_id, document_name, caches_dir, _ = load_placeholders_json(args.json_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ 无法读取JSON文件：{e}")
+        sys.exit(1)
+
+    try:
+        backend = create_backend(args.backend, args.theme, args.command, args.url, args.timeout)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"🆔 会话ID: {session_id}")
+    print(f"📄 文档: {document_name}")
+    print(f"🧩 生成后端: {args.backend}（并发 {args.jobs}，超时 {args.timeout:g} s，重试 {args.retries} 次）")
+    print(f"📊 开始生成 {len(placeholders)} 个占位符...\n")
+
+    loop = asyncio.get_event_loop()
+    try:
+        stats = loop.run_until_complete(generate_diagrams(
+            placeholders, caches_dir, backend, session_id, document_name, jobs=args.jobs,
+            timeout=args.timeout, retries=args.retries, force=args.force, progress=print_progress))
+    finally:
+        loop.close()
+
+    print(f"\n✅ 生成完成：{stats['generated']} 个（{stats['seconds']:.2f} s）")
+    if stats['skipped']:
+        print(f"♻️  已存在，跳过：{stats['skipped']} 个")
+    if stats['retried']:
+        print(f"🔁 经过重试：{stats['retried']} 个")
+    if stats['failed']:
+        print(f"❌ 失败：{len(stats['failed'])} 个")
+        for placeholder_id, error in stats['failed']:
+            print(f"   - 占位符 #{placeholder_id}: {error}")
+        sys.exit(1)
+
+    print(f"📁 缓存目录: {caches_dir}")
+    print(f"💡 下一步：python3 scripts/replace_svg.py {args.json_file}")
+
+
+if __name__ == '__main__':
+    main()
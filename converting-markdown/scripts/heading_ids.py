@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+标题 ID 扩展（Python-Markdown）
+在 Markdown 渲染过程中一次遍历为所有标题分配 ID，并收集目录条目
+
+- ID 保留中文等 Unicode 字符，不做百分号编码（锚点更短）
+- 重复标题自动追加序号（标题、标题-1、标题-2 ...），保证文档内唯一
+- 目录条目保存在 md.toc_entries：[{'level', 'id', 'text'}]，按文档顺序
+- 分节渲染时用 shared_document() 让各节共用一个 ID 注册表和目录条目列表
+"""
+
+import html
+import re
+from contextlib import contextmanager
+
+from markdown.extensions import Extension
+from markdown.extensions.toc import slugify_unicode, stashedHTML2text
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import AtomicString
+
+
+HEADING_TAG = re.compile(r'^h[1-6]$')
+
+
+def heading_slug(text):
+    """由标题文本生成紧凑的 ID（保留 Unicode 字符，去除标点）"""
+    return slugify_unicode(text, '-') or 'section'
+
+
+class HeadingIdRegistry:
+    """文档级 ID 注册表，保证 ID 唯一"""
+
+    def __init__(self):
+        self.used = set()
+        self.counters = {}
+
+    def claim(self, slug):
+        """登记并返回唯一 ID"""
+        if slug not in self.used:
+            self.used.add(slug)
+            return slug
+
+        n = self.counters.get(slug, 0)
+        while True:
+            n += 1
+            candidate = f'{slug}-{n}'
+            if candidate not in self.used:
+                break
+        self.counters[slug] = n
+        self.used.add(candidate)
+        return candidate
+
+    def release(self, ids):
+        """撤销登记（丢弃的渲染结果中分配的 ID）"""
+        for heading_id in ids:
+            self.used.discard(heading_id)
+            # 计数只是查找的起点，清除后从 1 开始查找，结果不变
+            self.counters.pop(heading_id, None)
+            self.counters.pop(heading_id.rpartition('-')[0], None)
+
+
+def heading_text(el, md):
+    """提取标题纯文本（去除标签和内联 HTML）"""
+    parts = []
+    for text in el.itertext():
+        # 代码片段中的文本已被转义，需还原
+        parts.append(html.unescape(text) if isinstance(text, AtomicString) else text)
+    return stashedHTML2text(''.join(parts), md).strip()
+
+
+class HeadingIdTreeprocessor(Treeprocessor):
+    """为标题分配 ID 并收集目录条目"""
+
+    def __init__(self, md, extension):
+        super().__init__(md)
+        self.extension = extension
+
+    def run(self, root):
+        registry = self.extension.registry
+        entries = self.md.toc_entries
+
+        for el in root.iter():
+            if not isinstance(el.tag, str) or not HEADING_TAG.match(el.tag):
+                continue
+
+            text = heading_text(el, self.md)
+            if not text:
+                continue
+
+            elem_id = el.get('id')
+            if elem_id is None:
+                elem_id = registry.claim(heading_slug(text))
+                el.set('id', elem_id)
+
+            entries.append({'level': int(el.tag[1]), 'id': elem_id, 'text': text})
+
+
+class HeadingIdExtension(Extension):
+    """标题 ID 扩展"""
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        self.md = md
+        self.shared = False
+        self.reset()
+        # 在内联处理（20）和美化（10）之后运行
+        md.treeprocessors.register(HeadingIdTreeprocessor(md, self), 'heading_ids', 5)
+
+    def reset(self):
+        """每个文档开始前重置（md.reset() 会调用；shared_document 期间不重置）"""
+        if self.shared:
+            return
+        self.registry = HeadingIdRegistry()
+        self.md.toc_entries = []
+
+    @contextmanager
+    def shared_document(self):
+        """分节渲染：块内多次 md.convert() 视为同一文档，ID 跨节唯一，目录条目持续累积"""
+        self.shared = False
+        self.reset()
+        self.shared = True
+        try:
+            yield
+        finally:
+            self.shared = False
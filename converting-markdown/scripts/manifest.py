@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量构建清单
+记录每个输出依赖的全部输入的哈希，输入未变化时跳过转换
+
+依赖的输入：
+    - Markdown 源文件
+    - 主题文件（templates/<theme>.yaml + base.yaml）
+    - 转换器自身（scripts/ 下所有 .py 文件）
+    - 影响输出的转换选项（如 AI 模式）
+
+清单位置：.cvt-caches/manifest.json（与 Markdown 文件同目录）
+
+同一目录的多个转换（如 watch 与 batch）可能同时保存清单：保存时持有 .manifest.lock 的
+排他锁，重新读取磁盘上的清单并合并本次记录的条目后再替换，不会丢失其他进程的记录
+（没有 fcntl 的平台不加锁）。
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from fileutil import atomic_write_text
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.manifest.lock'
+
+# 进程内文件哈希缓存：{路径: ((size, mtime_ns), sha256)}
+_digest_cache = {}
+
+
+def file_digest(path):
+    """计算文件 SHA-256（按文件状态缓存，同一进程内不重复读取）"""
+    path = Path(path)
+    st = path.stat()
+    stamp = (st.st_size, st.st_mtime_ns)
+
+    cached = _digest_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _digest_cache[path] = (stamp, digest)
+    return digest
+
+
+def converter_digest():
+    """转换器自身的哈希（scripts/ 下所有 .py 文件）"""
+    scripts_dir = Path(__file__).parent
+    h = hashlib.sha256()
+    for py_file in sorted(scripts_dir.glob('*.py')):
+        h.update(py_file.name.encode('utf-8'))
+        h.update(file_digest(py_file).encode('ascii'))
+    return h.hexdigest()
+
+
+class BuildManifest:
+    """增量构建清单（一个目录一份）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.recorded = {}  # 本次记录的条目（保存时合并到磁盘上的清单）
+        self.dirty = False
+        self.entries = self._read()
+
+    def _read(self):
+        """读取磁盘上的清单条目（不存在、损坏或版本不符时返回空清单）"""
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # 清单损坏时视为空清单，全部重新构建
+            return {}
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            return {}
+        return data.get('entries', {})
+
+    @classmethod
+    def for_document(cls, md_path):
+        """获取 Markdown 文件所在目录的清单"""
+        return cls(Path(md_path).parent / '.cvt-caches' / MANIFEST_NAME)
+
+    def input_digests(self, md_path, theme, options=None):
+        """计算文档全部输入的哈希
+
+        Args:
+            md_path: Markdown 文件路径
+            theme: Theme 对象
+            options: 影响输出的转换选项（dict，需可 JSON 序列化）
+
+        Returns:
+            dict: 输入哈希
+        """
+        md_path = Path(md_path)
+        entry = self.entries.get(md_path.name)
+        st = md_path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+
+        # 文件状态未变时复用已记录的哈希，避免重新读取源文件
+        if entry and entry.get('stat') == stamp:
+            markdown_digest = entry['inputs']['markdown']
+        else:
+            markdown_digest = file_digest(md_path)
+
+        return {
+            'markdown': markdown_digest,
+            'theme': {p.name: file_digest(p) for p in theme.source_files},
+            'converter': converter_digest(),
+            'options': options or {},
+        }
+
+    def is_fresh(self, md_path, html_path, digests):
+        """输出是否仍然有效（输出存在且所有输入未变化）"""
+        entry = self.entries.get(Path(md_path).name)
+        if not entry or entry.get('inputs') != digests:
+            return False
+        return Path(html_path).exists() and entry.get('output') == Path(html_path).name
+
+    def record(self, md_path, html_path, digests):
+        """记录一次成功的构建"""
+        st = Path(md_path).stat()
+        entry = {
+            'stat': [st.st_size, st.st_mtime_ns],
+            'inputs': digests,
+            'output': Path(html_path).name,
+        }
+        self.entries[Path(md_path).name] = self.recorded[Path(md_path).name] = entry
+        self.dirty = True
+
+    def save(self):
+        """保存清单（原子写入）
+
+        持有排他锁期间重新读取磁盘上的清单，合并本次记录的条目后替换，
+        其他进程在本进程读取清单之后保存的条目得以保留。
+        """
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path.parent / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            entries = self._read()
+            entries.update(self.recorded)
+            atomic_write_text(self.path, json.dumps({
+                'version': MANIFEST_VERSION,
+                'entries': entries,
+            }, ensure_ascii=False, indent=2, sort_keys=True))
+        finally:
+            os.close(fd)
+        self.entries = entries
+        self.recorded = {}
+        self.dirty = False
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown 单遍扫描器
+convert.py、check_ascii_blocks.py 和 validate_proposal.py 共用
+
+一次线性扫描产出：
+    - 围栏代码块（``` / ~~~，含语言标识、内容、起止偏移和行号）
+    - ATX 标题（# ~ ######，不含代码块内的 #）
+    - 元数据行（**编制单位：** / **编制日期：** / **版本号：**）
+    - 分隔线（---）
+
+所有位置信息在扫描时顺带计算，调用方无需再用
+content[:pos].count('\\n') 求行号。
+
+iter_sections 在同一扫描上按 H1/H2 切分章节，供流式转换逐节读取大文档；
+split_sections 按相同规则只求切分位置，供章节缓存快速切分整篇文档。
+"""
+
+import re
+from bisect import bisect_right
+
+
+# ASCII 图框线字符（所有脚本统一使用这一份）
+BOX_CHARS = frozenset(
+    '─━│┃┄┅┆┇┈┉┊┋'
+    '┌┍┎┏┐┑┒┓└┕┖┗┘┙┚┛'
+    '├┝┞┟┠┡┢┣┤┥┦┧┨┩┪┫'
+    '┬┭┮┯┰┱┲┳┴┵┶┷┸┹┺┻'
+    '┼┽┾┿╀╁╂╃╄╅╆╇╈╉╊╋'
+    '═║╒╓╔╕╖╗╘╙╚╛╜╝╞╟╠╡╢╣╤╥╦╧╨╩╪╫╬'
+    '╭╮╯╰'
+)
+
+# 元数据字段（文档头部的 **字段：** 行）
+METADATA_KEYS = ('编制单位', '编制日期', '版本号')
+
+_FENCE_OPEN = re.compile(r'^( {0,3})(`{3,}|~{3,})(.*)$')
+_HEADING = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+
+
+def has_box_chars(text):
+    """检查文本是否包含 ASCII 框线字符"""
+    return not BOX_CHARS.isdisjoint(text)
+
+
+class FencedBlock:
+    """围栏代码块"""
+
+    __slots__ = ('info', 'lang', 'code', 'start', 'end', 'line', 'end_line', 'closed')
+
+    def __init__(self, info, code, start, end, line, end_line, closed):
+        self.info = info          # 语言标识行（如 "ascii:flowchart"）
+        self.lang = info.split()[0] if info else ''
+        self.code = code          # 代码内容（不含围栏行，不含末尾换行）
+        self.start = start        # 起始围栏行的字符偏移
+        self.end = end            # 结束围栏行末尾的字符偏移（不含换行符）
+        self.line = line          # 起始围栏行号（从 1 开始）
+        self.end_line = end_line  # 结束围栏行号
+        self.closed = closed      # 是否有结束围栏（未闭合时延伸到文件末尾）
+
+    @property
+    def ascii_type(self):
+        """ascii:类型 标注中的类型，未标注返回 None"""
+        if self.lang.startswith('ascii:'):
+            return self.lang.split(':', 1)[1]
+        return None
+
+
+class Heading:
+    """ATX 标题"""
+
+    __slots__ = ('level', 'text', 'start', 'line')
+
+    def __init__(self, level, text, start, line):
+        self.level = level
+        self.text = text
+        self.start = start
+        self.line = line
+
+
+class MetaLine:
+    """元数据行（**编制单位：** xxx）"""
+
+    __slots__ = ('key', 'value', 'start', 'line')
+
+    def __init__(self, key, value, start, line):
+        self.key = key
+        self.value = value
+        self.start = start
+        self.line = line
+
+
+class Rule:
+    """分隔线（---）"""
+
+    __slots__ = ('start', 'end', 'line')
+
+    def __init__(self, start, end, line):
+        self.start = start
+        self.end = end   # 下一行的起始偏移
+        self.line = line
+
+
+def _split_newline(raw):
+    """拆分行内容与换行符"""
+    if raw.endswith('\r\n'):
+        return raw[:-2]
+    if raw.endswith('\n') or raw.endswith('\r'):
+        return raw[:-1]
+    return raw
+
+
+def iter_text_lines(text):
+    """按换行符拆分文本并保留换行符
+
+    与 str.splitlines 不同，不会在垂直制表符、Unicode 行分隔符等字符处断行，
+    保证行号与编辑器一致。
+    """
+    start = 0
+    find = text.find
+    while True:
+        pos = find('\n', start)
+        if pos == -1:
+            if start < len(text):
+                yield text[start:]
+            return
+        yield text[start:pos + 1]
+        start = pos + 1
+
+
+def iter_tokens(lines):
+    """按文档顺序产出扫描结果（单遍、线性）
+
+    Args:
+        lines: 行的可迭代对象（保留换行符，例如 iter_text_lines(text) 或打开的文件）
+
+    Yields:
+        FencedBlock / Heading / MetaLine / Rule
+    """
+    offset = 0
+    fence = None  # 当前打开的围栏：(标记字符, 长度, info, 起始偏移, 行号, 内容行列表)
+    lineno = 0
+
+    for raw in lines:
+        lineno += 1
+        line = _split_newline(raw)
+        line_start = offset
+        offset += len(raw)
+
+        if fence is not None:
+            char, length, info, start, start_line, body = fence
+            stripped = line.strip()
+            if (len(line) - len(line.lstrip(' ')) <= 3 and stripped
+                    and stripped == char * len(stripped) and len(stripped) >= length):
+                yield FencedBlock(info, '\n'.join(body), start, line_start + len(line),
+                                  start_line, lineno, True)
+                fence = None
+            else:
+                body.append(line)
+            continue
+
+        m = _FENCE_OPEN.match(line)
+        if m and not (m.group(2)[0] == '`' and '`' in m.group(3)):
+            fence = (m.group(2)[0], len(m.group(2)), m.group(3).strip(), line_start, lineno, [])
+            continue
+
+        if line.strip() == '---':
+            yield Rule(line_start, offset, lineno)
+            continue
+
+        if line.lstrip(' ').startswith('#'):
+            m = _HEADING.match(line)
+            if m:
+                yield Heading(len(m.group(1)), (m.group(2) or '').strip(), line_start, lineno)
+                continue
+
+        if '**' in line and '：**' in line:
+            for key in METADATA_KEYS:
+                if f'**{key}：**' in line:
+                    value = line.split('：', 1)[1].strip().rstrip('*').strip()
+                    yield MetaLine(key, value, line_start, lineno)
+                    break
+
+    # 未闭合的围栏：延伸到文件末尾
+    if fence is not None:
+        char, length, info, start, start_line, body = fence
+        yield FencedBlock(info, '\n'.join(body), start, offset, start_line, lineno, False)
+
+
+class Section:
+    """按标题切分的章节"""
+
+    __slots__ = ('text', 'start', 'line', 'fences')
+
+    def __init__(self, text, start, line, fences):
+        self.text = text      # 章节原文（从标题行开始，含换行符）
+        self.start = start    # 章节在输入中的起始偏移
+        self.line = line      # 起始行号
+        self.fences = fences  # 章节内的围栏代码块（偏移相对于整个输入）
+
+
+# 原始 HTML 块（Python-Markdown 原样输出，块内可以跨空行，其中的标题不能作为切分点）
+_HTML_BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'canvas', 'center', 'dd', 'details', 'div', 'dl',
+    'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'header', 'hgroup', 'iframe', 'li',
+    'main', 'map', 'math', 'menu', 'nav', 'noscript', 'object', 'ol', 'p', 'pre', 'script', 'section',
+    'style', 'table', 'textarea', 'ul', 'video',
+))
+_HTML_BLOCK_OPEN = re.compile(r'^ {0,3}<([a-zA-Z][a-zA-Z0-9-]*)')
+
+
+class _HtmlBlockTracker:
+    """跟踪是否处于未闭合的原始 HTML 块或 HTML 注释中（逐行、保守判断）"""
+
+    def __init__(self):
+        self.tag = None
+        self.depth = 0
+
+    def feed(self, line):
+        if self.tag == '!--':
+            if '-->' in line:
+                self.tag = None
+            return
+        if self.tag is not None:
+            self.depth += self._balance(line, self.tag)
+            if self.depth <= 0:
+                self.tag = None
+            return
+
+        stripped = line.lstrip(' ')
+        if stripped.startswith('<!--'):
+            if '-->' not in stripped[4:]:
+                self.tag = '!--'
+            return
+        m = _HTML_BLOCK_OPEN.match(line)
+        if m and m.group(1).lower() in _HTML_BLOCK_TAGS:
+            tag = m.group(1).lower()
+            depth = self._balance(line, tag)
+            if depth > 0:
+                self.tag, self.depth = tag, depth
+
+    @staticmethod
+    def _balance(line, tag):
+        """本行 <tag 与 </tag 的数量差"""
+        lower = line.lower()
+        return len(re.findall(rf'<{tag}(?=[\s>/])', lower)) - lower.count(f'</{tag}')
+
+    @property
+    def open(self):
+        return self.tag is not None
+
+
+def iter_sections(lines, max_level=2):
+    """在代码块外的 H1 ~ H{max_level} 标题处切分章节（流式，内存只保留当前章节）
+
+    只在安全的位置切分：标题前一行为空行（否则标题可能属于列表项或引用的惰性续行），
+    且不在原始 HTML 块或 HTML 注释内。切分后各节独立渲染，结果与整篇渲染一致。
+
+    Args:
+        lines: 行的可迭代对象（保留换行符，例如打开的文件）
+        max_level: 切分的最低标题层级（默认 2，即在 # 和 ## 处切分）
+
+    Yields:
+        Section（第一个标题之前的内容单独成节）
+    """
+    buffer = []
+
+    def feed():
+        for raw in lines:
+            buffer.append(raw)
+            yield raw
+
+    start, line, fences = 0, 1, []
+    html = _HtmlBlockTracker()
+    checked = 0     # 缓冲区中已送入 HTML 跟踪的行数
+    fence_pos = 0
+
+    for token in iter_tokens(feed()):
+        if isinstance(token, FencedBlock):
+            fences.append(token)
+            continue
+        if not isinstance(token, Heading) or token.level > max_level:
+            continue
+
+        # iter_tokens 逐行产出，此时标题行刚好在缓冲区末尾
+        heading_index = len(buffer) - 1
+        for index in range(checked, heading_index):
+            # 跳过围栏代码块内的行（fences 按顺序排列，指针只前进）
+            lineno = line + index
+            while fence_pos < len(fences) and fences[fence_pos].end_line < lineno:
+                fence_pos += 1
+            if fence_pos < len(fences) and fences[fence_pos].line <= lineno:
+                continue
+            html.feed(buffer[index])
+        checked = heading_index
+
+        if heading_index == 0:
+            continue
+        if html.open or buffer[heading_index - 1].strip():
+            continue
+
+        heading_raw = buffer.pop()
+        yield Section(''.join(buffer), start, line, fences)
+        buffer[:] = [heading_raw]
+        start, line, fences = token.start, token.line, []
+        checked = fence_pos = 0
+
+    if buffer:
+        yield Section(''.join(buffer), start, line, fences)
+
+
+# split_sections 需要逐一检查的行：围栏起始、H1 ~ H{max_level} 标题、可能开始 HTML 块或注释的行
+# （以换行符开头：正则引擎可以快速跳到下一个换行符，比多行模式的 ^ 快）
+_SECTION_EVENT = r'\n(?= {0,3}(?:`{3}|~{3})| {0,3}#{1,%d}(?![^ \t\r\n])| *<)'
+# 围栏打开时可能结束围栏的行
+_FENCE_CLOSE_CANDIDATE = re.compile(r'\n(?=[^\S\n]*(?:`{3}|~{3}))')
+
+
+def split_sections(text, start=0, max_level=2):
+    """iter_sections 的快速版本：只返回各章节的起始偏移（切分规则完全相同）
+
+    用正则直接跳到可能影响切分的行（围栏、标题、HTML 块），其余行不逐行处理；
+    只有在未闭合的 HTML 块内才逐行跟踪。适合需要反复切分整篇文档的场景（章节缓存）。
+
+    Args:
+        text: 文档文本
+        start: 从哪个偏移开始切分（正文起始位置）
+        max_level: 切分的最低标题层级
+
+    Returns:
+        list: 章节起始偏移（第一个为 start；没有内容时为空列表）
+    """
+    starts = [start] if start < len(text) else []
+    section_event = re.compile(_SECTION_EVENT % max_level, re.M)
+    fence = None  # 当前打开的围栏：(标记字符, 长度)
+    html = _HtmlBlockTracker()
+    pos = start
+    end = len(text)
+
+    while pos < end:
+        if pos == start or (html.open and fence is None):
+            line_start = pos   # 第一行、HTML 块内逐行处理
+        else:
+            # pos 总在行首：从前一个换行符开始搜索，当前行也在检查范围内
+            pattern = _FENCE_CLOSE_CANDIDATE if fence is not None else section_event
+            m = pattern.search(text, pos - 1)
+            if m is None:
+                break
+            line_start = m.start() + 1
+
+        newline = text.find('\n', line_start)
+        pos = end if newline == -1 else newline + 1
+        raw = text[line_start:pos]
+        line = _split_newline(raw)
+
+        if fence is not None:
+            char, length = fence
+            stripped = line.strip()
+            if (len(line) - len(line.lstrip(' ')) <= 3 and stripped
+                    and stripped == char * len(stripped) and len(stripped) >= length):
+                fence = None
+            continue
+
+        fm = _FENCE_OPEN.match(line)
+        if fm and not (fm.group(2)[0] == '`' and '`' in fm.group(3)):
+            fence = (fm.group(2)[0], len(fm.group(2)))
+            continue
+
+        if line_start > start and not html.open and line.lstrip(' ').startswith('#'):
+            hm = _HEADING.match(line)
+            if hm and len(hm.group(1)) <= max_level:
+                previous = text.rfind('\n', start, line_start - 1) + 1
+                if previous < start:
+                    previous = start
+                if not text[previous:line_start].strip():
+                    starts.append(line_start)
+        html.feed(raw)
+
+    return starts
+
+
+class ScanResult:
+    """一次扫描的完整结果"""
+
+    def __init__(self, text):
+        self.text = text
+        self.fences = []
+        self.headings = []
+        self.metadata = []
+        self.rules = []
+
+        buckets = {
+            FencedBlock: self.fences,
+            Heading: self.headings,
+            MetaLine: self.metadata,
+            Rule: self.rules,
+        }
+        for token in iter_tokens(iter_text_lines(text)):
+            buckets[type(token)].append(token)
+
+        # 每行起始偏移（用于任意偏移到行号的换算）
+        self.line_starts = [0]
+        find = text.find
+        pos = find('\n')
+        while pos != -1:
+            self.line_starts.append(pos + 1)
+            pos = find('\n', pos + 1)
+
+    def line_of(self, offset):
+        """字符偏移对应的行号（从 1 开始，二分查找）"""
+        return bisect_right(self.line_starts, offset)
+
+    def ascii_blocks(self):
+        """已标注 ascii:类型 且正确闭合的代码块"""
+        return [block for block in self.fences if block.closed and block.ascii_type]
+
+
+def scan_markdown(text):
+    """扫描 Markdown 文本"""
+    return ScanResult(text)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存预算（--max-memory）
+转换期间用 RLIMIT_DATA 限制进程的数据段（堆和匿名映射），
+超出预算时分配失败抛出 MemoryError，这里转换为带说明的 MemoryBudgetExceeded，
+而不是被内核 OOM killer 直接杀掉
+
+    with MemoryBudget(parse_memory_size('512M')):
+        converter.convert_stream(src, out)
+
+预算针对整个进程（含解释器自身约 10~20 MB），离开 with 块后恢复原有限制，
+常驻进程的工作进程可以连续执行不同预算的任务。
+"""
+
+try:
+    import resource
+except ImportError:  # Windows 不支持 RLIMIT，预算只作为低内存模式的开关
+    resource = None
+
+
+MEMORY_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_memory_size(text):
+    """解析内存大小：512M / 1.5G / 1048576（字节）"""
+    value = str(text).strip().upper().rstrip('B')
+    try:
+        if value and value[-1] in MEMORY_UNITS:
+            size = int(float(value[:-1]) * MEMORY_UNITS[value[-1]])
+        else:
+            size = int(value)
+    except ValueError:
+        raise ValueError(f"内存大小格式错误：{text}（示例：512M、2G）")
+    if size <= 0:
+        raise ValueError(f"内存预算必须大于 0：{text}")
+    return size
+
+
+def format_memory_size(size):
+    """格式化内存大小"""
+    if size >= 1024 ** 3:
+        return f'{size / 1024 ** 3:.1f} GB'
+    return f'{size / 1024 ** 2:.1f} MB'
+
+
+def current_data_size():
+    """进程当前的数据段大小（字节，读取 /proc/self/status；不可用时返回 None）"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmData:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class MemoryBudgetExceeded(Exception):
+    """转换超出内存预算"""
+
+    def __init__(self, limit, document=None, used=None):
+        self.limit = limit
+        self.document = document
+        target = f"转换 {document} " if document else "转换"
+        if used is not None:
+            detail = f"（进程启动后已占用 {format_memory_size(used)}，请调大 --max-memory）"
+        else:
+            detail = "（可调大 --max-memory，或拆分文档）"
+        super().__init__(f"{target}超出内存预算 {format_memory_size(limit)}{detail}")
+
+
+class MemoryBudget:
+    """在 with 块内限制进程内存
+
+    Args:
+        limit: 预算（字节；None 时不限制）
+        document: 文档名（用于错误信息）
+    """
+
+    def __init__(self, limit, document=None):
+        self.limit = limit
+        self.document = document
+        self._saved = None
+
+    def __enter__(self):
+        if resource is None or self.limit is None:
+            return self
+
+        used = current_data_size()
+        if used is not None and used >= self.limit:
+            raise MemoryBudgetExceeded(self.limit, self.document, used)
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        limit = self.limit if hard == resource.RLIM_INFINITY else min(self.limit, hard)
+        if soft == resource.RLIM_INFINITY or limit < soft:
+            self._saved = (soft, hard)
+            resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._saved is not None:
+            resource.setrlimit(resource.RLIMIT_DATA, self._saved)
+            self._saved = None
+        if exc_type is not None and issubclass(exc_type, MemoryError):
+            raise MemoryBudgetExceeded(self.limit, self.document) from exc
+        return False
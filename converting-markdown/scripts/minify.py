@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境压缩（--minify）
+对完整页面做一遍线性扫描，输出与原页面渲染效果一致：
+
+    - HTML：<pre> / <textarea>（以及内联 white-space: pre 的元素）之外的连续空白合并为一个空格，
+      块级标签两侧的空白删除；属性值和注释原样保留（AI 占位符的标记和 data-key 依赖它们）
+    - CSS：删除注释和多余空白；同一作用域内同一选择器后面又声明了的属性从前面的规则中删除
+      （完全重复的规则因此整条删除），相邻的同选择器规则、相邻的同声明规则合并
+    - 内联样式：重复出现的 style="..." 改为类（.cvt-s1 ...），类规则带 !important，
+      优先级与内联样式一致
+    - SVG：标签之间的空白删除（<text> 中 <tspan> 之间的空格保留）
+    - 脚本：删除每行的缩进和空行
+
+只合并相邻规则、只删除被同一选择器覆盖的声明，不依赖规则之间的顺序关系，
+因此不会改变层叠结果。
+"""
+
+import re
+
+
+# ========== CSS ==========
+
+# CSS 记号：注释、字符串、url()、分隔符、其余文本
+_CSS_TOKEN = re.compile(r'''
+    (?P<comment>/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+  | (?P<url>url\([^)"']*\))
+  | (?P<delim>[{};])
+  | (?P<text>[^{};"'/u]+|.)
+''', re.S | re.X)
+
+_SPACES = re.compile(r'\s+')
+_LITERAL = re.compile('\x00(\\d+)\x00')
+
+# 包含规则列表的 @ 规则（其余带块的 @ 规则内是声明，如 @font-face、@page）
+_NESTED_AT_RULES = ('@media', '@supports', '@document', '@layer', '@container', '@keyframes',
+                    '@-webkit-keyframes')
+
+# 选择器中可以删除两侧空白的符号
+_SELECTOR_PUNCT = re.compile(r'\s*([,>+~])\s*')
+
+# 声明值中可以删除两侧空白的位置
+_VALUE_PUNCT = re.compile(r'\s*,\s*|\(\s+|\s+\)|\s*!\s*(?=important)', re.I)
+
+
+def _compact(text, punct=None):
+    """合并空白（字符串原样保留）"""
+    text = _SPACES.sub(' ', text).strip()
+    if punct is not None:
+        text = punct.sub(lambda m: m.group(0).strip() or '', text)
+    return text
+
+
+class _Rule:
+    """普通规则（或 @font-face 等声明块）"""
+
+    def __init__(self, selector):
+        self.selector = selector
+        self.decls = []  # [(属性名小写, 声明文本, 是否 !important)]
+
+
+class _Block:
+    """包含规则的 @ 规则（根节点的 prelude 为 None）"""
+
+    def __init__(self, prelude):
+        self.prelude = prelude
+        self.items = []
+
+
+def _minify_piece(parts, punct):
+    """拼接记号并合并空白（字符串和 url() 先换成占位标记，原样保留）"""
+    literals = []
+    chunks = []
+    for kind, text in parts:
+        if kind in ('string', 'url'):
+            chunks.append(f'\x00{len(literals)}\x00')
+            literals.append(text)
+        else:
+            chunks.append(text)
+    text = _compact(''.join(chunks), punct)
+    if literals:
+        text = _LITERAL.sub(lambda m: literals[int(m.group(1))], text)
+    return text
+
+
+def _parse_decl(parts):
+    """解析一条声明 → (属性名小写, 声明文本, 是否 !important)，空声明返回 None"""
+    text = _minify_piece(parts, _VALUE_PUNCT)
+    if ':' not in text:
+        return None if not text else (text.lower(), text, False)
+    name, value = text.split(':', 1)
+    name, value = name.strip(), value.strip()
+    important = value.lower().endswith('!important')
+    return name.lower(), f'{name}:{value}', important
+
+
+def _parse_css(css):
+    """解析样式表为规则树（线性扫描）"""
+    root = _Block(None)
+    stack = [root]
+    rule = None      # 当前声明块
+    parts = []       # 当前选择器 / 声明的记号
+
+    for match in _CSS_TOKEN.finditer(css):
+        kind = match.lastgroup
+        text = match.group()
+        if kind == 'comment':
+            continue
+        if kind != 'delim':
+            parts.append((kind, text))
+            continue
+
+        if text == '{':
+            prelude = _minify_piece(parts, _SELECTOR_PUNCT)
+            parts = []
+            if rule is not None:
+                # 声明块中不应出现 {：忽略（与浏览器一样跳过无效内容）
+                continue
+            if prelude.lower().startswith(_NESTED_AT_RULES):
+                block = _Block(prelude)
+                stack[-1].items.append(block)
+                stack.append(block)
+            else:
+                rule = _Rule(prelude)
+                stack[-1].items.append(rule)
+        elif text == ';':
+            if rule is not None:
+                decl = _parse_decl(parts)
+                if decl:
+                    rule.decls.append(decl)
+            else:
+                # @import、@charset 等语句
+                statement = _minify_piece(parts, None)
+                if statement:
+                    stack[-1].items.append(statement)
+            parts = []
+        else:  # '}'
+            if rule is not None:
+                decl = _parse_decl(parts)
+                if decl:
+                    rule.decls.append(decl)
+                rule = None
+            elif len(stack) > 1:
+                stack.pop()
+            parts = []
+    return root
+
+
+def _optimize(block):
+    """删除被覆盖的声明和空规则，合并相邻规则（在同一作用域内）"""
+    keyframes = block.prelude is not None and 'keyframes' in block.prelude.lower()
+
+    # 相邻的同条件 @ 块先合并
+    items = []
+    for item in block.items:
+        if (isinstance(item, _Block) and items and isinstance(items[-1], _Block)
+                and items[-1].prelude == item.prelude):
+            items[-1].items.extend(item.items)
+        else:
+            items.append(item)
+
+    for item in items:
+        if isinstance(item, _Block):
+            _optimize(item)
+
+    if not keyframes:
+        # 倒序扫描：同一选择器后面的规则声明了同一属性时，前面的声明无效
+        later = {}  # {选择器: {属性名: 后面是否有 !important}}
+        for item in reversed(items):
+            # @font-face 等声明块各自独立，不参与去重
+            if not isinstance(item, _Rule) or item.selector.startswith('@'):
+                continue
+            seen = later.setdefault(item.selector, {})
+            kept = []
+            exact = set()
+            for name, text, important in reversed(item.decls):
+                if name in seen and (seen[name] or not important):
+                    continue
+                # 同一规则内：只删除完全相同的重复声明（不同值可能是兼容写法）
+                if text in exact:
+                    continue
+                exact.add(text)
+                kept.append((name, text, important))
+            kept.reverse()
+            item.decls = kept
+            for name, _, important in kept:
+                seen[name] = seen.get(name, False) or important
+
+    merged = []
+    for item in items:
+        if isinstance(item, _Rule) and not item.decls:
+            continue
+        if isinstance(item, _Block) and not item.items:
+            continue
+        previous = merged[-1] if merged else None
+        if isinstance(item, _Rule) and isinstance(previous, _Rule) and not keyframes:
+            if previous.selector == item.selector and not item.selector.startswith('@'):
+                previous.decls.extend(item.decls)
+                continue
+            if (previous.decls == item.decls and _mergeable(previous.selector)
+                    and _mergeable(item.selector)):
+                previous.selector = f'{previous.selector},{item.selector}'
+                continue
+        merged.append(item)
+    block.items = merged
+
+
+def _mergeable(selector):
+    """选择器能否与其他选择器合并（带浏览器前缀的伪类不被识别时会使整条规则失效）"""
+    return ':-' not in selector and not selector.startswith('@')
+
+
+def _serialize(block, out):
+    for item in block.items:
+        if isinstance(item, str):
+            out.append(item + ';')
+        elif isinstance(item, _Rule):
+            out.append(item.selector + '{' + ';'.join(text for _, text, _ in item.decls) + '}')
+        else:
+            out.append(item.prelude + '{')
+            _serialize(item, out)
+            out.append('}')
+
+
+def minify_css(css):
+    """压缩样式表"""
+    root = _parse_css(css)
+    _optimize(root)
+    out = []
+    _serialize(root, out)
+    return ''.join(out)
+
+
+def minify_declarations(style):
+    """压缩 style 属性中的声明列表（不带选择器和花括号）"""
+    rule = _parse_css('x{' + style + '}').items
+    if not rule or not isinstance(rule[0], _Rule):
+        return _compact(style)
+    return ';'.join(text for _, text, _ in rule[0].decls)
+
+
+def _important(declarations):
+    """为声明列表中的每条声明加上 !important"""
+    rule = _parse_css('x{' + declarations + '}').items[0]
+    return ';'.join(text if important else text + '!important'
+                    for _, text, important in rule.decls)
+
+
+# ========== JavaScript ==========
+
+_JS_INDENT = re.compile(r'\n[ \t\r\n]*')
+
+
+def minify_js(script):
+    """删除每行的缩进和空行（不改写语句，不依赖换行的自动分号插入规则）"""
+    return _JS_INDENT.sub('\n', script).strip()
+
+
+# ========== HTML ==========
+
+# 记号：注释、原样块（script/style/textarea）、标签；记号之间是文本
+# 属性部分每次只匹配一个字符或一个引号串（不能写成 [^'">]+ 再重复：
+# 未闭合的标签会指数级回溯）
+_HTML_TOKEN = re.compile(r'''
+    (?P<comment><!--.*?-->)
+  | (?P<raw><(?P<raw_name>script|style|textarea)\b(?P<raw_attrs>(?:[^'">]|"[^"]*"|'[^']*')*)>
+        (?P<raw_body>.*?)</(?P=raw_name)\s*>)
+  | (?P<tag><(?P<close>/?)(?P<name>[a-zA-Z][\w:-]*)(?:[^'">]|"[^"]*"|'[^']*')*>)
+  | (?P<decl><![^>]*>)
+''', re.S | re.X | re.I)
+
+_HTML_SPACES = re.compile(r'[ \t\r\n\f]+')
+
+# 两侧空白不影响渲染的标签
+BLOCK_TAGS = frozenset('''
+    html head body title meta link base style script noscript
+    div p ul ol li dl dt dd h1 h2 h3 h4 h5 h6 hr br pre blockquote address
+    table thead tbody tfoot tr td th caption colgroup col
+    aside header footer nav section article main figure figcaption
+    form fieldset legend details summary option
+'''.split())
+
+# 保留空白的元素
+PRE_TAGS = frozenset(['pre', 'textarea'])
+
+# 没有结束标签的元素
+VOID_TAGS = frozenset('area base br col embed hr img input link meta source track wbr'.split())
+
+# SVG 中空格有意义的文本元素（<text> 内相邻 <tspan> 之间的空格会显示）
+SVG_TEXT_TAGS = frozenset(['text', 'tspan', 'textpath'])
+
+_STYLE_ATTR = re.compile(r'(\s)style="([^"]*)"', re.I)
+_CLASS_ATTR = re.compile(r'(\sclass=")([^"]*)(")', re.I)
+_OTHER_CLASS_ATTR = re.compile(r"\sclass\s*=\s*[^\"\s]", re.I)
+_PRE_STYLE = re.compile(r'white-space\s*:\s*(pre|break-spaces)', re.I)
+
+# 内联样式转为类：类名前缀，至少重复的次数
+STYLE_CLASS_PREFIX = 'cvt-s'
+STYLE_CLASS_MIN_COUNT = 2
+_STYLE_CLASS_NAME = re.compile(re.escape(STYLE_CLASS_PREFIX) + r'(\d+)\b')
+
+
+# 文档开头和结尾（视为块边界）
+_EDGE = ('edge', '', None, True)
+
+# HTML 中可合并的空白字符（不包括 &nbsp; 等其他 Unicode 空白）
+_HTML_WHITESPACE = ' \t\r\n\f'
+
+
+def minify_html(page):
+    """压缩完整页面（HTML + 内联 CSS / SVG / 脚本），线性时间
+
+    Args:
+        page: HTML 文本
+
+    Returns:
+        str: 压缩后的 HTML
+    """
+    # 记号：(类型, 文本, 标签名, 是否块边界)，类型：text / comment / raw / tag / close / decl
+    tokens = [_EDGE]
+    append = tokens.append
+    style_counts = {}  # {压缩后的内联样式: 出现次数}
+    minified_styles = {}  # {原内联样式: 压缩后}（同一样式通常重复出现很多次）
+    position = 0
+
+    for match in _HTML_TOKEN.finditer(page):
+        start = match.start()
+        if start > position:
+            append(('text', page[position:start], None, False))
+        position = match.end()
+
+        kind = match.lastgroup
+        if kind == 'tag':
+            tag = match.group()
+            name = match.group('name').lower()
+            if match.group('close'):
+                append(('close', tag, name, name in BLOCK_TAGS))
+                continue
+            style = _STYLE_ATTR.search(tag)
+            if style:
+                declarations = minified_styles.get(style.group(2))
+                if declarations is None:
+                    declarations = minified_styles[style.group(2)] = minify_declarations(style.group(2))
+                tag = tag[:style.start()] + f'{style.group(1)}style="{declarations}"' + tag[style.end():]
+                style_counts[declarations] = style_counts.get(declarations, 0) + 1
+            append(('tag', tag, name, name in BLOCK_TAGS))
+        elif kind == 'raw':
+            raw_name = match.group('raw_name')
+            name = raw_name.lower()
+            body = match.group('raw_body')
+            open_tag = f"<{raw_name}{match.group('raw_attrs')}>"
+            if name == 'style':
+                body = minify_css(body)
+            elif name == 'script' and 'src=' not in open_tag.lower():
+                body = minify_js(body)
+            append(('raw', f'{open_tag}{body}</{raw_name}>', name, name in BLOCK_TAGS))
+        else:
+            append((kind, match.group(), None, kind == 'decl'))
+    if position < len(page):
+        append(('text', page[position:], None, False))
+    append(_EDGE)
+
+    # 重复的内联样式改为类（页面有 </head> 时才能插入类规则）
+    style_classes = {}
+    if '</head>' in page:
+        used = [int(n) for n in _STYLE_CLASS_NAME.findall(page)]
+        next_index = max(used, default=0) + 1
+        for declarations, count in style_counts.items():
+            if count >= STYLE_CLASS_MIN_COUNT and declarations:
+                style_classes[declarations] = f'{STYLE_CLASS_PREFIX}{next_index}'
+                next_index += 1
+
+    out = []
+    pre_stack = []     # 保留空白的元素（标签名）
+    svg_depth = 0
+    svg_text_depth = 0
+
+    for index in range(1, len(tokens) - 1):
+        kind, text, name, _ = tokens[index]
+        if kind == 'text':
+            if pre_stack:
+                out.append(text)
+                continue
+            if not text.strip(_HTML_WHITESPACE):
+                # 只有空白：块边界旁、SVG 图形元素之间删除，其余合并为一个空格
+                previous, following = tokens[index - 1], tokens[index + 1]
+                if svg_depth and not svg_text_depth:
+                    continue
+                if previous[3] or following[3]:
+                    continue
+                if svg_text_depth and not (_is_tspan(previous) or _is_tspan(following)):
+                    continue
+                out.append(' ')
+                continue
+            text = _HTML_SPACES.sub(' ', text)
+            if text[0] == ' ' and tokens[index - 1][3]:
+                text = text[1:]
+            if text[-1] == ' ' and tokens[index + 1][3]:
+                text = text[:-1]
+            out.append(text)
+        elif kind == 'tag':
+            void = text.endswith('/>') or name in VOID_TAGS
+            if void:
+                pass
+            elif pre_stack and name == pre_stack[-1]:
+                pre_stack.append(name)
+            elif name in PRE_TAGS or _PRE_STYLE.search(text):
+                pre_stack.append(name)
+            if style_classes:
+                text = _apply_style_class(text, style_classes)
+            if name == 'svg' and not void:
+                svg_depth += 1
+            elif svg_depth and name in SVG_TEXT_TAGS and not void:
+                svg_text_depth += 1
+            out.append(text)
+        elif kind == 'close':
+            if pre_stack and name == pre_stack[-1]:
+                pre_stack.pop()
+            if name == 'svg' and svg_depth:
+                svg_depth -= 1
+            elif svg_depth and name in SVG_TEXT_TAGS and svg_text_depth:
+                svg_text_depth -= 1
+            if name == 'head' and style_classes:
+                rules = ''.join(f'.{cls}{{{_important(declarations)}}}'
+                                for declarations, cls in style_classes.items())
+                out.append(f'<style>{rules}</style>')
+            out.append(text)
+        else:
+            out.append(text)
+
+    return ''.join(out)
+
+
+def _is_tspan(token):
+    return token[0] in ('tag', 'close') and token[2] in ('tspan', 'textpath', 'a')
+
+
+def _apply_style_class(tag, style_classes):
+    """把重复的 style 属性换成类（class 属性不是双引号形式时保持原样）"""
+    style = _STYLE_ATTR.search(tag)
+    if not style or style.group(2) not in style_classes:
+        return tag
+    cls = style_classes[style.group(2)]
+    existing = _CLASS_ATTR.search(tag)
+    if existing:
+        tag = tag[:style.start()] + tag[style.end():]
+        existing = _CLASS_ATTR.search(tag)
+        value = f'{existing.group(2)} {cls}'.strip()
+        return tag[:existing.start()] + f'{existing.group(1)}{value}"' + tag[existing.end():]
+    if _OTHER_CLASS_ATTR.search(tag):
+        return tag
+    return tag[:style.start()] + f'{style.group(1)}class="{cls}"' + tag[style.end():]
@@ -0,0 +1,982 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+页面外壳（Page Shell）
+页面模板中除标题、元数据、目录和正文之外的部分（CSS、侧边栏、脚本）只依赖主题。
+每个主题只渲染一次，编译为“静态片段 + 插槽”列表并缓存（内存 + 磁盘），
+转换文档时只需字符串拼接。
+
+外部资源模式下 CSS 和脚本不内联，页面改为引用带内容哈希的资源文件（见 assets.py）。
+
+磁盘缓存位置：$CVT_CACHE_DIR/shells/（默认 ~/.cache/converting-markdown/shells/），
+缓存键包含主题文件与模板代码的哈希，修改任一文件都会自动失效。
+"""
+
+import hashlib
+import json
+import os
+import re
+import textwrap
+from pathlib import Path
+
+from fileutil import atomic_write_text
+from manifest import file_digest
+from minify import minify_css, minify_js
+
+
+SHELL_VERSION = 1
+
+# 页面中随文档变化的插槽（asset_base：外部资源目录相对于页面的 URL 前缀）
+SLOTS = ('title', 'toc_html', 'unit', 'date', 'version', 'html_body', 'asset_base')
+
+# 页面骨架（style/script 在编译时填入，其余字段为插槽）
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    {style_block}
+</head>
+<body>
+    <aside class="sidebar">
+        <div class="sidebar-header">
+            <h3>目录</h3>
+            <button class="sidebar-toggle" onclick="toggleSidebar()">☰</button>
+        </div>
+        <div class="sidebar-content">
+            {toc_html}
+        </div>
+    </aside>
+
+    <button class="pc-toc-toggle" onclick="toggleSidebar()">☰</button>
+    <button class="mobile-toc-toggle" onclick="toggleSidebar()">☰</button>
+
+    <div class="container">
+        <div class="header">
+            <h1>{title}</h1>
+            <div class="meta">
+                <strong>编制单位：</strong>{unit} |
+                <strong>编制日期：</strong>{date} |
+                <strong>版本号：</strong>{version}
+            </div>
+        </div>
+        <div class="content">
+            {html_body}
+        </div>
+    </div>
+
+    {script_block}
+</body>
+</html>'''
+
+# 内联（默认）与外部资源两种写法
+INLINE_STYLE = '''<style>
+{style}
+    </style>'''
+INLINE_SCRIPT = '''<script>
+{script}
+    </script>'''
+LINKED_STYLE = '<link rel="stylesheet" href="{href}">'
+LINKED_SCRIPT = '<script src="{src}"></script>'
+
+# 外部资源的逻辑名称（脚本各主题共用；样式表为 cvt-{主题}.css）
+SCRIPT_ASSET = 'cvt.js'
+
+# 文件名中内容哈希的长度
+FINGERPRINT_LENGTH = 10
+
+# 侧边栏折叠、目录展开与滚动高亮脚本
+PAGE_SCRIPT = '''        function toggleSidebar() {
+            const sidebar = document.querySelector('.sidebar');
+            sidebar.classList.toggle('collapsed');
+        }
+
+        function toggleH1Children(icon) {
+            const childrenList = icon.parentElement.nextElementSibling;
+            if (childrenList && childrenList.classList.contains('toc-h1-children')) {
+                icon.classList.toggle('expanded');
+                childrenList.classList.toggle('collapsed');
+            }
+        }
+
+        function toggleH2Children(icon) {
+            const childrenList = icon.parentElement.nextElementSibling;
+            if (childrenList && childrenList.classList.contains('toc-sublist')) {
+                icon.classList.toggle('expanded');
+                childrenList.classList.toggle('collapsed');
+            }
+        }
+
+        // 高亮当前章节
+        window.addEventListener('scroll', () => {
+            // 只检查目录中出现的标题（目录层级可配置）
+            const tocLinks = document.querySelectorAll('.toc-link');
+
+            let current = null;
+            tocLinks.forEach(link => {
+                const heading = document.getElementById(link.getAttribute('href').slice(1));
+                if (heading && heading.getBoundingClientRect().top <= 100) {
+                    current = link;
+                }
+            });
+
+            tocLinks.forEach(link => {
+                link.classList.toggle('active', link === current);
+            });
+        });'''
+
+
+def add_unit(value, unit='px'):
+    """智能添加单位，如果值已经包含单位则不添加"""
+    value_str = str(value)
+    if any(value_str.endswith(u) for u in ['px', 'em', '%', 'rem', 'vh', 'vw']):
+        return value_str
+    return f"{value_str}{unit}"
+
+
+def render_css(theme):
+    """渲染主题样式表"""
+    return f'''        * {{
+            margin: 0;
+            padding: 0;
+            box-sizing: border-box;
+        }}
+
+        body {{
+            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, "Noto Sans", sans-serif;
+            line-height: 1.8;
+            color: {theme.text};
+            background: {theme.gradient_bg};
+            padding: 20px;
+            display: flex;
+            gap: 20px;
+            max-width: 1600px;
+            margin: 0 auto;
+        }}
+
+        .container {{
+            flex: 1;
+            background: {theme.background};
+            border-radius: {add_unit(theme.border_radius)};
+            box-shadow: {theme.box_shadow};
+            overflow: hidden;
+            min-width: 0;
+        }}
+
+        .header {{
+            background: {theme.gradient_header};
+            color: {theme.header_text};
+            padding: {theme.header_padding};
+            text-align: center;
+        }}
+
+        .header h1 {{
+            font-size: {theme.header_h1_size};
+            margin-bottom: 20px;
+            font-weight: {theme.header_h1_weight};
+            color: {theme.header_text};
+            text-shadow: {theme.header_text_shadow};
+        }}
+
+        .header strong {{
+            color: {theme.header_text};
+            font-weight: 600;
+        }}
+
+        .header .meta {{
+            font-size: {theme.header_meta_size};
+            opacity: {theme.header_meta_opacity};
+        }}
+
+        h1 {{
+            color: {theme.primary};
+            font-size: {theme.h2_size};
+            margin: {theme.h2_margin};
+            padding-bottom: 12px;
+            border-bottom: 3px solid {theme.primary};
+            font-weight: 600;
+        }}
+
+        h2 {{
+            color: {theme.primary};
+            font-size: {theme.h2_size};
+            margin: {theme.h2_margin};
+            padding-bottom: 12px;
+            border-bottom: 3px solid {theme.primary};
+            font-weight: 600;
+        }}
+
+        h3 {{
+            color: {theme.secondary};
+            font-size: {theme.h3_size};
+            margin: {theme.h3_margin};
+            font-weight: 600;
+        }}
+
+        h4 {{
+            color: {theme.primary};
+            font-size: {theme.h4_size};
+            margin: {theme.h4_margin};
+            font-weight: 600;
+        }}
+
+        h5 {{
+            color: #666;
+            font-size: {theme.h5_size};
+            margin: 20px 0 12px 0;
+            font-weight: 600;
+        }}
+
+        p {{
+            margin: {theme.p_margin};
+            text-align: justify;
+            font-size: {theme.body_size};
+            line-height: 1.9;
+        }}
+
+        strong {{
+            color: {theme.secondary};
+            font-weight: 600;
+        }}
+
+        blockquote {{
+            margin: 20px 0;
+            padding: {theme.blockquote_style.get('padding', '15px 20px')};
+            background: {theme.gradient_blockquote};
+            border-left: {theme.blockquote_style.get('border_left', '4px solid ' + theme.primary)};
+            font-style: {theme.blockquote_style.get('font_style', 'italic')};
+            border-radius: {add_unit(theme.blockquote_style.get('border_radius', '0 8px 8px 0'), '')};
+        }}
+
+        blockquote p {{
+            margin: 0;
+            font-style: italic;
+        }}
+
+        ul, ol {{
+            margin: 15px 0;
+            padding-left: 35px;
+        }}
+
+        li {{
+            margin: 10px 0;
+            line-height: 1.8;
+        }}
+
+        table {{
+            width: 100%;
+            border-collapse: collapse;
+            margin: 30px 0;
+            box-shadow: {theme.table_style.get('box_shadow', '0 4px 12px rgba(0,0,0,0.08)')};
+            border-radius: {add_unit(theme.table_style.get('border_radius', '10px'))};
+            overflow: hidden;
+        }}
+
+        thead {{
+            background: {theme.gradient_table};
+            color: #fff;
+        }}
+
+        th {{
+            padding: 16px 18px;
+            text-align: left;
+            font-weight: 600;
+            font-size: 15px;
+            text-transform: uppercase;
+            letter-spacing: 0.5px;
+        }}
+
+        td {{
+            padding: 14px 18px;
+            border-bottom: 1px solid #f0f0f0;
+            font-size: 15px;
+        }}
+
+        tr:last-child td {{
+            border-bottom: none;
+        }}
+
+        tr:hover {{
+            background: {theme.gradient_table_hover};
+            transition: {theme.table_style.get('hover_transition', 'background 0.3s ease')};
+        }}
+
+        pre {{
+            background: {theme.code_bg};
+            color: {theme.code_text};
+            padding: {theme.pre_style.get('padding', '25px')};
+            border-radius: {add_unit(theme.pre_style.get('border_radius', '10px'))};
+            overflow-x: auto;
+            margin: 25px 0;
+            font-family: "SFMono-Regular", Consolas, "Liberation Mono", Menlo, "Courier New", monospace;
+            font-size: 14px;
+            line-height: 1.6;
+            box-shadow: {theme.pre_style.get('box_shadow', '0 4px 12px rgba(0,0,0,0.1)')};
+        }}
+
+        code {{
+            background: {theme.code_inline_style.get('background', '#f4f4f4')};
+            padding: {theme.code_inline_style.get('padding', '3px 8px')};
+            border-radius: {add_unit(theme.code_inline_style.get('border_radius', '4px'))};
+            font-family: "SFMono-Regular", Consolas, "Liberation Mono", Menlo, monospace;
+            font-size: {theme.code_size};
+            color: {theme.code_inline_style.get('color', '#e83e8c')};
+        }}
+
+        pre code {{
+            background: transparent;
+            padding: 0;
+            border-radius: 0;
+            color: inherit;
+        }}
+
+        a {{
+            color: {theme.link};
+            text-decoration: none;
+            font-weight: 500;
+        }}
+
+        a:hover {{
+            color: {theme.primary};
+            text-decoration: underline;
+        }}
+
+        hr {{
+            border: none;
+            border-top: 2px solid #e9ecef;
+            margin: 35px 0;
+        }}
+
+        @media (max-width: 768px) {{
+            body {{
+                padding: 10px;
+            }}
+
+            .content {{
+                padding: 30px 25px;
+            }}
+
+            header {{
+                padding: 30px 20px;
+            }}
+
+            header h1 {{
+                font-size: 24px;
+            }}
+
+            .metadata p {{
+                font-size: 14px;
+            }}
+
+            h1 {{
+                font-size: 22px;
+            }}
+
+            h2 {{
+                font-size: 22px;
+            }}
+
+            h3 {{
+                font-size: 19px;
+            }}
+
+            table {{
+                font-size: 13px;
+            }}
+
+            th, td {{
+                padding: 10px 12px;
+            }}
+        }}
+
+        @media print {{
+            body {{
+                background: #fff;
+                padding: 0;
+            }}
+
+            .container {{
+                box-shadow: none;
+                border-radius: 0;
+            }}
+
+            header {{
+                background: #fff;
+                color: #333;
+                border-bottom: 3px solid #333;
+                padding: 20px;
+            }}
+
+            header h1 {{
+                color: #333;
+            }}
+
+            .metadata {{
+                background: none;
+                color: #666;
+            }}
+
+            h1, h2 {{
+                color: #333;
+                border-bottom: 2px solid #333;
+                page-break-after: avoid;
+            }}
+
+            h3 {{
+                color: #555;
+                page-break-after: avoid;
+            }}
+
+            table {{
+                page-break-inside: avoid;
+            }}
+
+            pre {{
+                page-break-inside: avoid;
+            }}
+        }}
+
+        /* 侧边栏样式 - 使用固定中性配色 */
+        .sidebar {{
+            width: 280px;
+            background: #ffffff;
+            border-radius: {add_unit(theme.border_radius)};
+            box-shadow: {theme.box_shadow};
+            height: calc(100vh - 40px);
+            position: sticky;
+            top: 20px;
+            transition: width 0.3s ease;
+            flex-shrink: 0;
+            overflow: hidden;
+            display: flex;
+            flex-direction: column;
+        }}
+
+        .sidebar.collapsed {{
+            display: none;
+        }}
+
+        .sidebar-header {{
+            padding: 20px;
+            border-bottom: 1px solid #e8e8e8;
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            background: {theme.gradient_header};
+            color: #ffffff;
+            min-height: 70px;
+            flex-shrink: 0;
+        }}
+
+        .sidebar.collapsed .sidebar-header {{
+            padding: 0;
+            justify-content: center;
+            border-bottom: none;
+        }}
+
+        .sidebar-header h3 {{
+            margin: 0;
+            font-size: 1.2em;
+            font-weight: 600;
+            transition: opacity 0.3s;
+            color: #eee;
+        }}
+
+        .sidebar.collapsed .sidebar-header h3 {{
+            display: none;
+        }}
+
+        /* PC端收起时的展开按钮 */
+        .pc-toc-toggle {{
+            display: none;
+            position: fixed;
+            left: 0;
+            top: 50%;
+            transform: translateY(-50%);
+            width: 24px;
+            height: 80px;
+            background: {theme.primary};
+            color: white;
+            border: none;
+            border-radius: 0 {add_unit(theme.border_radius)} {add_unit(theme.border_radius)} 0;
+            cursor: pointer;
+            font-size: 20px;
+            box-shadow: 2px 2px 8px rgba(0, 0, 0, 0.15);
+            align-items: center;
+            justify-content: center;
+            writing-mode: vertical-rl;
+            transition: background 0.2s;
+            z-index: 1000;
+        }}
+
+        .pc-toc-toggle:hover {{
+            background: {theme.secondary};
+        }}
+
+        @media (min-width: 769px) {{
+            .sidebar.collapsed ~ .pc-toc-toggle {{
+                display: flex;
+            }}
+        }}
+
+        .sidebar-toggle {{
+            background: rgba(255, 255, 255, 0.1);
+            border: none;
+            color: #ffffff;
+            font-size: 1.2em;
+            cursor: pointer;
+            padding: 5px 10px;
+            border-radius: 4px;
+            transition: background 0.2s;
+            flex-shrink: 0;
+        }}
+
+        .sidebar.collapsed .sidebar-toggle {{
+            background: none;
+            padding: 15px;
+            font-size: 1.5em;
+        }}
+
+        .sidebar-toggle:hover {{
+            background: rgba(255, 255, 255, 0.2);
+        }}
+
+        .sidebar-content {{
+            padding: 15px 0;
+            overflow-y: auto;
+            flex: 1;
+            transition: opacity 0.3s;
+        }}
+
+        .sidebar.collapsed .sidebar-content {{
+            opacity: 0;
+            visibility: hidden;
+            display: none;
+        }}
+
+        .sidebar-header {{
+            padding: 20px;
+            border-bottom: 1px solid {theme.border_color};
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+            background: {theme.gradient_header};
+            color: {theme.header_text};
+        }}
+
+        .sidebar-header h3 {{
+            margin: 0;
+            font-size: 1.2em;
+            font-weight: 600;
+            transition: opacity 0.3s;
+            color: #eee;
+        }}
+
+        .sidebar-toggle {{
+            background: rgba(255, 255, 255, 0.1);
+            border: none;
+            color: {theme.header_text};
+            font-size: 1.2em;
+            cursor: pointer;
+            padding: 5px 10px;
+            border-radius: 4px;
+            transition: background 0.2s;
+            flex-shrink: 0;
+        }}
+
+        .sidebar-toggle:hover {{
+            background: rgba(255, 255, 255, 0.2);
+        }}
+
+        .sidebar-content {{
+            padding: 15px 0;
+        }}
+
+        .toc-list {{
+            list-style: none;
+            padding: 0;
+            margin: 0;
+        }}
+
+        .toc-item {{
+            margin: 0;
+        }}
+
+        .toc-link {{
+            display: block;
+            padding: 10px 20px;
+            color: {theme.text};
+            text-decoration: none;
+            transition: all 0.2s;
+            border-left: 3px solid transparent;
+            width: 100%;
+        }}
+
+        .toc-link:hover {{
+            background: {theme.code_inline_bg};
+            border-left-color: {theme.primary};
+            color: {theme.primary};
+        }}
+
+        .toc-link.active {{
+            background: {theme.code_inline_bg};
+            border-left-color: {theme.primary};
+            color: {theme.primary};
+            font-weight: 600;
+        }}
+
+        .toc-level-1 {{
+            font-weight: 600;
+            font-size: 1.05em;
+        }}
+
+        .toc-h1-wrapper {{
+            display: flex;
+            align-items: center;
+            gap: 8px;
+            justify-content: space-between;
+            width: 100%;
+        }}
+
+        .toc-h2-wrapper {{
+            display: flex;
+            align-items: center;
+            gap: 8px;
+            justify-content: space-between;
+            width: 100%;
+        }}
+
+        .toc-toggle-icon {{
+            cursor: pointer;
+            user-select: none;
+            transition: transform 0.2s;
+            flex-shrink: 0;
+            font-size: 10px;
+            color: #999;
+            margin-left: auto;
+            margin-right: 15px;
+        }}
+
+        .toc-toggle-icon.expanded {{
+            transform: rotate(90deg);
+        }}
+
+        .toc-h1-children {{
+            list-style: none;
+            padding-left: 24px;
+            margin: 0;
+            overflow: hidden;
+            transition: all 0.3s ease;
+        }}
+
+        .toc-h1-children.collapsed {{
+            max-height: 0;
+            opacity: 0;
+        }}
+
+        .toc-h1-children:not(.collapsed) {{
+            max-height: 2000px;
+            opacity: 1;
+        }}
+
+        .toc-level-2 {{
+            font-weight: 500;
+        }}
+
+        .toc-sublist {{
+            list-style: none;
+            padding-left: 0;
+            margin: 0;
+            max-height: 2000px;
+            opacity: 1;
+            transition: all 0.3s ease;
+            overflow: hidden;
+        }}
+
+        .toc-sublist.collapsed {{
+            max-height: 0;
+            opacity: 0;
+        }}
+
+        .toc-level-3 .toc-link {{
+            padding-left: 40px;
+            font-size: 0.95em;
+            font-weight: 400;
+        }}
+
+        .toc-level-4 .toc-link {{
+            padding-left: 56px;
+            font-size: 0.9em;
+            font-weight: 400;
+        }}
+
+        .toc-level-5 .toc-link {{
+            padding-left: 72px;
+            font-size: 0.9em;
+            font-weight: 400;
+        }}
+
+        .toc-level-6 .toc-link {{
+            padding-left: 88px;
+            font-size: 0.9em;
+            font-weight: 400;
+        }}
+
+        /* 手机端目录展开按钮 */
+        .mobile-toc-toggle {{
+            display: none;
+            position: fixed;
+            left: 0;
+            top: 50%;
+            transform: translateY(-50%);
+            width: 40px;
+            height: 60px;
+            background: {theme.primary};
+            color: white;
+            border: none;
+            border-radius: 0 8px 8px 0;
+            cursor: pointer;
+            font-size: 24px;
+            box-shadow: 2px 2px 8px rgba(0, 0, 0, 0.2);
+            z-index: 1001;
+            align-items: center;
+            justify-content: center;
+        }}
+
+        .mobile-toc-toggle:hover {{
+            background: {theme.secondary};
+        }}
+
+        .content {{
+            padding: {theme.content_padding};
+        }}
+
+        /* 响应式设计 */
+        @media (max-width: 768px) {{
+            body {{
+                flex-direction: column;
+                padding: 10px;
+            }}
+
+            .sidebar {{
+                position: fixed;
+                left: 0;
+                top: 0;
+                height: 100vh;
+                z-index: 1000;
+                border-radius: 0;
+                width: 280px;
+            }}
+
+            .sidebar.collapsed {{
+                left: -280px;
+                width: 280px;
+            }}
+
+            .sidebar.collapsed ~ .mobile-toc-toggle {{
+                display: flex;
+            }}
+
+            .container {{
+                width: 100%;
+            }}
+
+            .content {{
+                padding: 30px 20px;
+            }}
+        }}
+
+        /* 打印时隐藏侧边栏 */
+        @media print {{
+            body {{
+                display: block;
+                padding: 0;
+            }}
+
+            .sidebar {{
+                display: none;
+            }}
+
+            .container {{
+                box-shadow: none;
+                border-radius: 0;
+            }}
+
+            .content {{
+                padding: 40px 50px;
+            }}
+        }}'''
+
+
+def _slot_marker(name):
+    """编译时用于占位的插槽标记"""
+    return f'\x00{name}\x00'
+
+
+_SLOT_PATTERN = re.compile('\x00(' + '|'.join(SLOTS) + ')\x00')
+
+
+class PageShell:
+    """编译后的页面外壳：[静态片段, 插槽名, 静态片段, 插槽名, ..., 静态片段]"""
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    @classmethod
+    def compile(cls, theme, external=False, minify=False):
+        """用插槽标记渲染一次完整模板，再按标记切分
+
+        Args:
+            theme: Theme 对象
+            external: 外部资源模式（引用 asset_files() 中的资源文件，不内联 CSS 和脚本）
+            minify: 引用压缩后的资源文件（内联模式下由 minify_html() 压缩整个页面）
+        """
+        if external:
+            files = asset_files(theme, minify)
+            base = _slot_marker('asset_base')
+            style_block = LINKED_STYLE.format(href=base + files[style_asset(theme)][0])
+            script_block = LINKED_SCRIPT.format(src=base + files[SCRIPT_ASSET][0])
+        else:
+            style_block = INLINE_STYLE.format(style=render_css(theme))
+            script_block = INLINE_SCRIPT.format(script=PAGE_SCRIPT)
+        page = PAGE_TEMPLATE.format(
+            style_block=style_block,
+            script_block=script_block,
+            **{name: _slot_marker(name) for name in SLOTS}
+        )
+        return cls(_SLOT_PATTERN.split(page))
+
+    def render(self, title, toc_html, metadata, html_body, asset_base=''):
+        """拼接生成完整页面"""
+        values = self._values(title, toc_html, metadata, html_body, asset_base)
+        parts = list(self.parts)
+        parts[1::2] = [values[name] for name in parts[1::2]]
+        return ''.join(parts)
+
+    def write(self, out, title, toc_html, metadata, write_body, asset_base=''):
+        """逐段写出页面（不拼接完整页面）
+
+        Args:
+            out: 输出文本流
+            write_body: 写正文的回调 write_body(out)
+            asset_base: 外部资源目录的 URL 前缀（如 "../assets/"，内联模式下不使用）
+        """
+        values = self._values(title, toc_html, metadata, None, asset_base)
+        for index, part in enumerate(self.parts):
+            if index % 2 == 0:
+                out.write(part)
+            elif part == 'html_body':
+                write_body(out)
+            else:
+                out.write(values[part])
+
+    @staticmethod
+    def _values(title, toc_html, metadata, html_body, asset_base):
+        """插槽取值"""
+        return {
+            'title': title,
+            'toc_html': toc_html,
+            'unit': metadata.get('编制单位', ''),
+            'date': metadata.get('编制日期', ''),
+            'version': metadata.get('版本号', ''),
+            'html_body': html_body,
+            'asset_base': asset_base,
+        }
+
+
+# ========== 外部资源 ==========
+
+def style_asset(theme):
+    """主题样式表的逻辑名称"""
+    return f'cvt-{Path(theme.source_files[-1]).stem}.css'
+
+
+def fingerprint(name, content):
+    """带内容哈希的文件名：cvt-purple.css → cvt-purple.1a2b3c4d5e.css"""
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+    stem, dot, suffix = name.rpartition('.')
+    return f'{stem}.{digest}.{suffix}'
+
+
+# 进程内缓存：{缓存键: {逻辑名称: (文件名, 内容)}}
+_asset_cache = {}
+
+
+def asset_files(theme, minify=False):
+    """主题的外部资源 {逻辑名称: (带哈希的文件名, 内容)}
+
+    Args:
+        theme: Theme 对象
+        minify: 压缩 CSS 和脚本（内容不同，文件名中的哈希也不同，与未压缩版本互不覆盖）
+    """
+    key = (shell_key(theme), minify)
+    files = _asset_cache.get(key)
+    if files is None:
+        if minify:
+            contents = {
+                style_asset(theme): minify_css(render_css(theme)) + '\n',
+                SCRIPT_ASSET: minify_js(PAGE_SCRIPT) + '\n',
+            }
+        else:
+            contents = {
+                style_asset(theme): textwrap.dedent(render_css(theme)).strip() + '\n',
+                SCRIPT_ASSET: textwrap.dedent(PAGE_SCRIPT).strip() + '\n',
+            }
+        files = _asset_cache[key] = {name: (fingerprint(name, content), content)
+                                     for name, content in contents.items()}
+    return files
+
+
+# 进程内缓存：{缓存键: PageShell}
+_shell_cache = {}
+
+
+def shell_cache_dir():
+    """页面外壳磁盘缓存目录"""
+    root = os.environ.get('CVT_CACHE_DIR') or Path.home() / '.cache' / 'converting-markdown'
+    return Path(root) / 'shells'
+
+
+def shell_key(theme):
+    """缓存键：主题文件 + 主题加载代码 + 模板代码（含资源压缩代码）的哈希"""
+    h = hashlib.sha256(f'v{SHELL_VERSION}'.encode('ascii'))
+    scripts_dir = Path(__file__).parent
+    for path in list(theme.source_files) + [scripts_dir / 'themes.py', scripts_dir / 'minify.py',
+                                            Path(__file__)]:
+        h.update(file_digest(path).encode('ascii'))
+    return h.hexdigest()
+
+
+def get_page_shell(theme, external=False, minify=False):
+    """获取主题的页面外壳（内存缓存 → 磁盘缓存 → 编译）
+
+    Args:
+        theme: Theme 对象
+        external: 外部资源模式（页面引用资源文件，不内联 CSS 和脚本）
+        minify: 外部资源模式下引用压缩后的资源文件
+    """
+    minify = minify and external
+    key = shell_key(theme) + ('-external' if external else '') + ('-min' if minify else '')
+    shell = _shell_cache.get(key)
+    if shell is not None:
+        return shell
+
+    cache_file = shell_cache_dir() / f'{key}.json'
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            parts = json.load(f)
+        if not isinstance(parts, list) or len(parts) % 2 != 1:
+            raise ValueError('页面外壳缓存格式错误')
+        shell = PageShell(parts)
+    except (OSError, ValueError):
+        shell = PageShell.compile(theme, external, minify)
+        # 磁盘缓存写入失败（如只读目录）不影响转换
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_text(cache_file, json.dumps(shell.parts, ensure_ascii=False))
+        except OSError:
+            pass
+
+    _shell_cache[key] = shell
+    return shell
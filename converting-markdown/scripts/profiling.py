@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段性能剖析
+记录每个阶段的墙钟时间、CPU 时间和输入/输出字节数，导出为 Chrome Trace JSON
+（可在 chrome://tracing 或 Perfetto 中打开）；trace_memory=True 时用 tracemalloc
+记录每个阶段的峰值内存
+
+    profiler = Profiler()
+    with profiler.stage('render', source=text) as span:
+        html = md.convert(text)
+        span.output(html)
+
+convert.py、extract_placeholders.py、replace_svg.py 的 --profile 都写入同一个
+{文档名}.trace.json（以会话ID为 trace_id），一次 AI 图形往返显示为一条完整的 trace。
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from fileutil import atomic_write_text
+
+
+def _thread_id():
+    """当前线程 ID（Python 3.8 起用系统线程 ID，与 perf 等工具一致）"""
+    if hasattr(threading, 'get_native_id'):
+        return threading.get_native_id()
+    return threading.get_ident()
+
+
+def _size_of(value):
+    """输入/输出的字节数（str 按 UTF-8 计算）"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return len(value)
+
+
+class Span:
+    """一个阶段的剖析记录"""
+
+    __slots__ = ('name', 'start_us', 'wall', 'cpu', 'bytes_in', 'bytes_out', 'mem_peak',
+                 'mem_end', 'args', 'tid', '_source', '_result')
+
+    def __init__(self, name, source=None, args=None):
+        self.name = name
+        self.start_us = 0      # 开始时间（Unix 纪元微秒，跨进程可对齐）
+        self.wall = 0.0        # 墙钟时间（秒）
+        self.cpu = 0.0         # 进程 CPU 时间（秒）
+        self.bytes_in = None
+        self.bytes_out = None
+        self.mem_peak = None   # 阶段内 Python 分配的峰值（字节，tracemalloc）
+        self.mem_end = None    # 阶段结束时仍占用的内存（字节）
+        self.args = args or {}
+        self.tid = _thread_id()
+        self._source = source
+        self._result = None
+
+    def output(self, value):
+        """登记阶段输出（阶段结束后计算字节数，不计入耗时）"""
+        self._result = value
+
+
+class _Stage:
+    """stage() 返回的上下文管理器"""
+
+    __slots__ = ('profiler', 'span', 'wall_start', 'cpu_start')
+
+    def __init__(self, profiler, span):
+        self.profiler = profiler
+        self.span = span
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            self.profiler._memory_enter()
+        self.span.start_us = int(time.time() * 1e6)
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        span = self.span
+        span.wall = time.perf_counter() - self.wall_start
+        span.cpu = time.process_time() - self.cpu_start
+        if self.profiler.trace_memory:
+            span.mem_end, span.mem_peak = self.profiler._memory_exit()
+
+        # 计时结束后再统计字节数，并释放对大字符串的引用
+        if self.profiler.measure_bytes:
+            span.bytes_in = _size_of(span._source)
+            span.bytes_out = _size_of(span._result)
+        span._source = span._result = None
+
+        self.profiler.spans.append(span)
+        if self.profiler.on_span is not None:
+            self.profiler.on_span(span)
+        return False
+
+
+class Profiler:
+    """分阶段剖析器
+
+    Args:
+        measure_bytes: 是否统计输入/输出字节数（需要编码字符串，只在剖析模式开启）
+        on_span: 每个阶段结束时的回调 on_span(span)，用于接入外部监控
+        trace_memory: 是否用 tracemalloc 记录各阶段峰值内存（明显变慢，只在需要时开启）
+    """
+
+    def __init__(self, measure_bytes=True, on_span=None, trace_memory=False):
+        self.measure_bytes = measure_bytes
+        self.on_span = on_span
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._memory_peaks = []  # 嵌套阶段：外层阶段在内层开始前已达到的峰值
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _memory_enter(self):
+        """阶段开始：保存外层阶段的峰值，再重置峰值计数"""
+        if self._memory_peaks:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], tracemalloc.get_traced_memory()[1])
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            # Python 3.9 以前没有 reset_peak，只能清空记录：峰值和占用改为从阶段开始算起的增量
+            tracemalloc.clear_traces()
+        self._memory_peaks.append(0)
+
+    def _memory_exit(self):
+        """阶段结束：返回 (当前占用, 阶段峰值)，并把峰值计入外层阶段"""
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, self._memory_peaks.pop())
+        if self._memory_peaks:
+            self._memory_peaks[-1] = max(self._memory_peaks[-1], peak)
+        return current, peak
+
+    def peak_memory(self):
+        """所有阶段中的最大峰值（字节，未开启 trace_memory 时为 None）"""
+        peaks = [span.mem_peak for span in self.spans if span.mem_peak is not None]
+        return max(peaks) if peaks else None
+
+    def stage(self, name, source=None, **args):
+        """记录一个阶段：with profiler.stage('name', source=输入) as span: ..."""
+        return _Stage(self, Span(name, source, args))
+
+    def timings(self, start=0):
+        """各阶段墙钟时间 {阶段: 秒}（从第 start 条记录开始）"""
+        return {span.name: span.wall for span in self.spans[start:]}
+
+    def trace_events(self):
+        """转换为 Chrome Trace 事件（完整事件 ph=X，时间单位微秒）"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            args = dict(span.args)
+            args['cpu_ms'] = round(span.cpu * 1000, 3)
+            if span.bytes_in is not None:
+                args['bytes_in'] = span.bytes_in
+            if span.bytes_out is not None:
+                args['bytes_out'] = span.bytes_out
+            if span.mem_peak is not None:
+                args['mem_peak'] = span.mem_peak
+                args['mem_end'] = span.mem_end
+            events.append({
+                'name': span.name,
+                'cat': 'cvt',
+                'ph': 'X',
+                'ts': span.start_us,
+                'dur': max(1, round(span.wall * 1_000_000)),
+                'pid': pid,
+                'tid': span.tid,
+                'args': args,
+            })
+        return events
+
+
+def trace_path_for(html_file):
+    """文档的 trace 文件路径：{文档名}.trace.json（与 HTML 同目录）"""
+    html_path = Path(html_file)
+    return html_path.with_name(f'{html_path.stem}.trace.json')
+
+
+def write_trace(trace_file, profiler, process_name, trace_id, document=None, append=True):
+    """写入 Chrome Trace 文件
+
+    append=True 且已有 trace 的 trace_id 相同时追加事件（同一次往返），
+    否则新建 trace。
+    """
+    trace_file = Path(trace_file)
+    events = []
+    if append and trace_file.exists():
+        try:
+            with open(trace_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('otherData', {}).get('trace_id') == trace_id:
+                events = data.get('traceEvents', [])
+        except (OSError, ValueError):
+            events = []
+
+    events.append({'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                   'args': {'name': process_name}})
+    events.extend(profiler.trace_events())
+
+    atomic_write_text(trace_file, json.dumps({
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'trace_id': trace_id, 'document': document or trace_file.stem},
+    }, ensure_ascii=False))
+    return trace_file
+
+
+def _format_bytes(size):
+    if size is None:
+        return '-'
+    if size >= 1024 ** 2:
+        return f'{size / 1024 ** 2:.1f} MB'
+    if size >= 1024:
+        return f'{size / 1024:.1f} KB'
+    return f'{size} B'
+
+
+def print_profile(profiler, trace_file=None):
+    """输出剖析摘要"""
+    print(f"\n⏱️  性能剖析")
+    # 中文表头按两列宽对齐
+    header = "   阶段" + " " * 18 + " " * 7 + "墙钟" + " " * 7 + "CPU" + " " * 8 + "输入" + " " * 8 + "输出"
+    if profiler.trace_memory:
+        header += " " * 4 + "峰值内存"
+    print(header)
+    for span in profiler.spans:
+        line = (f"   {span.name:<22}{span.wall * 1000:>8.1f} ms{span.cpu * 1000:>7.1f} ms"
+                f"{_format_bytes(span.bytes_in):>12}{_format_bytes(span.bytes_out):>12}")
+        if profiler.trace_memory:
+            line += f"{_format_bytes(span.mem_peak):>12}"
+        print(line)
+    if profiler.trace_memory:
+        print(f"📈 峰值内存：{_format_bytes(profiler.peak_memory())}（tracemalloc，仅统计 Python 分配）")
+    if trace_file:
+        print(f"📄 Trace 文件：{trace_file}（可在 chrome://tracing 或 Perfetto 中打开）")
@@ -7,6 +7,10 @@ import re
 import sys
 from pathlib import Path
 
+from compress import remove_compressed
+from md_scanner import has_box_chars
+from splice import Splicer
+
 
 def read_html(file_path):
     """读取 HTML 文件"""
@@ -15,47 +19,45 @@ def read_html(file_path):
 
 
 def write_html(file_path, content):
-    """写入 HTML 文件"""
+    """写入 HTML 文件（同时删除已过期的预压缩文件）"""
+    remove_compressed(file_path)
     with open(file_path, 'w', encoding='utf-8') as f:
         f.write(content)
 
 
 def contains_ascii_diagram(code_block):
-    """检查代码块是否包含 ASCII 图"""
-    ascii_chars = ['┌', '┐', '└', '┘', '│', '─', '├', '┤', '┬', '┴', '┼', '━', '┃', '┳', '┻', '╋']
-    return any(char in code_block for char in ascii_chars)
+    """检查代码块是否包含 ASCII 图（框线字符集与扫描器统一）"""
+    return has_box_chars(code_block)
+
+
+# <pre><code>...</code></pre> 代码块
+CODE_BLOCK_START = re.compile(r'<pre><code>')
+CODE_BLOCK_END = '</code></pre>'
 
 
 def replace_ascii_diagrams_with_svg_placeholder(html_content):
     """
-    将 ASCII 图替换为 SVG 占位符
+    将 ASCII 图替换为 SVG 占位符（一遍扫描，替换结果一次拼接）
     返回：替换后的 HTML 内容，找到的 ASCII 图数量
     """
-    # 匹配 <pre><code>...</code></pre> 块
-    pattern = r'<pre><code>(.*?)</code></pre>'
-    matches = list(re.finditer(pattern, html_content, re.DOTALL))
-
     ascii_count = 0
-    modified_content = html_content
 
-    # 从后向前替换，避免位置偏移
-    for match in reversed(matches):
-        code_block = match.group(1)
+    def replace(match, block):
+        nonlocal ascii_count
+        code_block = block[match.end() - match.start():-len(CODE_BLOCK_END)]
+        if not contains_ascii_diagram(code_block):
+            return None
 
-        if contains_ascii_diagram(code_block):
-            ascii_count += 1
-            # 创建 SVG 占位符
-            placeholder = f'''<div class="ascii-diagram" style="margin: 25px 0; text-align: center;">
+        ascii_count += 1
+        # 创建 SVG 占位符（按文档顺序编号）
+        return f'''<div class="ascii-diagram" style="margin: 25px 0; text-align: center;">
 <div style="background: #f5f5f5; border: 2px dashed #1890ff; padding: 20px; border-radius: 8px;">
 <p style="color: #1890ff; font-weight: 600; margin: 0 0 10px 0;">📊 ASCII 图 {ascii_count}</p>
 <pre style="background: white; padding: 15px; border-radius: 4px; overflow-x: auto;"><code>{code_block}</code></pre>
 </div>
 </div>'''
 
-            # 替换
-            start, end = match.span()
-            modified_content = modified_content[:start] + placeholder + modified_content[end:]
-
+    modified_content = Splicer(CODE_BLOCK_START, CODE_BLOCK_END, replace).splice(html_content)
     return modified_content, ascii_count
 
 
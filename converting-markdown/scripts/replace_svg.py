@@ -5,17 +5,40 @@
 
 使用方法：
     python3 replace_svg.py html_file.json
+    python3 replace_svg.py html_file.json --profile   # 各阶段耗时追加到 {文档名}.trace.json
+    python3 replace_svg.py html_file.json --precompress [--compress-level 9]   # 同时写出 .gz/.br
+    python3 replace_svg.py html_file.json --minify    # 替换后压缩页面（convert.py --minify 生成的页面）
+    python3 replace_svg.py html_file.json --precompress --reproducible   # .gz 头部不记录修改时间
+    python3 replace_svg.py html_file.json --follow    # 跟随模式：生成的文件一出现就替换
+    python3 replace_svg.py html_file.json --follow --interval 0.5 --max-wait 600
+
+跟随模式：监视会话缓存目录，每个 {id}.svg / {id}.html 写完（大小和修改时间两次检查不变）后
+立即替换到 HTML（原子改写），页面随图形生成逐步可用；全部占位符替换后才保存图形缓存、
+清理会话目录。Ctrl-C 或超过 --max-wait 秒时停止，未替换的占位符和会话目录保留，可再次运行。
 
 注意：本脚本只负责替换，不验证SVG/HTML格式。
 格式验证由AI Agent在生成代码时自行负责。
 """
 
 import json
-import re
 import sys
 import shutil
+import time
 from pathlib import Path
 
+from cache_index import CacheIndex
+from converter import reproducible_enabled
+from compress import (Precompressor, remove_compressed, print_compression, parse_level,
+                      available_formats, reproducible_mtime, DEFAULT_LEVEL)
+from diagram_cache import DiagramCache, diagram_ext
+from fileutil import atomic_write_text, atomic_open
+from minify import minify_html
+from profiling import Profiler, trace_path_for, write_trace, print_profile
+from splice import Splicer, AI_START_PATTERN, ai_end_marker
+
+
+# 跟随模式检查缓存目录的间隔（秒）
+FOLLOW_INTERVAL = 0.2
 
 def load_placeholders_json(json_file):
     """从JSON文件加载占位符信息
@@ -42,7 +65,7 @@ def load_placeholders_json(json_file):
     return placeholders, session_id, document_name, json_dir, html_file
 
 
-def replace_placeholders(html_file, placeholders, caches_dir, session_id):
+def replace_placeholders(html_file, placeholders, caches_dir, session_id, profiler=None):
     """从缓存目录读取SVG/HTML并替换HTML中的占位符
 
     Args:
@@ -50,67 +73,171 @@ def replace_placeholders(html_file, placeholders, caches_dir, session_id):
         placeholders: 占位符列表
         caches_dir: 缓存目录路径
         session_id: 会话ID
+        profiler: 剖析器（Profiler，可选）
 
     Returns:
         str: 替换后的HTML内容
     """
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
+    profiler = profiler or Profiler(measure_bytes=False)
+
+    with profiler.stage('read', source=Path(html_file).stat().st_size) as span:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        span.output(html_content)
+
+    with profiler.stage('splice', source=html_content) as span:
+        splicer, stats = generated_splicer(placeholders, caches_dir, session_id)
+        html_content = splicer.splice(html_content)
+        print_splice_summary(stats)
+        span.output(html_content)
+    return html_content
+
 
-    skipped = []
-    replaced = []
-    ui_count = 0
+def generated_splicer(placeholders, caches_dir, session_id):
+    """创建替换生成结果的引擎（一遍扫描全部占位符；生成的文件在替换到该占位符时才读取）
+
+    Returns:
+        tuple: (Splicer, stats)，stats 在替换过程中累积：
+            {'replaced': [id], 'skipped': [id], 'ui': HTML界面数, 'remaining': 未替换的占位符数}
+    """
+    files = {}  # {(类型, id): 生成的文件}
+    stats = {'replaced': [], 'skipped': [], 'ui': 0, 'remaining': 0}
 
     for placeholder in placeholders:
-        placeholder_id = placeholder['id']
+        placeholder_id = str(placeholder['id'])
         diagram_type = placeholder['type'].upper()
 
-        # 确定文件扩展名
-        is_ui = diagram_type == 'UI'
-        ext = 'html' if is_ui else 'svg'
-
-        # 从缓存目录读取生成的文件
+        # 从缓存目录读取生成的文件（UI 为 HTML 界面，其余为 SVG）
+        ext = 'html' if diagram_type == 'UI' else 'svg'
         cache_file = caches_dir / f"{placeholder_id}.{ext}"
 
         if not cache_file.exists():
             print(f"⚠️  跳过占位符 #{placeholder_id}：缓存文件不存在 ({cache_file.name})")
-            skipped.append(placeholder_id)
+            stats['skipped'].append(placeholder_id)
             continue
+        files[(diagram_type, placeholder_id)] = cache_file
+
+    def replace(match, block):
+        # 按类型、id 和 session 精确匹配，每个占位符只替换第一处
+        key = (match.group('type'), match.group('id'))
+        cache_file = files.pop(key, None) if match.group('session') == session_id else None
+        if cache_file is None:
+            stats['remaining'] += 1
+            return None
 
-        # 读取生成的代码
         with open(cache_file, 'r', encoding='utf-8') as f:
             generated_code = f.read()
+        stats['replaced'].append(key[1])
 
-        # 使用带id和session的标记进行精确匹配
-        pattern = rf'(<!-- AI-SVG-{diagram_type}-START:id={placeholder_id},session={session_id} -->).*?(<!-- AI-SVG-{diagram_type}-END:id={placeholder_id},session={session_id} -->)'
-        replacement = generated_code
+        if key[0] == 'UI':
+            stats['ui'] += 1
+            print(f"✅ 替换占位符 #{key[1]} ({key[0]}) → HTML界面")
+        else:
+            print(f"✅ 替换占位符 #{key[1]} ({key[0]}) → SVG图形")
+        return generated_code
 
-        html_content = re.sub(pattern, replacement, html_content, flags=re.DOTALL, count=1)
-        replaced.append(placeholder_id)
+    return Splicer(AI_START_PATTERN, ai_end_marker, replace), stats
 
-        if is_ui:
-            ui_count += 1
-            print(f"✅ 替换占位符 #{placeholder_id} ({diagram_type}) → HTML界面")
-        else:
-            print(f"✅ 替换占位符 #{placeholder_id} ({diagram_type}) → SVG图形")
 
-    if skipped:
-        print(f"\n⚠️  跳过了 {len(skipped)} 个占位符（缓存文件不存在）")
+def print_splice_summary(stats):
+    """输出替换汇总"""
+    if stats['skipped']:
+        print(f"\n⚠️  跳过了 {len(stats['skipped'])} 个占位符（缓存文件不存在）")
 
+    replaced = len(stats['replaced'])
     if replaced:
-        print(f"✅ 成功替换了 {len(replaced)} 个占位符")
-        if ui_count > 0:
-            print(f"   其中 {ui_count} 个为HTML界面，{len(replaced) - ui_count} 个为SVG图形")
+        print(f"✅ 成功替换了 {replaced} 个占位符")
+        if stats['ui'] > 0:
+            print(f"   其中 {stats['ui']} 个为HTML界面，{replaced - stats['ui']} 个为SVG图形")
 
-    return html_content
 
+def splice_html(html_file, splicer, minify=False, profiler=None):
+    """替换 HTML 文件中的占位符并原子改写（保存前先删除旧的预压缩文件，静态服务器不会发送过期内容）
 
-def verify_replacement(html_content, expected_count):
-    """验证替换是否成功（简单检查）"""
-    # 检查是否还有未替换的占位符
-    remaining = len(re.findall(r'<!-- AI-SVG-.*?-START:id=', html_content))
-    svg_count = len(re.findall(r'<svg[^>]*>', html_content))
-    ui_div_count = len(re.findall(r'<div style="[^"]*font-family', html_content))
+    Args:
+        html_file: HTML文件路径
+        splicer: 替换引擎（generated_splicer 创建）
+        minify: 替换后整页压缩（convert.py --minify 生成的页面）
+        profiler: 剖析器（Profiler，可选）
+    """
+    profiler = profiler or Profiler(measure_bytes=False)
+    if minify:
+        # 压缩需要完整页面：整页读入、替换，生成的 SVG/HTML 是未压缩的，替换后整页再压缩一遍
+        with profiler.stage('read', source=html_file.stat().st_size) as span:
+            with open(html_file, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            span.output(html_content)
+        with profiler.stage('splice', source=html_content) as span:
+            html_content = splicer.splice(html_content)
+            span.output(html_content)
+        with profiler.stage('minify', source=html_content) as span:
+            html_content = minify_html(html_content)
+            span.output(html_content)
+        with profiler.stage('write', source=html_content):
+            remove_compressed(html_file)
+            atomic_write_text(html_file, html_content)
+    else:
+        # 分块读取、替换并写入临时文件，完成后原子替换（内存与页面大小无关）
+        with profiler.stage('splice', source=html_file.stat().st_size):
+            remove_compressed(html_file)
+            with open(html_file, 'r', encoding='utf-8') as src, atomic_open(html_file) as out:
+                splicer.splice_stream(src, out)
+
+
+def follow_placeholders(html_file, placeholders, caches_dir, session_id, minify=False,
+                        interval=FOLLOW_INTERVAL, max_wait=None, profiler=None):
+    """跟随模式：生成的文件写完即替换到 HTML，直到全部替换、超时或 Ctrl-C
+
+    同一次检查中写完的文件合并为一次改写。文件的大小和修改时间在相邻两次检查中
+    不变才视为写完（不是原子写入的生成方也不会被读到一半）。
+
+    Returns:
+        tuple: (已替换的占位符列表, 未替换的占位符列表)
+    """
+    waiting = {str(p['id']): p for p in placeholders}
+    resolved = []
+    stamps = {}  # {id: (大小, 修改时间)}
+    total = len(placeholders)
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+
+    try:
+        while waiting:
+            ready = []
+            for placeholder_id, placeholder in waiting.items():
+                cache_file = caches_dir / f"{placeholder_id}.{diagram_ext(placeholder['type'])}"
+                try:
+                    st = cache_file.stat()
+                except FileNotFoundError:
+                    continue
+                stamp = (st.st_size, st.st_mtime_ns)
+                if st.st_size and stamps.get(placeholder_id) == stamp:
+                    ready.append(placeholder)
+                else:
+                    stamps[placeholder_id] = stamp
+
+            if ready:
+                splicer, _ = generated_splicer(ready, caches_dir, session_id)
+                splice_html(html_file, splicer, minify, profiler)
+                for placeholder in ready:
+                    resolved.append(waiting.pop(str(placeholder['id'])))
+                print(f"🔄 已替换 {len(resolved)}/{total}，HTML已更新（剩余 {len(waiting)} 个）", flush=True)
+                continue
+
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"\n⏱️  等待超过 {max_wait:g} 秒，停止跟随")
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f"\n⏹️  已停止跟随")
+
+    return resolved, list(waiting.values())
+
+
+def verify_replacement(splicer, stats):
+    """验证替换是否成功（简单检查：替换时扫描到的占位符都已替换）"""
+    remaining = stats['remaining'] + len(splicer.unterminated)
+    ui_count = stats['ui']
+    svg_count = len(stats['replaced']) - ui_count
 
     # 简单验证：没有未替换的占位符即可
     success = remaining == 0
@@ -118,14 +245,42 @@ def verify_replacement(html_content, expected_count):
     if success:
         print(f"\n✅ 替换完成：所有占位符已替换")
         print(f"   - SVG图形: {svg_count}个")
-        print(f"   - HTML界面: {ui_div_count}个")
-        print(f"   - 总计: {svg_count + ui_div_count}个")
+        print(f"   - HTML界面: {ui_count}个")
+        print(f"   - 总计: {svg_count + ui_count}个")
     else:
         print(f"\n⚠️  警告：仍有 {remaining} 个占位符未替换")
 
     return success
 
 
+def store_diagram_cache(html_file, placeholders, caches_dir):
+    """将生成的SVG/HTML存入持久化图形缓存，供后续重新转换时复用
+
+    Args:
+        html_file: HTML文件路径（缓存位于同目录的 .cvt-caches/.diagrams）
+        placeholders: 占位符列表
+        caches_dir: 会话缓存目录路径
+    """
+    diagram_cache = DiagramCache.for_document(html_file)
+    stored = []
+
+    for placeholder in placeholders:
+        cache_key = placeholder.get('cache_key')
+        if not cache_key:
+            continue
+
+        cache_file = caches_dir / f"{placeholder['id']}.{diagram_ext(placeholder['type'])}"
+        if not cache_file.exists():
+            continue
+
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            stored.append(diagram_cache.put(cache_key, placeholder['type'], f.read()))
+
+    if stored:
+        CacheIndex.for_document(html_file).add(stored)
+        print(f"💾 已保存 {len(stored)} 个图形到持久化缓存: {diagram_cache.root}")
+
+
 def cleanup_caches(session_dir):
     """清理缓存目录
 
@@ -136,8 +291,9 @@ def cleanup_caches(session_dir):
         return
 
     try:
-        # 删除整个会话目录
+        # 删除整个会话目录（.cvt-caches/{文档名}/{session_id}）
         shutil.rmtree(session_dir)
+        CacheIndex(session_dir.parent.parent).remove([session_dir])
         print(f"🧹 已清理缓存目录: {session_dir}")
 
         # 检查文档目录是否为空，如果为空也删除
@@ -150,17 +306,67 @@ def cleanup_caches(session_dir):
         print(f"⚠️  清理缓存目录时出错: {e}")
 
 
+def parse_args(argv):
+    """解析命令行：返回 (位置参数, 开关集合, 选项值)
+
+    选项值：{'--compress-level', '--interval', '--max-wait'}（未指定时为默认值或 None）
+    """
+    args, flags = [], set()
+    options = {'--compress-level': DEFAULT_LEVEL, '--interval': None, '--max-wait': None}
+    rest = iter(argv)
+    for arg in rest:
+        name = arg.split('=', 1)[0]
+        if arg in ('--profile', '--precompress', '--minify', '--reproducible', '--follow'):
+            flags.add(arg)
+        elif arg in options:
+            options[arg] = next(rest, None)
+        elif name in options:
+            options[name] = arg.split('=', 1)[1]
+        else:
+            args.append(arg)
+    return args, flags, options
+
+
+def parse_seconds(value, name):
+    """解析秒数选项（须为正数，否则抛出 ValueError）"""
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 须为秒数：{value}") from None
+    if seconds <= 0:
+        raise ValueError(f"{name} 须大于 0：{value}")
+    return seconds
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("用法: python3 replace_svg.py <extracted.json>")
+    args, flags, options = parse_args(sys.argv[1:])
+    profile = '--profile' in flags
+    follow = '--follow' in flags
+
+    if not args:
+        print("用法: python3 replace_svg.py <extracted.json> [--profile] [--minify] [--precompress] [--compress-level N] [--reproducible]")
+        print("                             [--follow [--interval 秒] [--max-wait 秒]]")
         print("   JSON文件路径：.cvt-caches/{文档名}/{session_id}/extracted.json")
         sys.exit(1)
 
-    json_file = sys.argv[1]
-    json_path = Path(json_file)
+    try:
+        compress_level = parse_level(options['--compress-level'])
+        interval = FOLLOW_INTERVAL
+        if options['--interval'] is not None:
+            interval = parse_seconds(options['--interval'], '--interval')
+        max_wait = None
+        if options['--max-wait'] is not None:
+            max_wait = parse_seconds(options['--max-wait'], '--max-wait')
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    json_file = args[0]
+    profiler = Profiler(measure_bytes=profile)
 
     # 加载JSON
-    placeholders, session_id, document_name, caches_dir, html_file = load_placeholders_json(json_file)
+    with profiler.stage('load_json'):
+        placeholders, session_id, document_name, caches_dir, html_file = load_placeholders_json(json_file)
     total = len(placeholders)
 
     if not session_id:
@@ -190,30 +396,84 @@ def main():
         if not cache_file.exists():
             missing.append((placeholder_id, cache_file.name))
 
-    if missing:
+    if missing and not follow:
         print(f"❌ 错误：{len(missing)} 个缓存文件不存在")
         for pid, fname in missing:
             print(f"   - 占位符 #{pid}: {fname}")
         print(f"\n💡 提示：AI Agent应先生成SVG/HTML文件到缓存目录：{caches_dir}")
+        print(f"💡 或使用 --follow：生成的文件一出现就替换")
         sys.exit(1)
 
-    print(f"📊 开始替换 {total} 个占位符...\n")
-
-    # 替换占位符
-    html_content = replace_placeholders(html_file, placeholders, caches_dir, session_id)
-
-    # 保存HTML
-    with open(html_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    minify = '--minify' in flags
+    waiting = []
+    if follow:
+        # 跟随模式：文件写完即替换，页面逐步可用
+        print(f"👀 跟随模式：监视 {caches_dir}（{total} 个占位符，已生成 {total - len(missing)} 个）")
+        print(f"   生成的文件写完后立即替换，Ctrl-C 停止\n")
+        resolved, waiting = follow_placeholders(html_file, placeholders, caches_dir, session_id,
+                                                minify, interval, max_wait, profiler)
+    else:
+        print(f"📊 开始替换 {total} 个占位符...\n")
+
+        # 替换占位符：一遍扫描，保存前先删除旧的预压缩文件（静态服务器不会发送过期内容）
+        splicer, stats = generated_splicer(placeholders, caches_dir, session_id)
+        splice_html(html_file, splicer, minify, profiler)
+        print_splice_summary(stats)
+
+    # 预压缩在后台进行，与验证、写图形缓存和清理重叠
+    compressor = None
+    if '--precompress' in flags:
+        # 可复现构建（--reproducible 或设置了 SOURCE_DATE_EPOCH）：gzip 头部使用固定时间
+        reproducible = '--reproducible' in flags or reproducible_enabled()
+        compressor = Precompressor(available_formats(), compress_level,
+                                   mtime=reproducible_mtime() if reproducible else None)
+        compressor.submit(html_file)
 
     # 简单验证
-    verify_replacement(html_content, total)
+    with profiler.stage('verify'):
+        if follow:
+            if waiting:
+                print(f"\n⚠️  警告：仍有 {len(waiting)} 个占位符未替换")
+                for placeholder in waiting[:10]:
+                    print(f"   - 占位符 #{placeholder['id']}: {placeholder['id']}.{diagram_ext(placeholder['type'])}")
+                if len(waiting) > 10:
+                    print(f"   - …… 另有 {len(waiting) - 10} 个")
+            else:
+                ui_count = sum(1 for p in resolved if p['type'] == 'ui')
+                print(f"\n✅ 替换完成：所有占位符已替换")
+                print(f"   - SVG图形: {total - ui_count}个")
+                print(f"   - HTML界面: {ui_count}个")
+                print(f"   - 总计: {total}个")
+        else:
+            verify_replacement(splicer, stats)
 
     print(f"\n📄 HTML文件已保存: {html_file}")
 
-    # 清理缓存目录
+    # 保存到持久化图形缓存（会话目录清理后仍可复用）
+    with profiler.stage('store_cache'):
+        store_diagram_cache(html_file, resolved if follow else placeholders, caches_dir)
+
+    # 清理缓存目录（跟随模式下全部替换后才清理，未替换的可再次运行）
     session_dir = caches_dir
-    cleanup_caches(session_dir)
+    if waiting:
+        print(f"📁 缓存目录已保留: {session_dir}")
+        print(f"💡 生成剩余文件后再次运行：python3 replace_svg.py {json_file} --follow")
+    else:
+        with profiler.stage('cleanup'):
+            cleanup_caches(session_dir)
+
+    if compressor:
+        with profiler.stage('precompress'):
+            print_compression(compressor.close())
+
+    if profile:
+        # 追加到 convert.py --profile 生成的同一 trace（trace_id 为会话ID）
+        trace_file = write_trace(trace_path_for(html_file), profiler, 'replace_svg.py',
+                                 session_id, document_name)
+        print_profile(profiler, trace_file)
+
+    if waiting:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节渲染缓存
+正文在安全的 # ~ ### 处切分为章节（md_scanner.split_sections），每节渲染好的 HTML 片段、
+目录条目和 ASCII 图按章节原文的哈希保存；重新转换时只渲染内容改变的章节，其余直接复用，
+适合边写边预览的循环（改一段文字只重新渲染所在的一节）
+
+    - 缓存键：章节 Markdown 原文 + 全文引用式链接定义的哈希
+    - 片段中的标题 ID 和图形占位符都是节内编号，拼接时按文档顺序重新分配，
+      章节增删、移动后仍可复用
+    - 图形在拼接后照常替换（AI 模式下先查持久化图形缓存）
+    - 转换器代码变化时整份缓存失效
+    - 缓存文件只追加：每次转换只写入新渲染的章节；不再使用的旧章节超过一半时整体重写
+
+缓存位置：.cvt-caches/{文档名}/sections.jsonl（第一行为版本信息，之后每行一个章节）
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from fileutil import atomic_open
+from manifest import converter_digest
+
+
+SECTION_CACHE_VERSION = 1
+SECTION_CACHE_NAME = 'sections.jsonl'
+
+# 切分到 ### 为止：方案中单个 ## 章节常有上百 KB，按 ## 缓存时改一段仍要重新渲染整章
+SECTION_LEVEL = 3
+
+# 文件中的章节数超过本次用到的 2 倍（且超过该数量）时压缩重写
+COMPACT_MIN_ENTRIES = 64
+
+# 进程内实例：{缓存文件路径: SectionCache}（常驻进程中不必每次重新读取文件；
+# 只保留最近使用的几个文档，批量转换时内存不随文档数增长）
+_instances = {}
+MAX_INSTANCES = 8
+
+
+def references_digest(references):
+    """全文链接定义的哈希（没有定义时为空串）"""
+    if not references:
+        return ''
+    data = json.dumps(references, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def section_key(text, refs_digest=''):
+    """计算章节缓存键"""
+    h = hashlib.sha256(text.encode('utf-8'))
+    h.update(b'\0')
+    h.update(refs_digest.encode('ascii'))
+    return h.hexdigest()
+
+
+class SectionCache:
+    """章节渲染缓存（一个文档一份）
+
+    条目格式：
+        {'body': 片段 HTML, 'tail': 与下一节的分隔, 'toc': 目录条目, 'slugs': 标题 slug,
+         'token': 标题 ID 标记的随机标识, 'diagrams': [[图类型, ASCII 内容], ...]}
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = None   # 已保存的条目（首次查询时加载）
+        self.used = {}        # 本次转换用到的条目
+        self.added = {}       # 本次新渲染、尚未写入文件的条目
+        self.stored = 0       # 文件中的章节行数（含已不再使用的）
+        self.valid = False    # 文件存在且版本、转换器一致（可以追加）
+
+    @classmethod
+    def for_document(cls, md_path):
+        """获取 Markdown 文档的章节缓存（同一进程内复用同一实例）"""
+        md_path = Path(md_path).resolve()
+        path = md_path.parent / '.cvt-caches' / md_path.stem / SECTION_CACHE_NAME
+        cache = _instances.pop(path, None) or cls(path)
+        _instances[path] = cache
+        if len(_instances) > MAX_INSTANCES:
+            del _instances[next(iter(_instances))]
+        return cache
+
+    def _header(self):
+        return {'version': SECTION_CACHE_VERSION, 'converter': converter_digest()}
+
+    def _load(self):
+        self.entries = {}
+        self.stored = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                if json.loads(f.readline()) != self._header():
+                    return
+                self.valid = True
+                for line in f:
+                    try:
+                        key, entry = json.loads(line)
+                    except ValueError:
+                        # 写了一半的行（进程中断）：跳过，下次压缩时清除
+                        continue
+                    self.entries[key] = entry
+                    self.stored += 1
+        except (OSError, ValueError):
+            # 缓存不存在或已损坏：视为空缓存，全部重新渲染
+            self.entries = {}
+            self.stored = 0
+            self.valid = False
+
+    def get(self, key):
+        """读取章节条目，未命中返回 None"""
+        if self.entries is None:
+            self._load()
+        entry = self.used.get(key) or self.entries.get(key)
+        if entry is not None:
+            self.used[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        """登记新渲染的章节"""
+        self.used[key] = entry
+        self.added[key] = entry
+
+    def save(self):
+        """保存本次新渲染的章节（追加写入；失效条目过多时压缩重写）"""
+        if self.entries is None:
+            self.entries = {}
+        # 文件被删除（如清理缓存）或失效条目过多时重写
+        if (not self.valid or not self.path.exists()
+                or self.stored + len(self.added) > max(2 * len(self.used), COMPACT_MIN_ENTRIES)):
+            self._rewrite()
+        elif self.added:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(_entry_line(key, entry) for key, entry in self.added.items()))
+            self.stored += len(self.added)
+
+        # 常驻进程中同一对象可继续用于下一次转换（只保留本次用到的章节）
+        self.entries, self.used, self.added = self.used, {}, {}
+
+    def _rewrite(self):
+        """只保留本次用到的章节，原子重写整个文件"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_open(self.path) as f:
+            f.write(json.dumps(self._header()) + '\n')
+            for key, entry in self.used.items():
+                f.write(_entry_line(key, entry))
+        self.stored = len(self.used)
+        self.valid = True
+
+
+def _entry_line(key, entry):
+    return json.dumps([key, entry], ensure_ascii=False, separators=(',', ':')) + '\n'
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分节渲染
+把正文在安全的 H1/H2 处切分（md_scanner.iter_sections），逐节或并行渲染后按顺序拼接，
+结果与整篇一次渲染逐字节一致：
+
+    - 节间分隔：每节末尾追加一个哨兵段落再渲染，去掉哨兵后剩下的尾部空白
+      就是整篇渲染时该节与下一节之间的分隔（原始 HTML 块后是空行，其他块后是换行）
+    - 引用式链接：先只做块级解析收集全文的链接定义，渲染每节时在行内处理之前注入，
+      前向引用和重复定义（后者覆盖前者）与整篇渲染一致
+    - 标题 ID：并行渲染和章节缓存中，各节只登记 slug 并输出标记，拼接时按文档顺序
+      统一分配 ID（标题、标题-1 ...）后替换标记
+    - 原始 HTML：未闭合的 HTML 块或格式错误的标签（会吞掉其后第一个 >）使解析状态延续到
+      节末之后时，该节与其后的全部章节合并渲染（html_continues）
+
+流式转换（Converter.convert_stream）逐节使用，--jobs 并行渲染使用 ParallelRenderer，
+章节缓存（section_cache.py）保存的是带标记的片段。
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+
+from heading_ids import HeadingIdExtension, HeadingIdRegistry
+from md_scanner import iter_sections, iter_text_lines
+
+
+# 与整篇渲染一致的 Markdown 扩展（标题 ID 和共享引用扩展另外添加）
+MARKDOWN_EXTENSIONS = ('tables', 'fenced_code')
+
+# 节末哨兵段落（只含字母，不会与前一块合并）
+SECTION_SENTINEL = 'cvtsectionsentinel'
+_SENTINEL_HTML = f'<p>{SECTION_SENTINEL}</p>'
+
+# 可能是引用式链接定义的行（粗筛，允许引用和列表前缀；命中后再用解析器精确收集）
+REFERENCE_CANDIDATE = re.compile(r'^[ \t>*+\-0-9.)]*\[[^\]\n]*\]:', re.M)
+
+# 节末的原始 HTML 探针：未闭合的标签或属性引号（如 <span a=1 "）会让 HTML 解析器吞掉其后
+# 第一个 >，整篇渲染中可能在后面的章节里，探针没有被单独收为 HTML 块即说明解析状态延续
+# （含两种引号，未闭合的属性值同样会延续到探针）
+_HTML_PROBE = f'<p data-cvt="\'">{SECTION_SENTINEL}</p>'
+
+# 每个工作进程平均分到的块数（块越多负载越均衡，进程间传输开销也越大）
+CHUNKS_PER_JOB = 4
+
+
+
+class SharedReferencesTreeprocessor(Treeprocessor):
+    """在行内处理之前用全文的链接定义替换本节收集到的定义"""
+
+    def run(self, root):
+        shared = self.md.shared_references
+        if shared is not None:
+            self.md.references.clear()
+            self.md.references.update(shared)
+
+
+class SharedReferencesExtension(Extension):
+    """共享引用式链接定义（md.shared_references 为 None 时不生效）"""
+
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        md.shared_references = None
+        # 块级解析之后、行内处理（20）之前
+        md.treeprocessors.register(SharedReferencesTreeprocessor(md), 'shared_references', 30)
+
+
+def create_markdown(heading_ids):
+    """创建 Markdown 实例（整篇渲染、流式和并行渲染使用同一配置）"""
+    return markdown.Markdown(extensions=list(MARKDOWN_EXTENSIONS)
+                             + [heading_ids, SharedReferencesExtension()])
+
+
+def html_continues(md, text):
+    """原始 HTML 的解析状态是否延续到节末之后（只运行预处理器，没有 < 的章节直接返回 False）
+
+    未闭合的原始 HTML 块之外，格式错误的标签（行内也算）也会吞掉其后章节中的 >，
+    使后面的原始 HTML 块变为正文；这种章节须与其后的章节合并渲染。
+    """
+    if '<' not in text:
+        return False
+    md.reset()
+    lines = f'{text}\n\n{_HTML_PROBE}\n'.split('\n')
+    for preprocessor in md.preprocessors:
+        lines = preprocessor.run(lines)
+    blocks = md.htmlStash.rawHtmlBlocks
+    continues = not blocks or blocks[-1] != f'{_HTML_PROBE}\n'
+    md.reset()
+    return continues
+
+
+def render_section(md, text, references=None):
+    """渲染一节
+
+    Args:
+        md: create_markdown() 创建的实例
+        text: 章节 Markdown
+        references: 全文的链接定义（None 时只使用本节的定义）
+
+    Returns:
+        tuple: (HTML, 与下一节之间的分隔)；原始 HTML 延续到节末之后时（如未闭合的标签，
+               哨兵被并入原始 HTML 块，见 html_continues）分隔为 None，该节须与其后的章节合并渲染
+    """
+    continues = html_continues(md, text)
+    md.reset()
+    md.shared_references = references
+    html = md.convert(f'{text}\n\n{SECTION_SENTINEL}\n')
+    md.lines = []
+    md.shared_references = None
+
+    if html.endswith(_SENTINEL_HTML):
+        html = html[:-len(_SENTINEL_HTML)]
+        body = html.rstrip()
+        return body, None if continues else html[len(body):]
+    sentinel = html.rfind(SECTION_SENTINEL)
+    if sentinel >= 0:
+        html = html[:sentinel]
+    return html.rstrip(), None
+
+
+def collect_references(md, text):
+    """只做块级解析，收集一节中的链接定义 {标记: (链接, 标题)}"""
+    return scan_references(md, text)[0]
+
+
+def scan_references(md, text):
+    """只做块级解析，收集一节中的链接定义，同时检查原始 HTML 是否延续到节末之后
+
+    Returns:
+        tuple: ({标记: (链接, 标题)}, 是否延续)；延续时其后章节中的定义在整篇渲染中
+               属于原始 HTML，须与该节合并后重新收集
+    """
+    md.reset()
+    lines = f'{text}\n\n{SECTION_SENTINEL}\n'.split('\n')
+    for preprocessor in md.preprocessors:
+        lines = preprocessor.run(lines)
+    root = md.parser.parseDocument(lines).getroot()
+    references = dict(md.references)
+    md.reset()
+    closed = len(root) and root[-1].tag == 'p' and root[-1].text == SECTION_SENTINEL
+    return references, not closed or html_continues(md, text)
+
+
+def join_sections(rendered, write):
+    """按顺序写出各节 (HTML, 分隔)，空节跳过，最后一节的分隔丢弃（与整篇渲染的 strip 一致）
+
+    Returns:
+        int: 节数
+    """
+    count = 0
+    separator = None
+    for body, tail in rendered:
+        count += 1
+        if not body:
+            continue
+        if separator is not None:
+            write(separator)
+        write(body)
+        separator = tail
+    return count
+
+
+# ========== 延后分配标题 ID ==========
+
+def new_marker_token():
+    """标题 ID 标记中的随机标识（避免与正文内容冲突）"""
+    return os.urandom(6).hex()
+
+
+class DeferredIdRegistry:
+    """只登记 slug、返回标记的 ID 注册表，ID 在拼接时统一分配"""
+
+    def __init__(self, token):
+        self.token = token
+        self.slugs = []
+
+    def claim(self, slug):
+        marker = f'cvt-{self.token}-{len(self.slugs)}'
+        self.slugs.append(slug)
+        return marker
+
+
+def render_deferred(md, heading_ids, text, references, token):
+    """渲染一节，标题 ID 以标记代替
+
+    Args:
+        md: create_markdown() 创建的实例
+        heading_ids: md 使用的 HeadingIdExtension
+        text: 章节 Markdown
+        references: 全文的链接定义（可为 None）
+        token: 标记中的随机标识（new_marker_token()）
+
+    Returns:
+        tuple: (HTML, 分隔, 目录条目, 待分配 ID 的 slug 列表)
+    """
+    with heading_ids.shared_document():
+        registry = heading_ids.registry = DeferredIdRegistry(token)
+        body, tail = render_section(md, text, references)
+        entries = md.toc_entries
+    return body, tail, entries, registry.slugs
+
+
+def resolve_heading_ids(registry, token, body, entries, slugs):
+    """按文档顺序为一节的标题分配 ID 并替换标记（返回新的目录条目，不修改传入的条目）
+
+    Args:
+        registry: 全文共用的 HeadingIdRegistry（各节须按文档顺序调用）
+        token: 该节标记中的随机标识
+
+    Returns:
+        tuple: (HTML, 目录条目)
+    """
+    if not slugs:
+        return body, entries
+
+    ids = [registry.claim(slug) for slug in slugs]
+
+    def heading_id(match):
+        index = int(match.group(1))
+        return ids[index] if index < len(ids) else match.group(0)
+
+    # 一遍替换全部标记（\d+ 贪婪匹配，-1 不会匹配到 -10 的前缀）
+    marker = re.compile(rf'cvt-{token}-(\d+)')
+    body = marker.sub(heading_id, body)
+    entries = [dict(entry, id=marker.sub(heading_id, entry['id'])) for entry in entries]
+    return body, entries
+
+
+# ========== 并行渲染 ==========
+
+_worker_md = None
+_worker_ids = None
+
+
+def _init_worker():
+    """工作进程初始化：创建一次 Markdown 实例
+
+    在工作进程的首个任务中执行（ProcessPoolExecutor 的 initializer 需要 Python 3.7）。
+    """
+    global _worker_md, _worker_ids
+    if _worker_md is not None:
+        return
+    _worker_ids = HeadingIdExtension()
+    _worker_md = create_markdown(_worker_ids)
+
+
+def _collect_chunk_references(text):
+    _init_worker()
+    return collect_references(_worker_md, text)
+
+
+def _render_chunk(text, references, token):
+    """渲染一块（在工作进程中执行），返回值同 render_deferred"""
+    _init_worker()
+    return render_deferred(_worker_md, _worker_ids, text, references, token)
+
+
+def split_chunks(text, chunk_count):
+    """在安全的标题处切分正文，再把相邻章节合并为大小相近的块"""
+    target = max(len(text) // max(chunk_count, 1), 1)
+    chunks, current, size = [], [], 0
+    for section in iter_sections(iter_text_lines(text)):
+        current.append(section.text)
+        size += len(section.text)
+        if size >= target:
+            chunks.append(''.join(current))
+            current, size = [], 0
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+class ParallelRenderer:
+    """单文档分节并行渲染（进程池在首次使用时创建，可跨多次转换复用）"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.executor = None
+
+    def render(self, text):
+        """并行渲染正文
+
+        Returns:
+            tuple: (HTML, 目录条目)；正文无法切分为多块，或原始 HTML 跨块延续时返回 None
+                   （调用方改为整篇渲染）
+        """
+        chunks = split_chunks(text, self.jobs * CHUNKS_PER_JOB)
+        if len(chunks) < 2:
+            return None
+
+        self._start()
+
+        # 全文链接定义（多数方案没有引用式链接，粗筛不命中时跳过）
+        references = None
+        candidates = [chunk for chunk in chunks if REFERENCE_CANDIDATE.search(chunk)]
+        if candidates:
+            references = {}
+            for chunk_refs in self.executor.map(_collect_chunk_references, candidates):
+                references.update(chunk_refs)
+
+        token = new_marker_token()
+        results = self.executor.map(_render_chunk, chunks, [references] * len(chunks),
+                                    [token] * len(chunks))
+
+        results = list(results)
+        if any(tail is None for _, tail, _, _ in results[:-1]):
+            # 原始 HTML 跨块延续，各块单独渲染的结果与整篇不一致
+            return None
+
+        # 按文档顺序分配标题 ID，替换标记
+        registry = HeadingIdRegistry()
+        entries, rendered = [], []
+        for body, tail, chunk_entries, slugs in results:
+            body, chunk_entries = resolve_heading_ids(registry, token, body, chunk_entries, slugs)
+            entries.extend(chunk_entries)
+            rendered.append((body, tail))
+
+        parts = []
+        join_sections(rendered, parts.append)
+        return ''.join(parts), entries
+
+    def render_sections(self, texts, references, token):
+        """并行渲染若干节（不拼接，标题 ID 保持为标记；章节缓存渲染未命中的章节）
+
+        Returns:
+            list: [(HTML, 分隔, 目录条目, slug 列表)]，与 texts 顺序一致
+        """
+        self._start()
+        return list(self.executor.map(_render_chunk, texts, [references] * len(texts),
+                                      [token] * len(texts)))
+
+    def _start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
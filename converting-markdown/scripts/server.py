@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻转换进程（convert.py serve）
+保持一组预热的工作进程（主题、页面外壳和 Markdown 实例已加载），
+通过本地 Unix 套接字接收 JSON 请求，省去每次调用的启动和导入开销
+
+使用方法：
+    python3 convert.py serve                     # 默认套接字，工作进程数 = CPU 核数（最多 4）
+    python3 convert.py serve --jobs 8 -t purple -t blue
+    python3 client.py convert document.md        # 通过客户端转发请求
+
+协议（每行一个 JSON 对象）：
+    {"op": "convert", "args": ["doc.md", "--theme", "blue"], "cwd": "/path", "env": {...}}
+        → {"exit_code": 0, "stdout": "...", "stderr": ""}
+    操作：convert / check / validate / stats / ping / shutdown
+
+主题文件变化时工作进程自动重新加载主题；转换器代码变化时自动重建工作进程池。
+"""
+
+import argparse
+import io
+import importlib
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from client import SCRIPTS, SCRIPTS_DIR, FORWARD_ENV, connect, default_socket_path
+from batch import _percentile
+from converter import get_converter, clear_converter_cache
+from manifest import converter_digest
+from themes import get_theme, clear_theme_cache
+
+
+# 操作对应的脚本模块（模块需提供读取 sys.argv 的 main()）
+MODULES = {
+    'convert': 'convert',
+    'check': 'check_ascii_blocks',
+    'validate': 'validate_proposal',
+}
+
+# 每个操作保留的最近延迟样本数
+LATENCY_WINDOW = 1024
+
+
+# ========== 工作进程 ==========
+
+# 主题文件状态（检测主题变化）
+_templates_stamp = None
+
+
+def _read_templates_stamp():
+    """templates/ 下所有主题文件的状态"""
+    templates_dir = SCRIPTS_DIR.parent / 'templates'
+    stamp = []
+    for path in sorted(templates_dir.glob('*.yaml')):
+        st = path.stat()
+        stamp.append((path.name, st.st_size, st.st_mtime_ns))
+    return stamp
+
+
+def _init_worker(theme_names=()):
+    """工作进程初始化：导入脚本模块，预加载主题和 Markdown 实例
+
+    在工作进程的首个任务中执行（ProcessPoolExecutor 的 initializer 需要 Python 3.7），
+    之后的调用直接返回。
+    """
+    global _templates_stamp
+    if _templates_stamp is not None:
+        return
+    sys.path.insert(0, str(SCRIPTS['validate'].parent))
+    for module_name in MODULES.values():
+        importlib.import_module(module_name)
+    for theme_name in theme_names:
+        get_converter(theme_name)
+    _templates_stamp = _read_templates_stamp()
+
+
+def _warm_up(theme_names):
+    """预热任务（启动时让工作进程完成初始化）"""
+    _init_worker(theme_names)
+    return os.getpid()
+
+
+def _refresh_themes():
+    """主题文件变化时丢弃已加载的主题和转换器"""
+    global _templates_stamp
+    stamp = _read_templates_stamp()
+    if stamp != _templates_stamp:
+        clear_theme_cache()
+        clear_converter_cache()
+        _templates_stamp = stamp
+
+
+def _run_script(op, args, cwd, env):
+    """在工作进程中执行脚本的 main()，捕获输出和退出码
+
+    工作进程同一时间只执行一个任务，可以安全地切换工作目录、参数和环境变量。
+    """
+    _init_worker()
+    _refresh_themes()
+    module = sys.modules[MODULES[op]]
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_argv, saved_cwd = sys.argv, os.getcwd()
+    saved_env = {name: os.environ.get(name) for name in FORWARD_ENV}
+    exit_code = 0
+
+    try:
+        os.chdir(cwd)
+        for name in FORWARD_ENV:
+            if name in env:
+                os.environ[name] = env[name]
+            else:
+                os.environ.pop(name, None)
+        sys.argv = [str(SCRIPTS[op])] + list(args)
+
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                module.main()
+            except SystemExit as e:
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    print(e.code, file=sys.stderr)
+                    exit_code = 1
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    return {'exit_code': exit_code, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+# ========== 常驻进程 ==========
+
+class ServerStats:
+    """请求统计：队列深度、执行中数量和延迟分布"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = {}  # {操作: deque[(排队秒数, 总秒数)]}
+
+    def enqueue(self):
+        with self.lock:
+            self.queued += 1
+
+    def start(self):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+
+    def finish(self, op, wait, total, ok):
+        with self.lock:
+            self.running -= 1
+            self.completed += 1
+            if not ok:
+                self.failed += 1
+            samples = self.latencies.setdefault(op, deque(maxlen=LATENCY_WINDOW))
+            samples.append((wait, total))
+
+    def snapshot(self, workers):
+        """统计快照（可 JSON 序列化）"""
+        with self.lock:
+            ops = {}
+            for op, samples in self.latencies.items():
+                totals = sorted(total for _, total in samples)
+                waits = sorted(wait for wait, _ in samples)
+                ops[op] = {
+                    'count': len(samples),
+                    'p50_ms': _percentile(totals, 50) * 1000,
+                    'p95_ms': _percentile(totals, 95) * 1000,
+                    'max_ms': totals[-1] * 1000,
+                    'wait_p50_ms': _percentile(waits, 50) * 1000,
+                    'wait_p95_ms': _percentile(waits, 95) * 1000,
+                }
+            return {
+                'pid': os.getpid(),
+                'uptime': time.time() - self.started,
+                'workers': workers,
+                'queue_depth': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'ops': ops,
+            }
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """一个连接：逐行读取请求并按顺序响应"""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError
+            except ValueError:
+                response = {'error': '请求格式错误（每行一个 JSON 对象）'}
+            else:
+                response = self.server.dispatch(request)
+                if 'id' in request:
+                    response['id'] = request['id']
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """常驻转换进程：每个连接一个线程，任务交给工作进程池执行"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, jobs, theme_names):
+        super().__init__(str(socket_path), RequestHandler)
+        self.socket_path = Path(socket_path)
+        self.jobs = jobs
+        self.theme_names = list(theme_names)
+        self.stats = ServerStats()
+        # 限制同时提交到进程池的任务数，超出的在此排队（即队列深度）
+        self.slots = threading.BoundedSemaphore(jobs)
+        self.pool_lock = threading.Lock()
+        self.executor = None
+        self.futures = set()  # 已提交、尚未完成的任务（关闭时取消排队中的任务）
+        self.code_digest = None
+        self._start_pool()
+
+    def _start_pool(self):
+        """创建并预热工作进程池"""
+        self.code_digest = converter_digest()
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        for future in [self.executor.submit(_warm_up, self.theme_names) for _ in range(self.jobs)]:
+            future.result()
+
+    def _restart_pool(self):
+        old = self.executor
+        self._start_pool()
+        old.shutdown(wait=False)
+
+    def _current_executor(self):
+        """转换器代码变化时重建进程池，保证使用最新代码"""
+        with self.pool_lock:
+            if converter_digest() != self.code_digest:
+                print("♻️  检测到转换器代码变化，重启工作进程", flush=True)
+                self._restart_pool()
+            return self.executor
+
+    def run_job(self, op, args, cwd, env):
+        """在工作进程中执行脚本（占用一个执行槽位）"""
+        self.stats.enqueue()
+        queued_at = time.perf_counter()
+        with self.slots:
+            self.stats.start()
+            wait = time.perf_counter() - queued_at
+            response = None
+            executor = None
+            try:
+                executor = self._current_executor()
+                future = executor.submit(_run_script, op, args, cwd, env)
+                self.futures.add(future)
+                try:
+                    response = future.result()
+                finally:
+                    self.futures.discard(future)
+            except CancelledError:
+                response = {'error': '常驻进程正在关闭，任务已取消'}
+            except BrokenProcessPool:
+                with self.pool_lock:
+                    if self.executor is executor:
+                        self._restart_pool()
+                response = {'error': '工作进程异常退出，请重试'}
+            finally:
+                ok = bool(response) and response.get('exit_code') == 0
+                self.stats.finish(op, wait, time.perf_counter() - queued_at, ok)
+        return response
+
+    def dispatch(self, request):
+        """处理一个请求"""
+        op = request.get('op')
+
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if op == 'stats':
+            return self.stats.snapshot(self.jobs)
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        if op in MODULES:
+            args = request.get('args', [])
+            cwd = request.get('cwd') or os.getcwd()
+            env = request.get('env') or {}
+            if not isinstance(args, list) or not all(isinstance(a, str) for a in args):
+                return {'error': 'args 必须是字符串列表'}
+            return self.run_job(op, args, cwd, env)
+
+        return {'error': f'未知操作：{op}'}
+
+    def server_close(self):
+        super().server_close()
+        if self.executor is not None:
+            # 取消尚未开始的任务，等待执行中的任务结束
+            for future in list(self.futures):
+                future.cancel()
+            self.executor.shutdown(wait=True)
+        try:
+            self.socket_path.unlink()
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='convert.py serve',
+        description='启动常驻转换进程（Unix 套接字 + JSON 协议）',
+    )
+    parser.add_argument('--socket', '-s', default=None,
+                        help=f'套接字路径 (默认: {default_socket_path()})')
+    parser.add_argument('--jobs', '-j', type=int, default=min(4, os.cpu_count() or 1),
+                        help='工作进程数 (默认: CPU 核数，最多 4)')
+    parser.add_argument('--theme', '-t', action='append', default=None,
+                        help='预加载的主题，可重复指定 (默认: purple)')
+    args = parser.parse_args(argv)
+
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+    theme_names = args.theme or ['purple']
+    jobs = max(1, args.jobs)
+
+    # 已有进程在运行时拒绝启动；残留的套接字文件直接删除
+    existing = connect(socket_path)
+    if existing is not None:
+        existing.close()
+        print(f"❌ 常驻进程已在运行：{socket_path}")
+        sys.exit(1)
+    if socket_path.exists():
+        socket_path.unlink()
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 先在主进程校验主题，避免工作进程初始化失败
+    try:
+        for theme_name in theme_names:
+            get_theme(theme_name)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    server = ConversionServer(socket_path, jobs, theme_names)
+    os.chmod(socket_path, 0o600)
+
+    # SIGTERM 与 Ctrl+C 一样正常退出
+    signal.signal(signal.SIGTERM,
+                  lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    print(f"📡 常驻转换进程已启动：{socket_path}")
+    print(f"⚙️  工作进程：{jobs}，预加载主题：{', '.join(theme_names)}")
+    print(f"💡 使用 python3 scripts/client.py convert <文件> 转发请求", flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\n👋 常驻进程已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+占位符替换引擎
+一遍扫描找出全部起止标记，替换结果一次拼接，耗时与页面大小成正比（与占位符个数无关）：
+
+    - 起始标记用正则查找，结束标记（固定字符串，可以由起始标记得到）从起始标记处向后查找，
+      扫描位置只前进不回退
+    - 整页模式：未替换的片段和替换结果收集后一次 join
+    - 流式模式：分块读取、边替换边写出，内存只取决于分块大小和最大的单个块
+
+AI 占位符（replace_svg.py、extract_placeholders.py）和 ASCII 图代码块
+（replace_ascii_with_svg.py、ascii_to_svg_converter.py）共用。
+"""
+
+import re
+
+
+# 流式模式每次读取的字符数
+CHUNK_SIZE = 1 << 20
+
+# 流式模式在缓冲区末尾保留的字符数（起始标记可能被分块截断，须短于此长度）
+OVERLAP = 4096
+
+# AI 占位符起始标记；结束标记为 <!-- AI-SVG-{类型}-END:id={id},session={会话} -->
+AI_START_PATTERN = re.compile(
+    r'<!-- AI-SVG-(?P<type>[A-Z]+)-START:id=(?P<id>\d+),session=(?P<session>[a-f0-9]+) -->')
+
+
+def ai_end_marker(match):
+    """AI 占位符起始标记对应的结束标记"""
+    return f"<!-- AI-SVG-{match.group('type')}-END:id={match.group('id')},session={match.group('session')} -->"
+
+
+class Splicer:
+    """按起止标记查找并替换块
+
+        splicer = Splicer(AI_START_PATTERN, ai_end_marker, replace)
+        html = splicer.splice(html)           # 整页替换
+        splicer.splice_stream(src, out)       # 分块读写
+
+    块从起始标记开始，到（依次找到的）最后一个结束标记为止，包含两端标记；块内不再查找起始标记。
+    找不到结束标记的起始标记原样保留，记录在 unterminated 中。
+    """
+
+    def __init__(self, start, end, replace=None):
+        """
+        Args:
+            start: 起始标记的正则（已编译）
+            end: 结束标记：字符串或字符串元组（依次查找，如 ('</code></pre>', '</div>')），
+                 也可以是由起始标记匹配结果得到上述值的函数 end(match)
+            replace: 替换函数 replace(match, block) → 替换文本，返回 None 时块保持原样
+                     （只查找块时可省略）
+        """
+        self.start = start
+        self.end = end
+        self.replace = replace
+        self.unterminated = []  # 找不到结束标记的起始标记（匹配结果）
+
+    def _block_end(self, text, match):
+        """块的结束位置（结束标记不完整时返回 None）"""
+        markers = self.end(match) if callable(self.end) else self.end
+        if isinstance(markers, str):
+            markers = (markers,)
+        pos = match.end()
+        for marker in markers:
+            index = text.find(marker, pos)
+            if index < 0:
+                return None
+            pos = index + len(marker)
+        return pos
+
+    def segments(self, text):
+        """一遍扫描整页文本
+
+        Yields:
+            (片段, 起始标记匹配)：普通文本的匹配为 None；块为含两端标记的完整文本
+        """
+        pos = 0
+        while True:
+            match = self.start.search(text, pos)
+            if match is None:
+                break
+            end = self._block_end(text, match)
+            if end is None:
+                self.unterminated.append(match)
+                yield text[pos:match.end()], None
+                pos = match.end()
+                continue
+            if match.start() > pos:
+                yield text[pos:match.start()], None
+            yield text[match.start():end], match
+            pos = end
+        if pos < len(text):
+            yield text[pos:], None
+
+    def stream_segments(self, src, chunk_size=CHUNK_SIZE):
+        """分块读取文本流，产出与 segments() 相同的片段
+
+        块尚未读完时保留缓冲区中从起始标记开始的部分并继续读取（单个块须能放入内存），
+        其余内容读到即产出。
+        """
+        buffer = ''
+        eof = False
+        while not eof:
+            # 缓冲区中有未读完的块时加倍读取，大块的拼接总量仍是线性的
+            chunk = src.read(max(chunk_size, len(buffer)))
+            eof = not chunk
+            buffer += chunk
+            pos = 0
+            pending = None  # 未读完的块（或可能被截断的起始标记）的开始位置
+            while True:
+                match = self.start.search(buffer, pos)
+                if match is None:
+                    break
+                if not eof and match.end() == len(buffer):
+                    pending = match.start()
+                    break
+                end = self._block_end(buffer, match)
+                if end is None:
+                    if not eof:
+                        pending = match.start()
+                        break
+                    self.unterminated.append(match)
+                    yield buffer[pos:match.end()], None
+                    pos = match.end()
+                    continue
+                if match.start() > pos:
+                    yield buffer[pos:match.start()], None
+                yield buffer[match.start():end], match
+                pos = end
+
+            if eof:
+                if pos < len(buffer):
+                    yield buffer[pos:], None
+                break
+            if pending is None:
+                # 末尾可能是被截断的起始标记：保留 OVERLAP 个字符到下一轮
+                pending = max(pos, len(buffer) - OVERLAP)
+            if pending > pos:
+                yield buffer[pos:pending], None
+            buffer = buffer[pending:]
+
+    def _apply(self, segment, match):
+        if match is None or self.replace is None:
+            return segment
+        replacement = self.replace(match, segment)
+        return segment if replacement is None else replacement
+
+    def splice(self, text):
+        """整页替换，返回替换后的文本（一次拼接）"""
+        return ''.join(self._apply(segment, match) for segment, match in self.segments(text))
+
+    def splice_stream(self, src, out, chunk_size=CHUNK_SIZE):
+        """分块读取 src、替换后写入 out（文本流）"""
+        for segment, match in self.stream_segments(src, chunk_size):
+            out.write(self._apply(segment, match))
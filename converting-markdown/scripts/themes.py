@@ -29,6 +29,9 @@ class Theme:
         # 3. 合并配置（主题颜色覆盖 base 中的颜色）
         self.config = self._deep_merge(base_config, theme_config)
 
+        # 主题依赖的源文件（增量构建时用于判断主题是否变化）
+        self.source_files = [base_file, Path(theme_file)]
+
         self.name = self.config.get('name', 'Unknown')
         self.description = self.config.get('description', '')
 
@@ -151,6 +154,28 @@ def load_theme(theme_name='purple'):
     return Theme(theme_file)
 
 
+# 进程内主题缓存：{主题名称: Theme}
+_theme_cache = {}
+
+
+def get_theme(theme_name='purple'):
+    """获取主题（同一进程内只加载一次）
+
+    批量转换时每个工作进程会转换大量文档，
+    缓存可避免为每个文档重复解析 YAML。
+    """
+    theme = _theme_cache.get(theme_name)
+    if theme is None:
+        theme = load_theme(theme_name)
+        _theme_cache[theme_name] = theme
+    return theme
+
+
+def clear_theme_cache():
+    """清空主题缓存（常驻进程检测到主题文件变化时调用）"""
+    _theme_cache.clear()
+
+
 def list_themes():
     """列出所有可用主题"""
     script_dir = Path(__file__).parent
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监视模式与实时预览（convert.py watch）
+监视目录下的 Markdown 文档和主题文件，保存后只重新转换受影响的文档；
+加 --serve 时用标准库 HTTP 服务器提供预览，通过 Server-Sent Events 通知浏览器刷新
+
+使用方法：
+    python3 convert.py watch docs/                     # 只监视并重新转换
+    python3 convert.py watch docs/ --serve             # 同时启动预览服务器 http://127.0.0.1:8000/
+    python3 convert.py watch docs/ --serve --port 9000 --theme blue
+    python3 convert.py watch docs/ --poll              # 强制使用轮询（网络文件系统等）
+
+工作方式：
+    - 文件变化：安装了 watchdog 时使用系统文件通知（inotify / FSEvents / ReadDirectoryChangesW），
+      否则每 --interval 秒轮询一次文件状态
+    - 重新转换：在当前进程内完成，复用已加载的主题、转换器、章节缓存和图形缓存，
+      改一段文字只重新渲染所在的一节；增量构建清单判断哪些输出受影响
+      （保存了未改动的文件、与所用主题无关的主题文件变化都不会触发转换）
+    - 刷新：预览页面注入一小段脚本订阅 /__cvt/events，对应的 HTML 重新生成后自动刷新
+"""
+
+import argparse
+import http.server
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from batch import collect_markdown_files, plan_builds, MARKDOWN_SUFFIXES
+from convert import convert_markdown_to_html, parse_toc_depth, DEFAULT_TOC_DEPTH
+from converter import clear_converter_cache
+from themes import get_theme, clear_theme_cache
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / 'templates'
+
+# 收到第一个变化后再等待的时间（编辑器保存时常连续产生多个事件，合并为一次构建）
+DEBOUNCE = 0.05
+
+# 轮询间隔（秒，未安装 watchdog 或指定 --poll 时）
+DEFAULT_INTERVAL = 0.25
+
+# SSE 心跳间隔（秒，及时发现已关闭的连接）
+HEARTBEAT = 15
+
+EVENTS_PATH = '/__cvt/events'
+
+# 注入预览页面的刷新脚本
+RELOAD_SCRIPT = f'''<script>
+(function () {{
+  var source = new EventSource('{EVENTS_PATH}');
+  source.onmessage = function (event) {{
+    var path = location.pathname;
+    if (path.charAt(path.length - 1) === '/') path += 'index.html';
+    if (event.data === path) location.reload();
+  }};
+}})();
+</script>
+'''.encode('utf-8')
+
+
+def _is_source(path):
+    """是否是需要监视的文件（Markdown 文档或主题文件，跳过缓存目录）"""
+    path = Path(path)
+    if '.cvt-caches' in path.parts:
+        return False
+    if path.suffix.lower() in MARKDOWN_SUFFIXES:
+        return True
+    return path.suffix == '.yaml' and path.parent == TEMPLATES_DIR
+
+
+# ========== 文件变化检测 ==========
+
+class _EventHandler(FileSystemEventHandler):
+    """watchdog 事件 → 变化队列"""
+
+    def __init__(self, changes):
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # 编辑器常用"写临时文件再重命名"的方式保存，目标路径在 dest_path 中
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and _is_source(path):
+                self.changes.put(Path(path).resolve())
+
+
+class NotifyWatcher:
+    """基于系统文件通知的监视器（需要 watchdog）"""
+
+    name = 'watchdog'
+
+    def __init__(self, root, changes):
+        self.observer = Observer()
+        handler = _EventHandler(changes)
+        self.observer.schedule(handler, str(root), recursive=True)
+        self.observer.schedule(handler, str(TEMPLATES_DIR), recursive=False)
+
+    def start(self):
+        self.observer.start()
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+class PollingWatcher:
+    """轮询监视器：定期比较文件大小和修改时间"""
+
+    name = 'polling'
+
+    def __init__(self, root, changes, interval=DEFAULT_INTERVAL):
+        self.root = Path(root)
+        self.changes = changes
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='cvt-watch', daemon=True)
+        self.stamps = self._scan()
+
+    def _scan(self):
+        """{路径: (大小, 修改时间)}，遍历时跳过缓存目录和隐藏目录"""
+        stamps = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for filename in filenames:
+                if os.path.splitext(filename)[1].lower() in MARKDOWN_SUFFIXES:
+                    self._stat(os.path.join(dirpath, filename), stamps)
+        for path in TEMPLATES_DIR.glob('*.yaml'):
+            self._stat(path, stamps)
+        return stamps
+
+    @staticmethod
+    def _stat(path, stamps):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        stamps[Path(path).resolve()] = (st.st_size, st.st_mtime_ns)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            stamps = self._scan()
+            for path in stamps.keys() | self.stamps.keys():
+                if stamps.get(path) != self.stamps.get(path):
+                    self.changes.put(path)
+            self.stamps = stamps
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def create_watcher(root, changes, poll=False, interval=DEFAULT_INTERVAL):
+    """创建监视器（优先使用系统文件通知）"""
+    if Observer is not None and not poll:
+        try:
+            return NotifyWatcher(root, changes)
+        except OSError as e:
+            # 如 inotify 监视数达到上限
+            print(f"⚠️  系统文件通知不可用（{e}），改用轮询")
+    return PollingWatcher(root, changes, interval)
+
+
+# ========== 重新转换 ==========
+
+class Rebuilder:
+    """在当前进程内重新转换受影响的文档"""
+
+    def __init__(self, root, theme_name='purple', toc_depth=DEFAULT_TOC_DEPTH, notify=None):
+        self.root = Path(root).resolve()
+        self.theme_name = theme_name
+        self.toc_depth = toc_depth
+        self.notify = notify    # 每生成一个 HTML 调用一次 notify(html_path)
+
+    def build(self, changed=None):
+        """重新转换
+
+        Args:
+            changed: 变化的文件路径集合（None 表示检查目录下所有文档）
+
+        Returns:
+            int: 转换的文档数
+        """
+        changed = changed or set()
+        themes_changed = any(path.suffix == '.yaml' for path in changed)
+        if themes_changed:
+            # 主题文件变化：丢弃已加载的主题和转换器，由构建清单判断哪些文档使用了该主题
+            clear_theme_cache()
+            clear_converter_cache()
+
+        if changed and not themes_changed:
+            files = [path for path in changed if path.is_file() and path.suffix.lower() in MARKDOWN_SUFFIXES]
+        else:
+            files, _ = collect_markdown_files([self.root])
+
+        try:
+            theme = get_theme(self.theme_name)
+            pending, _, manifests = plan_builds(files, theme, toc_depth=self.toc_depth)
+        except Exception as e:
+            # 如主题文件保存了一半、YAML 语法错误，或文档刚被删除：等下一次变化
+            print(f"❌ 检查输入失败：{type(e).__name__}: {e}")
+            return 0
+
+        built = 0
+        for md_path, digests in pending:
+            html_path = md_path.with_suffix('.html')
+            start = time.perf_counter()
+            try:
+                result = convert_markdown_to_html(md_path, html_path, self.theme_name,
+                                                  verbose=False, toc_depth=self.toc_depth)
+            except (Exception, SystemExit) as e:
+                print(f"❌ {self._relative(md_path)}：{type(e).__name__}: {e}")
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+
+            manifests[md_path.parent].record(md_path, html_path, digests)
+            built += 1
+
+            detail = ''
+            if result.sections:
+                detail = f"，复用 {result.sections['cached']}/{result.sections['sections']} 节"
+            if result.pending_diagrams:
+                detail += f"，{len(result.pending_diagrams)} 个图待 AI 生成"
+            print(f"🔄 {self._relative(md_path)} → {html_path.name}（{elapsed:.0f} ms{detail}）")
+            if self.notify:
+                self.notify(html_path)
+
+        for manifest in manifests.values():
+            manifest.save()
+        return built
+
+    def _relative(self, path):
+        try:
+            return path.relative_to(self.root)
+        except ValueError:
+            return path
+
+
+# ========== 预览服务器 ==========
+
+class ReloadHub:
+    """向所有 SSE 连接广播刷新消息"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+
+    def subscribe(self):
+        client = queue.Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish(self, message):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.put(message)
+
+    def close(self):
+        """通知所有连接结束"""
+        self.publish(None)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """每个连接一个线程（http.server.ThreadingHTTPServer 需要 Python 3.7）"""
+
+    daemon_threads = True
+
+
+class PreviewHandler(http.server.SimpleHTTPRequestHandler):
+    """静态文件 + HTML 注入刷新脚本 + SSE 事件流"""
+
+    hub = None
+    quiet = True
+    root = None  # 服务目录（handler 的 directory 参数需要 Python 3.7）
+
+    def translate_path(self, path):
+        """把 URL 路径映射到服务目录下（基类按当前工作目录解析）"""
+        path = super().translate_path(path)
+        return os.path.join(self.root, os.path.relpath(path, os.getcwd()))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == EVENTS_PATH:
+            self._stream_events()
+            return
+
+        file_path = Path(self.translate_path(self.path))
+        if path.endswith('/'):
+            file_path = file_path / 'index.html'
+        if file_path.suffix != '.html' or not file_path.is_file():
+            super().do_GET()
+            return
+
+        try:
+            data = file_path.read_bytes()
+        except OSError:
+            self.send_error(404, 'File not found')
+            return
+        index = data.rfind(b'</body>')
+        data = data[:index] + RELOAD_SCRIPT + data[index:] if index >= 0 else data + RELOAD_SCRIPT
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def end_headers(self):
+        # 预览内容随时变化，不让浏览器缓存
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.end_headers()
+
+        client = self.hub.subscribe()
+        try:
+            # 服务器重启后浏览器尽快重连
+            self.wfile.write(b'retry: 500\n\n')
+            self.wfile.flush()
+            while True:
+                try:
+                    message = client.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    self.wfile.write(b': ping\n\n')
+                else:
+                    if message is None:
+                        break
+                    self.wfile.write(f'data: {message}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.hub.unsubscribe(client)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class PreviewServer:
+    """预览服务器（后台线程运行）"""
+
+    def __init__(self, root, host='127.0.0.1', port=8000, quiet=True):
+        self.root = Path(root).resolve()
+        self.hub = ReloadHub()
+        handler = type('Handler', (PreviewHandler,),
+                       {'hub': self.hub, 'quiet': quiet, 'root': str(self.root)})
+        self.httpd = _ThreadingHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='cvt-preview',
+                                       daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def url_path(self, html_path):
+        """HTML 文件对应的 URL 路径（与浏览器中的 location.pathname 一致）"""
+        relative = Path(html_path).resolve().relative_to(self.root)
+        return '/' + quote(relative.as_posix())
+
+    def notify(self, html_path):
+        """通知浏览器刷新该页面"""
+        try:
+            self.hub.publish(self.url_path(html_path))
+        except ValueError:
+            # 不在服务目录下
+            pass
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.hub.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ========== 主循环 ==========
+
+def _drain(changes, first):
+    """取出一次保存产生的所有变化"""
+    changed = {first}
+    deadline = time.monotonic() + DEBOUNCE
+    while True:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            return changed
+        try:
+            changed.add(changes.get(timeout=timeout))
+        except queue.Empty:
+            return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='convert.py watch',
+        description='监视目录，文档或主题变化时自动重新转换（可选实时预览服务器）',
+    )
+    parser.add_argument('directory', help='要监视的目录')
+    parser.add_argument('--theme', '-t', default='purple', help='主题名称 (默认: purple)')
+    parser.add_argument('--toc-depth', default=DEFAULT_TOC_DEPTH,
+                        help=f'目录层级，如 3 或 2-4 (默认: {DEFAULT_TOC_DEPTH})')
+    parser.add_argument('--serve', action='store_true',
+                        help='启动预览服务器，页面重新生成后浏览器自动刷新')
+    parser.add_argument('--host', default='127.0.0.1', help='预览服务器地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', '-p', type=int, default=8000,
+                        help='预览服务器端口 (默认: 8000，0 表示自动分配)')
+    parser.add_argument('--poll', action='store_true',
+                        help='使用轮询检测文件变化（不使用系统文件通知）')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'轮询间隔秒数 (默认: {DEFAULT_INTERVAL})')
+    parser.add_argument('--verbose', '-v', action='store_true', help='输出预览服务器访问日志')
+    args = parser.parse_args(argv)
+
+    root = Path(args.directory)
+    if not root.is_dir():
+        print(f"❌ 目录不存在：{root}")
+        sys.exit(1)
+    try:
+        get_theme(args.theme)
+        parse_toc_depth(args.toc_depth)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.interval <= 0:
+        print(f"❌ --interval 必须大于 0：{args.interval}")
+        sys.exit(1)
+
+    server = None
+    if args.serve:
+        try:
+            server = PreviewServer(root, args.host, args.port, quiet=not args.verbose)
+        except OSError as e:
+            print(f"❌ 预览服务器启动失败：{e}")
+            sys.exit(1)
+
+    rebuilder = Rebuilder(root, args.theme, args.toc_depth, server.notify if server else None)
+
+    # 先监视再构建：构建期间的保存不会丢失
+    changes = queue.Queue()
+    watcher = create_watcher(root, changes, args.poll, args.interval)
+    watcher.start()
+
+    print(f"👀 监视目录：{rebuilder.root}（{watcher.name}）")
+    built = rebuilder.build()
+    print(f"✅ 初始构建完成：转换 {built} 个文档")
+    if server:
+        server.start()
+        print(f"🌐 预览地址：{server.url}")
+    print("💡 按 Ctrl+C 退出")
+    sys.stdout.flush()
+
+    try:
+        while True:
+            changed = _drain(changes, changes.get())
+            rebuilder.build(changed)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print("\n👋 已停止监视")
+    finally:
+        watcher.stop()
+        if server:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,10 @@ import re
 import sys
 from pathlib import Path
 
+# 复用 converting-markdown 的单遍 Markdown 扫描器
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'converting-markdown' / 'scripts'))
+from md_scanner import has_box_chars, scan_markdown  # noqa: E402
+
 
 class ProposalValidator:
     """售前方案验证器"""
@@ -24,6 +28,7 @@ class ProposalValidator:
     def __init__(self, file_path):
         self.file_path = Path(file_path)
         self.content = ""
+        self.scan = None
         self.issues = []
         self.warnings = []
 
@@ -36,6 +41,9 @@ class ProposalValidator:
         with open(self.file_path, 'r', encoding='utf-8') as f:
             self.content = f.read()
 
+        # 一次扫描，供各项检查共用
+        self.scan = scan_markdown(self.content)
+
         return True
 
     def check_four_sections(self):
@@ -84,7 +92,7 @@ class ProposalValidator:
         """检查编制单位信息"""
         if "{{COMPANY_NAME}}" in self.content:
             self.warnings.append("文档中包含占位符 {{COMPANY_NAME}}，请替换为实际公司名称")
-        elif "**编制单位：**" not in self.content:
+        elif not any(meta.key == '编制单位' for meta in self.scan.metadata):
             self.warnings.append("缺少编制单位信息")
 
     def check_price_format(self):
@@ -102,24 +110,13 @@ class ProposalValidator:
 
     def check_ascii_blocks(self):
         """检查 ASCII 图标注"""
-        # 检查未标注的代码块
-        code_block_pattern = re.compile(r'```([^`\n]*)\n([^`]+)```', re.DOTALL)
-        blocks = code_block_pattern.finditer(self.content)
-
-        box_chars = set('┌─│└┘┐┬┼┴├┤┤┘┌┐└─│╭╮╰╯═║╗╚╝╔═')
+        # 检查未标注的代码块（行号由扫描器预先计算）
         unlabeled_blocks = []
 
-        for block in blocks:
-            lang = block.group(1)
-            code = block.group(2)
-
+        for block in self.scan.fences:
             # 只检查包含框线字符的代码块
-            if any(char in box_chars for char in code):
-                start_pos = block.start()
-                line_num = self.content[:start_pos].count('\n') + 1
-
-                if not lang.startswith('ascii:'):
-                    unlabeled_blocks.append((line_num, lang))
+            if has_box_chars(block.code) and not block.info.startswith('ascii:'):
+                unlabeled_blocks.append((block.line, block.info))
 
         if unlabeled_blocks:
             for line_num, lang in unlabeled_blocks: